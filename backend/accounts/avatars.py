@@ -0,0 +1,55 @@
+from core.images import content_addressed_name, delete_image_variants, generate_avatar_variants
+from core.media_cache import invalidate_media_cache
+
+
+def normalize_avatar(user, upload):
+    """
+    @brief Нормализация загруженного аватара и привязка вариантов к пользователю
+    Варианты сохраняются под именами по хэшу содержимого, исходный файл не сохраняется,
+    avatar указывает на наибольший JPEG-вариант. Пользователь не сохраняется
+    @param user Пользователь
+    @param upload Загруженный файл изображения
+    @return list Варианты аватара
+    """
+    digest = content_addressed_name(upload).split('.')[0]
+    variants = generate_avatar_variants(upload, user.avatar.storage, f'avatars/{user.pk}/{digest[:16]}')
+    main = max(
+        (variant for variant in variants if variant['format'] == 'jpeg'),
+        key=lambda variant: variant['width'],
+    )
+    user.avatar = main['name']
+    user.avatar_meta = {'size': main['size'], 'modified': main['modified']}
+    user.avatar_variants = variants
+    return variants
+
+
+def delete_avatar_files(storage, name, variants):
+    """
+    @brief Удаление файлов аватара из хранилища и дискового кэша
+    @param storage Хранилище файлов
+    @param name Имя основного файла аватара (для аватаров до нормализации - исходный файл)
+    @param variants Варианты аватара
+    """
+    delete_image_variants(variants, storage)
+    if name and name not in {variant['name'] for variant in variants or []}:
+        try:
+            storage.delete(name)
+        except Exception:
+            pass
+        invalidate_media_cache(name)
+
+
+def save_user_with_avatar(user, variants, **kwargs):
+    """
+    @brief Сохранение пользователя после normalize_avatar
+    Если сохранение не удалось, только что загруженные варианты удаляются из хранилища
+    @param user Пользователь
+    @param variants Варианты, возвращенные normalize_avatar (пустой список - аватар не менялся)
+    @param kwargs Аргументы user.save()
+    """
+    try:
+        user.save(**kwargs)
+    except Exception:
+        if variants:
+            delete_avatar_files(user.avatar.storage, None, variants)
+        raise
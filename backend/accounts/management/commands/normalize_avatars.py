@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from accounts.avatars import delete_avatar_files, normalize_avatar
+from core.images import ImageVariantError
+
+
+class Command(BaseCommand):
+    help = "Resize avatars uploaded before normalization into square variants and delete the originals."
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        users = (
+            User.objects.exclude(avatar="")
+            .exclude(avatar__isnull=True)
+            .filter(avatar_variants=[])
+            .only("id", "avatar", "avatar_meta", "avatar_variants")
+            .order_by("id")
+        )
+
+        normalized = 0
+        failed = 0
+        for user in users.iterator(chunk_size=100):
+            original_name = user.avatar.name
+            storage = user.avatar.storage
+            try:
+                with storage.open(original_name, "rb") as original:
+                    normalize_avatar(user, original)
+            except (ImageVariantError, OSError) as exc:
+                failed += 1
+                self.stderr.write(f"User {user.id}: {exc}")
+                continue
+            updated = User.objects.filter(id=user.id, avatar=original_name).update(
+                avatar=user.avatar.name,
+                avatar_meta=user.avatar_meta,
+                avatar_variants=user.avatar_variants,
+            )
+            if updated:
+                delete_avatar_files(storage, original_name, [])
+                normalized += 1
+            else:
+                # Аватар заменен во время обработки - новые варианты не нужны.
+                delete_avatar_files(storage, None, user.avatar_variants)
+
+        self.stdout.write(self.style.SUCCESS(f"Normalized {normalized} avatars, {failed} failed."))
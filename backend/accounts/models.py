@@ -14,6 +14,12 @@ class CustomUser(AbstractUser):
         blank=True,
         null=True,
     )
+    # Размер и время изменения файла аватара (core.media.describe_media_file) для
+    # ответов на условные запросы и Range без обращения к хранилищу
+    avatar_meta = models.JSONField(null=True, blank=True, editable=False)
+    # Квадратные варианты аватара (core.images.generate_avatar_variants); avatar указывает
+    # на наибольший JPEG-вариант
+    avatar_variants = models.JSONField(default=list, blank=True, editable=False)
     is_moderator = models.BooleanField(default=False)
     
     USERNAME_FIELD = 'username'
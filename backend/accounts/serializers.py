@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from core.images import ImageVariantError, build_image_srcset
+from .avatars import normalize_avatar, save_user_with_avatar
 
 User = get_user_model()
 
@@ -12,13 +14,14 @@ class UserSerializer(serializers.ModelSerializer):
     """
     password = serializers.CharField(write_only=True, allow_blank=False)
     avatar_url = serializers.SerializerMethodField(read_only=True)
+    avatar_srcset = serializers.SerializerMethodField(read_only=True)
     
     class Meta:
         """
         @brief Метаданные сериализатора
         """
         model = User
-        fields = ('id', 'username', 'email', 'password', 'is_moderator', 'avatar', 'avatar_url')
+        fields = ('id', 'username', 'email', 'password', 'is_moderator', 'avatar', 'avatar_url', 'avatar_srcset')
         read_only_fields = ('is_moderator',)
         extra_kwargs = {
             'email': {'required': True},
@@ -32,7 +35,15 @@ class UserSerializer(serializers.ModelSerializer):
         @return User Созданный пользователь
         """
         password = validated_data.pop('password')
+        avatar = validated_data.pop('avatar', None)
         user = User.objects.create_user(**validated_data, password=password)
+        if avatar:
+            # Аватар нормализуется после создания: имена вариантов содержат ID пользователя.
+            try:
+                variants = normalize_avatar(user, avatar)
+            except ImageVariantError:
+                return user
+            save_user_with_avatar(user, variants, update_fields=['avatar', 'avatar_meta', 'avatar_variants'])
         return user
 
     def get_avatar_url(self, obj):
@@ -49,3 +60,14 @@ class UserSerializer(serializers.ModelSerializer):
         if request is not None:
             return request.build_absolute_uri(avatar_url)
         return avatar_url
+
+    def get_avatar_srcset(self, obj):
+        """
+        @brief Получение srcset аватара по его квадратным вариантам
+        @param obj Объект пользователя
+        @return str Значение srcset или пустая строка без вариантов
+        """
+        avatar_url = self.get_avatar_url(obj)
+        if not avatar_url:
+            return ""
+        return build_image_srcset(avatar_url, obj.avatar_variants)
@@ -0,0 +1,107 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from .avatars import normalize_avatar, save_user_with_avatar
+
+User = get_user_model()
+
+
+def _avatar_upload(size=(300, 200), color=(200, 30, 30)):
+    """
+    @brief Загружаемый файл аватара в формате PNG
+    @param size Размер изображения (ширина, высота)
+    @param color Цвет заливки
+    @return SimpleUploadedFile Файл изображения
+    """
+    content = io.BytesIO()
+    Image.new('RGB', size, color).save(content, 'PNG')
+    return SimpleUploadedFile('avatar.png', content.getvalue(), content_type='image/png')
+
+
+class AvatarTests(TestCase):
+    """
+    @brief Нормализация аватаров и удаление их файлов
+    """
+
+    def setUp(self):
+        self.storage_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.storage_dir, True)
+        settings_override = override_settings(
+            STORAGES={
+                'default': {
+                    'BACKEND': 'django.core.files.storage.FileSystemStorage',
+                    'OPTIONS': {'location': self.storage_dir},
+                },
+                'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+            },
+            MEDIA_DELIVERY='stream',
+            MEDIA_CACHE_DIR='',
+            AVATAR_SIZES=[48, 96],
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(username='user', email='user@example.com', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _update_avatar(self, upload):
+        return self.client.put('/api/auth/me/update/', {'avatar': upload}, format='multipart')
+
+    def _exists(self, name):
+        return self.user.avatar.storage.exists(name)
+
+    def test_upload_is_normalized_to_square_variants(self):
+        response = self._update_avatar(_avatar_upload())
+
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(
+            sorted((variant['width'], variant['height'], variant['format']) for variant in self.user.avatar_variants),
+            [(48, 48, 'jpeg'), (48, 48, 'webp'), (96, 96, 'jpeg'), (96, 96, 'webp')],
+        )
+        largest_jpeg = [
+            variant['name'] for variant in self.user.avatar_variants
+            if variant['format'] == 'jpeg' and variant['width'] == 96
+        ]
+        self.assertEqual([self.user.avatar.name], largest_jpeg)
+        self.assertTrue(all(self._exists(variant['name']) for variant in self.user.avatar_variants))
+        with self.user.avatar.open('rb') as avatar_file:
+            self.assertEqual(Image.open(avatar_file).size, (96, 96))
+
+    def test_non_image_upload_is_rejected(self):
+        upload = SimpleUploadedFile('avatar.png', b'not an image', content_type='image/png')
+
+        response = self._update_avatar(upload)
+
+        self.assertEqual(response.status_code, 400)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.avatar)
+
+    def test_replaced_avatar_files_are_deleted(self):
+        self._update_avatar(_avatar_upload())
+        self.user.refresh_from_db()
+        old_names = [variant['name'] for variant in self.user.avatar_variants]
+
+        self._update_avatar(_avatar_upload(color=(10, 200, 10)))
+
+        self.user.refresh_from_db()
+        self.assertFalse(any(self._exists(name) for name in old_names))
+        self.assertTrue(all(self._exists(variant['name']) for variant in self.user.avatar_variants))
+
+    def test_failed_save_deletes_new_variants(self):
+        variants = normalize_avatar(self.user, _avatar_upload())
+        self.assertTrue(all(self._exists(variant['name']) for variant in variants))
+
+        with mock.patch.object(User, 'save', side_effect=RuntimeError('db down')):
+            with self.assertRaises(RuntimeError):
+                save_user_with_avatar(self.user, variants)
+
+        self.assertFalse(any(self._exists(variant['name']) for variant in variants))
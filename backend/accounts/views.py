@@ -6,10 +6,12 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.exceptions import TokenError
 from django.contrib.auth import authenticate
 from django.contrib.auth import get_user_model
-from django.http import FileResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_vary_headers
 import mimetypes
-import os
+from core.images import IMAGE_VARIANT_CONTENT_TYPES, ImageVariantError, select_image_variant
+from core.media import describe_media_file, media_file_response
+from .avatars import delete_avatar_files, normalize_avatar, save_user_with_avatar
 from .serializers import UserSerializer
 
 User = get_user_model()
@@ -102,24 +104,25 @@ def update_me(request):
     if new_password:
         user.set_password(str(new_password))
 
+    previous_avatar_name = user.avatar.name if user.avatar else None
+    previous_avatar_variants = list(user.avatar_variants or [])
+    storage = user.avatar.storage
+
     if remove_avatar and user.avatar:
-        user.avatar.delete(save=False)
         user.avatar = None
+        user.avatar_meta = None
+        user.avatar_variants = []
 
+    new_avatar_variants = []
     if avatar_file is not None:
-        previous_avatar_name = user.avatar.name if user.avatar else None
-        _, extension = os.path.splitext(avatar_file.name or "")
-        safe_extension = extension.lower() if extension else ".png"
-        avatar_file.name = f"{user.username}/avatar_{user.id or 'new'}{safe_extension}"
-        user.avatar = avatar_file
-
-    user.save()
-    if avatar_file is not None and 'previous_avatar_name' in locals():
-        if previous_avatar_name and user.avatar and previous_avatar_name != user.avatar.name:
-            try:
-                user.avatar.storage.delete(previous_avatar_name)
-            except Exception:
-                pass
+        try:
+            new_avatar_variants = normalize_avatar(user, avatar_file)
+        except ImageVariantError:
+            return Response({'error': 'Avatar must be an image'}, status=status.HTTP_400_BAD_REQUEST)
+
+    save_user_with_avatar(user, new_avatar_variants)
+    if (remove_avatar or avatar_file is not None) and previous_avatar_name:
+        delete_avatar_files(storage, previous_avatar_name, previous_avatar_variants)
 
     return Response({'user': UserSerializer(user, context={'request': request}).data})
 
@@ -129,17 +132,55 @@ def update_me(request):
 def avatar_media(request, user_id):
     """
     @brief Получение аватара пользователя по ID
+    С параметром w отдается ближайший не меньший квадратный вариант (WebP, если клиент
+    его принимает, иначе JPEG). Условные запросы и Range обслуживаются по метаданным
+    файла, сохраненным в БД (для аватаров, загруженных раньше, они запрашиваются
+    у хранилища один раз)
     @param request Запрос без аутентификации
     @param user_id ID пользователя
-    @return FileResponse Файл аватара пользователя
+    @return HttpResponse Файл аватара пользователя
     """
-    user = get_object_or_404(User, id=user_id)
+    user = get_object_or_404(User.objects.only('id', 'avatar', 'avatar_meta', 'avatar_variants'), id=user_id)
     if not user.avatar:
         return Response({'error': 'Avatar not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    content_type, _ = mimetypes.guess_type(user.avatar.name)
-    avatar_file = user.avatar.open('rb')
-    return FileResponse(avatar_file, content_type=content_type or 'application/octet-stream')
+    width = request.query_params.get('w')
+    variant = None
+    if width:
+        try:
+            width = int(width)
+        except (TypeError, ValueError):
+            return Response({'error': 'w must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
+        if width <= 0:
+            return Response({'error': 'w must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
+        variant = select_image_variant(
+            user.avatar_variants,
+            width,
+            'image/webp' in request.META.get('HTTP_ACCEPT', ''),
+        )
+
+    if variant:
+        name = variant['name']
+        content_type = IMAGE_VARIANT_CONTENT_TYPES[variant['format']]
+        meta = variant
+    else:
+        name = user.avatar.name
+        content_type, _ = mimetypes.guess_type(name)
+        meta = user.avatar_meta
+        if not meta:
+            meta = describe_media_file(user.avatar.storage, name)
+            User.objects.filter(id=user.id, avatar=name).update(avatar_meta=meta)
+
+    response = media_file_response(
+        request,
+        user.avatar.storage,
+        name,
+        meta,
+        content_type or 'application/octet-stream',
+    )
+    if width:
+        patch_vary_headers(response, ['Accept'])
+    return response
 
 
 @api_view(['POST'])
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import PlaceObject, PlaceReview
+from .images import content_addressed_name, delete_image_variants, queue_place_image_variants
+from .models import GeocodeCacheEntry, PlaceImportJob, PlaceObject, PlaceReview, PushJob
+from .ratings import rebuild_place_ratings, touch_places
 
 
 @admin.register(PlaceObject)
@@ -7,8 +9,56 @@ class PlaceObjectAdmin(admin.ModelAdmin):
     list_display = ("id", "title", "infrastructure_type", "address", "created_at")
     search_fields = ("title", "address", "infrastructure_type")
 
+    def save_model(self, request, obj, form, change):
+        previous_variants = []
+        if "image" in form.changed_data:
+            if obj.image and not obj.image._committed:
+                obj.image.name = content_addressed_name(obj.image)
+            previous_variants = queue_place_image_variants(obj)
+        super().save_model(request, obj, form, change)
+        delete_image_variants(previous_variants, obj.image.storage)
+
 
 @admin.register(PlaceReview)
 class PlaceReviewAdmin(admin.ModelAdmin):
     list_display = ("id", "place", "author_name", "created_at")
     search_fields = ("author_name", "text", "place__title")
+
+    def save_model(self, request, obj, form, change):
+        previous_place_id = None
+        if change:
+            previous_place_id = PlaceReview.objects.filter(pk=obj.pk).values_list("place_id", flat=True).first()
+        super().save_model(request, obj, form, change)
+        place_ids = {obj.place_id, previous_place_id} - {None}
+        rebuild_place_ratings(place_ids=place_ids)
+        touch_places(place_ids)
+
+    def delete_model(self, request, obj):
+        place_id = obj.place_id
+        super().delete_model(request, obj)
+        rebuild_place_ratings(place_ids=[place_id])
+        touch_places([place_id])
+
+    def delete_queryset(self, request, queryset):
+        place_ids = set(queryset.values_list("place_id", flat=True))
+        super().delete_queryset(request, queryset)
+        rebuild_place_ratings(place_ids=place_ids)
+        touch_places(place_ids)
+
+
+@admin.register(PushJob)
+class PushJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "status", "attempts", "sent", "failed", "removed", "created_at", "finished_at")
+    list_filter = ("status",)
+
+
+@admin.register(PlaceImportJob)
+class PlaceImportJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "file_format", "status", "attempts", "created_at", "finished_at")
+    list_filter = ("status",)
+
+
+@admin.register(GeocodeCacheEntry)
+class GeocodeCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ("normalized_address", "lat", "lng", "provider", "fetched_at")
+    search_fields = ("normalized_address",)
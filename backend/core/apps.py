@@ -7,3 +7,9 @@ class CoreConfig(AppConfig):
     Определяет настройки для основного приложения с логикой работы с местами и отзывами
     """
     name = 'core'
+
+    def ready(self):
+        """
+        @brief Подключение обработчиков сигналов приложения
+        """
+        from . import signals  # noqa: F401
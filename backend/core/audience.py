@@ -0,0 +1,198 @@
+import math
+
+from django.db.models import F, Q, Value
+
+from .geo import METERS_PER_DEGREE_LAT, bbox_around, parse_radius
+from .models import PlaceObject, PushSubscription
+
+
+PREFERENCE_LIST_FIELDS = ("notification_types", "infrastructure_types", "metros")
+PREFERENCE_MAX_ITEMS = 50
+
+
+def _parse_string_list(value, name):
+    """
+    @brief Парсинг списка строк из настроек подписки
+    @param value Список строк (или строка через запятую)
+    @param name Имя поля для сообщения об ошибке
+    @return list Список уникальных непустых строк
+    """
+    if value in (None, ""):
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, (list, tuple)):
+        raise ValueError(f"{name} must be a list of strings")
+    items = []
+    for item in value:
+        item = str(item).strip()
+        if item and item not in items:
+            items.append(item)
+    if len(items) > PREFERENCE_MAX_ITEMS:
+        raise ValueError(f"{name} must contain at most {PREFERENCE_MAX_ITEMS} items")
+    return items
+
+
+def parse_subscription_preferences(data):
+    """
+    @brief Парсинг настроек адресной рассылки подписки
+    Пустой список или отсутствующая область означают "без ограничения"
+    @param data Словарь {notification_types, infrastructure_types, metros, area: {lat, lng, radius}}
+    @return dict Значения полей PushSubscription
+    """
+    if not isinstance(data, dict):
+        raise ValueError("preferences must be an object")
+
+    fields = {name: _parse_string_list(data.get(name), name) for name in PREFERENCE_LIST_FIELDS}
+
+    area = data.get("area")
+    fields.update({
+        "area_lat": None,
+        "area_lng": None,
+        "area_radius_m": None,
+        "area_min_lat": None,
+        "area_max_lat": None,
+        "area_min_lng": None,
+        "area_max_lng": None,
+    })
+    if area:
+        if not isinstance(area, dict):
+            raise ValueError("area must be an object with lat, lng and radius")
+        try:
+            lat = float(area.get("lat"))
+            lng = float(area.get("lng"))
+        except (TypeError, ValueError):
+            raise ValueError("area lat and lng must be numbers")
+        if not (-90 <= lat <= 90) or not (-180 <= lng <= 180):
+            raise ValueError("area lat and lng must be within valid coordinate ranges")
+        radius = parse_radius(area.get("radius"))
+        min_lng, min_lat, max_lng, max_lat = bbox_around(lat, lng, radius)
+        fields.update({
+            "area_lat": lat,
+            "area_lng": lng,
+            "area_radius_m": radius,
+            "area_min_lat": min_lat,
+            "area_max_lat": max_lat,
+            "area_min_lng": min_lng,
+            "area_max_lng": max_lng,
+        })
+    return fields
+
+
+def serialize_subscription_preferences(subscription):
+    """
+    @brief Сериализация настроек адресной рассылки подписки
+    @param subscription Подписка
+    @return dict Настройки в формате parse_subscription_preferences
+    """
+    preferences = {name: getattr(subscription, name) for name in PREFERENCE_LIST_FIELDS}
+    preferences["area"] = None
+    if subscription.area_radius_m is not None:
+        preferences["area"] = {
+            "lat": subscription.area_lat,
+            "lng": subscription.area_lng,
+            "radius": subscription.area_radius_m,
+        }
+    return preferences
+
+
+def build_place_audience(place):
+    """
+    @brief Критерии аудитории уведомления о месте
+    Сохраняются в задании рассылки, чтобы аудитория не зависела от последующих правок места
+    @param place Объект места
+    @return dict Тип инфраструктуры, станции метро и координаты места
+    """
+    return {
+        "place_id": place.id,
+        "infrastructure_type": place.infrastructure_type,
+        "metros": list(place.metros or []),
+        "lat": place.lat,
+        "lng": place.lng,
+    }
+
+
+def _list_matches(field, values):
+    """
+    @brief Условие "предпочтение не задано или пересекается со значениями"
+    Проверка вхождения обслуживается GIN-индексом (jsonb_path_ops) по полю
+    @param field Имя JSON-поля со списком
+    @param values Значения уведомления
+    @return Q Условие фильтрации
+    """
+    condition = Q(**{field: []})
+    for value in values:
+        if value:
+            condition |= Q(**{f"{field}__contains": [value]})
+    return condition
+
+
+def _area_distance_sq(lat, lng):
+    """
+    @brief Квадрат расстояния от центра области подписки до точки (в метрах²)
+    Равнопромежуточное приближение, достаточное для радиусов до NEAR_MAX_RADIUS_M
+    @param lat Широта места
+    @param lng Долгота места
+    @return Expression Выражение для аннотации запроса
+    """
+    lng_scale = math.cos(math.radians(lat))
+    return (
+        (F("area_lat") - Value(lat)) * (F("area_lat") - Value(lat))
+        + (F("area_lng") - Value(lng)) * (F("area_lng") - Value(lng)) * Value(lng_scale * lng_scale)
+    ) * Value(METERS_PER_DEGREE_LAT * METERS_PER_DEGREE_LAT)
+
+
+def _area_matches(lat, lng):
+    """
+    @brief Условие "точка попадает в область подписки"
+    Описанный прямоугольник области сравнивается по индексированным полям area_*,
+    затем расстояние проверяется по аннотации area_distance_sq
+    @param lat Широта места
+    @param lng Долгота места
+    @return Q Условие фильтрации
+    """
+    return Q(
+        area_min_lat__lte=lat,
+        area_max_lat__gte=lat,
+        area_min_lng__lte=lng,
+        area_max_lng__gte=lng,
+        area_distance_sq__lte=F("area_radius_m") * F("area_radius_m"),
+    )
+
+
+def select_push_audience(audience=None, notification_types=None):
+    """
+    @brief Выбор подписчиков уведомления запросом к БД
+    Подписка подходит, если каждое заданное в ней предпочтение совпадает с уведомлением:
+    тип уведомления, тип инфраструктуры места и расположение (станция метро
+    или попадание в область). Без критериев аудитории (общие объявления
+    модератора) проверяется только тип уведомления
+    @param audience Критерии аудитории (build_place_audience) или None
+    @param notification_types Типы уведомления
+    @return QuerySet Подходящие подписки
+    """
+    subscriptions = PushSubscription.objects.filter(
+        _list_matches("notification_types", notification_types or []),
+    )
+    if not audience:
+        return subscriptions
+
+    subscriptions = subscriptions.filter(
+        _list_matches("infrastructure_types", [audience.get("infrastructure_type")]),
+    )
+
+    location = Q(metros=[], area_radius_m__isnull=True)
+    for metro in audience.get("metros") or []:
+        location |= Q(metros__contains=[metro])
+    lat = audience.get("lat")
+    lng = audience.get("lng")
+    if (lat is None or lng is None) and audience.get("place_id"):
+        # Координаты могли определиться отложенным геокодированием после постановки рассылки.
+        lat, lng = (
+            PlaceObject.objects.filter(id=audience["place_id"]).values_list("lat", "lng").first()
+            or (None, None)
+        )
+    if lat is not None and lng is not None:
+        subscriptions = subscriptions.alias(area_distance_sq=_area_distance_sq(lat, lng))
+        location |= _area_matches(lat, lng)
+    return subscriptions.filter(location)
@@ -0,0 +1,77 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils.http import quote_etag
+
+from .models import PlaceObject
+
+
+CATALOGUE_VERSION_CACHE_KEY = "catalogue:version"
+
+
+def _compute_catalogue_version():
+    """
+    @brief Вычисление версии каталога по БД
+    @return tuple Кортеж (время последнего изменения или None, количество мест)
+    """
+    summary = PlaceObject.objects.aggregate(last_modified=Max("updated_at"), count=Count("id"))
+    return summary["last_modified"], summary["count"]
+
+
+def get_catalogue_version():
+    """
+    @brief Дешевая версия каталога мест
+    Любая запись места или отзыва сдвигает updated_at места, удаление меняет количество,
+    поэтому пара (max(updated_at), count) меняется при любом изменении каталога.
+    Значение хранится в кэше и сбрасывается сигналами записи (core.signals); TTL
+    ограничивает устаревание в других процессах при локальном кэше без общего бэкенда
+    @return tuple Кортеж (время последнего изменения или None, количество мест)
+    """
+    version = cache.get(CATALOGUE_VERSION_CACHE_KEY)
+    if version is None:
+        version = _compute_catalogue_version()
+        cache.set(CATALOGUE_VERSION_CACHE_KEY, version, settings.CATALOGUE_VERSION_CACHE_TIMEOUT)
+    return version
+
+
+def invalidate_catalogue_version():
+    """
+    @brief Сброс закэшированной версии каталога
+    Ключи закэшированных ответов содержат версию, поэтому после сброса они
+    перестают использоваться и вытесняются по TTL
+    """
+    cache.delete(CATALOGUE_VERSION_CACHE_KEY)
+
+
+def build_etag(*parts):
+    """
+    @brief Построение сильного ETag из составных частей версии ответа
+    @param parts Значения, от которых зависит тело ответа
+    @return str ETag в кавычках
+    """
+    source = "|".join(str(part) for part in parts)
+    return quote_etag(hashlib.sha1(source.encode("utf-8")).hexdigest())
+
+
+def get_cached_payload(namespace, version_key, builder, timeout=None):
+    """
+    @brief Получение сериализованного ответа из кэша или построение и сохранение его
+    @param namespace Пространство имен ключа (например, "objects")
+    @param version_key Строка, однозначно определяющая содержимое (ETag или версия с параметрами)
+    @param builder Функция без аргументов, строящая данные при промахе
+    @param timeout Время жизни записи в секундах (по умолчанию CATALOGUE_CACHE_TIMEOUT)
+    @return object Данные ответа
+    """
+    digest = hashlib.sha1(str(version_key).encode("utf-8")).hexdigest()
+    cache_key = f"catalogue:{namespace}:{digest}"
+    payload = cache.get(cache_key)
+    if payload is None:
+        payload = builder()
+        cache.set(
+            cache_key,
+            payload,
+            settings.CATALOGUE_CACHE_TIMEOUT if timeout is None else timeout,
+        )
+    return payload
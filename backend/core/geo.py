@@ -0,0 +1,264 @@
+import math
+
+from django.db.models import Avg, Count, F, Min, Q, Value
+from django.db.models.functions import Floor
+
+
+# Размер ячейки кластеризации: тайл 256px делится на 4x4 ячейки (~64px на экране).
+CLUSTER_CELLS_PER_TILE = 4
+CLUSTER_MIN_ZOOM = 0
+CLUSTER_MAX_ZOOM = 21
+CLUSTER_FLAG_FIELDS = ("sign_language", "subtitles", "ramps", "braille")
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_M / 180
+NEAR_DEFAULT_RADIUS_M = 2000
+NEAR_MAX_RADIUS_M = 50000
+NEAR_DEFAULT_LIMIT = 20
+NEAR_MAX_LIMIT = 100
+
+
+def _parse_float_list(value, expected_count, name):
+    """
+    @brief Парсинг списка чисел из строки через запятую
+    @param value Строка вида "a,b,..."
+    @param expected_count Ожидаемое количество чисел
+    @param name Имя параметра для сообщения об ошибке
+    @return list Список чисел
+    """
+    parts = [item.strip() for item in str(value or "").split(",")]
+    if len(parts) != expected_count:
+        raise ValueError(f"{name} must contain {expected_count} comma-separated numbers")
+    try:
+        return [float(item) for item in parts]
+    except ValueError:
+        raise ValueError(f"{name} must contain {expected_count} comma-separated numbers")
+
+
+def parse_bbox(value):
+    """
+    @brief Парсинг прямоугольника видимой области карты
+    @param value Строка "minLng,minLat,maxLng,maxLat"
+    @return tuple Кортеж (min_lng, min_lat, max_lng, max_lat)
+    """
+    min_lng, min_lat, max_lng, max_lat = _parse_float_list(value, 4, "bbox")
+    if not (-90 <= min_lat <= max_lat <= 90) or not (-180 <= min_lng <= max_lng <= 180):
+        raise ValueError("bbox must be minLng,minLat,maxLng,maxLat within valid coordinate ranges")
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def filter_bbox(queryset, bbox):
+    """
+    @brief Фильтрация мест по прямоугольнику координат
+    Диапазонный запрос по lat/lng обслуживается составным индексом place_lat_lng_idx
+    @param queryset Исходный набор мест
+    @param bbox Кортеж (min_lng, min_lat, max_lng, max_lat)
+    @return QuerySet Места внутри прямоугольника
+    """
+    min_lng, min_lat, max_lng, max_lat = bbox
+    return queryset.filter(
+        lat__gte=min_lat,
+        lat__lte=max_lat,
+        lng__gte=min_lng,
+        lng__lte=max_lng,
+    )
+
+
+def parse_zoom(value):
+    """
+    @brief Парсинг уровня масштаба карты
+    @param value Значение параметра zoom
+    @return int Уровень масштаба в пределах [CLUSTER_MIN_ZOOM, CLUSTER_MAX_ZOOM]
+    """
+    try:
+        zoom = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("zoom must be an integer")
+    if not CLUSTER_MIN_ZOOM <= zoom <= CLUSTER_MAX_ZOOM:
+        raise ValueError(f"zoom must be from {CLUSTER_MIN_ZOOM} to {CLUSTER_MAX_ZOOM}")
+    return zoom
+
+
+def cluster_cell_size(zoom):
+    """
+    @brief Размер ячейки сетки кластеризации в градусах для уровня масштаба
+    @param zoom Уровень масштаба карты
+    @return float Сторона ячейки в градусах
+    """
+    return 360.0 / (2 ** zoom) / CLUSTER_CELLS_PER_TILE
+
+
+def snap_bbox_to_grid(bbox, cell_size):
+    """
+    @brief Расширение прямоугольника до границ ячеек сетки
+    Соседние запросы при панорамировании попадают в одинаковые ключи кэша
+    @param bbox Кортеж (min_lng, min_lat, max_lng, max_lat)
+    @param cell_size Сторона ячейки в градусах
+    @return tuple Выровненный по сетке прямоугольник
+    """
+    min_lng, min_lat, max_lng, max_lat = bbox
+    return (
+        max(math.floor(min_lng / cell_size) * cell_size, -180.0),
+        max(math.floor(min_lat / cell_size) * cell_size, -90.0),
+        min(math.ceil(max_lng / cell_size) * cell_size, 180.0),
+        min(math.ceil(max_lat / cell_size) * cell_size, 90.0),
+    )
+
+
+def cluster_places(queryset, zoom):
+    """
+    @brief Кластеризация мест по сетке на стороне БД
+    Места группируются по ячейкам одним GROUP BY запросом; для каждой ячейки
+    возвращаются центроид, количество мест и количество мест с каждым признаком доступности
+    @param queryset Набор мест (уже отфильтрованный)
+    @param zoom Уровень масштаба карты
+    @return list Список кластеров
+    """
+    cell_size = cluster_cell_size(zoom)
+    flag_counts = {
+        f"{flag}_count": Count("id", filter=Q(**{flag: True}))
+        for flag in CLUSTER_FLAG_FIELDS
+    }
+    rows = (
+        queryset.filter(lat__isnull=False, lng__isnull=False)
+        .order_by()
+        .annotate(
+            cell_x=Floor(F("lng") / Value(cell_size)),
+            cell_y=Floor(F("lat") / Value(cell_size)),
+        )
+        .values("cell_x", "cell_y")
+        .annotate(
+            count=Count("id"),
+            lat=Avg("lat"),
+            lng=Avg("lng"),
+            place_id=Min("id"),
+            **flag_counts,
+        )
+        .order_by("cell_y", "cell_x")
+    )
+
+    clusters = []
+    for row in rows:
+        cluster = {
+            "lat": row["lat"],
+            "lng": row["lng"],
+            "count": row["count"],
+            "flags": {flag: row[f"{flag}_count"] for flag in CLUSTER_FLAG_FIELDS},
+        }
+        if row["count"] == 1:
+            cluster["id"] = row["place_id"]
+        clusters.append(cluster)
+    return clusters
+
+
+def parse_point(value):
+    """
+    @brief Парсинг точки на карте
+    @param value Строка "lat,lng"
+    @return tuple Кортеж (lat, lng)
+    """
+    lat, lng = _parse_float_list(value, 2, "near")
+    if not (-90 <= lat <= 90) or not (-180 <= lng <= 180):
+        raise ValueError("near must be lat,lng within valid coordinate ranges")
+    return lat, lng
+
+
+def parse_radius(value):
+    """
+    @brief Парсинг радиуса поиска ближайших мест
+    @param value Радиус в метрах
+    @return float Радиус в пределах (0, NEAR_MAX_RADIUS_M]
+    """
+    if value in (None, ""):
+        return float(NEAR_DEFAULT_RADIUS_M)
+    try:
+        radius = float(value)
+    except (TypeError, ValueError):
+        raise ValueError("radius must be a number of meters")
+    if not 0 < radius <= NEAR_MAX_RADIUS_M:
+        raise ValueError(f"radius must be from 0 to {NEAR_MAX_RADIUS_M} meters")
+    return radius
+
+
+def parse_near_limit(value):
+    """
+    @brief Парсинг количества возвращаемых ближайших мест
+    @param value Значение параметра limit
+    @return int Количество мест в пределах [1, NEAR_MAX_LIMIT]
+    """
+    if value in (None, ""):
+        return NEAR_DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("limit must be a positive integer")
+    if limit < 1:
+        raise ValueError("limit must be a positive integer")
+    return min(limit, NEAR_MAX_LIMIT)
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """
+    @brief Расстояние по дуге большого круга между двумя точками
+    @return float Расстояние в метрах
+    """
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bbox_around(lat, lng, radius_m):
+    """
+    @brief Прямоугольник, описанный вокруг круга заданного радиуса
+    @param lat Широта центра
+    @param lng Долгота центра
+    @param radius_m Радиус в метрах
+    @return tuple Кортеж (min_lng, min_lat, max_lng, max_lat)
+    """
+    d_lat = radius_m / METERS_PER_DEGREE_LAT
+    cos_lat = math.cos(math.radians(lat))
+    d_lng = 180.0 if cos_lat < 1e-6 else min(radius_m / (METERS_PER_DEGREE_LAT * cos_lat), 180.0)
+    return (
+        max(lng - d_lng, -180.0),
+        max(lat - d_lat, -90.0),
+        min(lng + d_lng, 180.0),
+        min(lat + d_lat, 90.0),
+    )
+
+
+def nearest_places(queryset, lat, lng, radius_m, limit):
+    """
+    @brief Поиск ближайших мест в радиусе от точки
+    Кандидаты отбираются диапазонным запросом по индексу place_lat_lng_idx
+    (описанный вокруг круга прямоугольник) и упорядочиваются в БД по
+    равнопромежуточному приближению расстояния; точное расстояние по гаверсинусу
+    и отсечение по радиусу считаются в Python, поэтому работает на любой СУБД без PostGIS
+    @param queryset Набор мест (уже отфильтрованный)
+    @param lat Широта точки
+    @param lng Долгота точки
+    @param radius_m Радиус поиска в метрах
+    @param limit Максимальное количество мест
+    @return list Список пар (место, расстояние в метрах), по возрастанию расстояния
+    """
+    lng_scale = math.cos(math.radians(lat))
+    candidates = (
+        filter_bbox(queryset, bbox_around(lat, lng, radius_m))
+        .annotate(
+            approx_distance=(
+                (F("lat") - Value(lat)) * (F("lat") - Value(lat))
+                + (F("lng") - Value(lng)) * (F("lng") - Value(lng)) * Value(lng_scale * lng_scale)
+            ),
+        )
+        .order_by("approx_distance", "id")
+    )
+    # Запас по количеству кандидатов покрывает погрешность приближенной сортировки.
+    results = []
+    for place in candidates[:limit * 2]:
+        distance = haversine_m(lat, lng, place.lat, place.lng)
+        if distance <= radius_m:
+            results.append((place, distance))
+    results.sort(key=lambda item: item[1])
+    return results[:limit]
@@ -0,0 +1,472 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from .catalogue import invalidate_catalogue_version
+from .models import GeocodeCacheEntry, PlaceObject
+
+
+GEOCODER_PROVIDER = "yandex"
+
+
+class GeocoderError(Exception):
+    """
+    @brief Временная ошибка геокодера (сеть, таймаут, ответ 5xx)
+    Такой результат не кэшируется, запрос можно повторить позже
+    """
+
+
+def normalize_address(address):
+    """
+    @brief Нормализация адреса для ключа кэша геокодирования
+    @param address Адрес
+    @return str Адрес в нижнем регистре без лишних пробелов и знаков препинания по краям
+    """
+    value = str(address or "").casefold().replace("ё", "е")
+    value = re.sub(r"\s+", " ", value)
+    value = re.sub(r"\s*,\s*", ", ", value)
+    return value.strip(" ,.;")
+
+
+def _get_api_key():
+    """
+    @brief Ключ Yandex Geocoder API из окружения
+    @return str Ключ или пустая строка
+    """
+    return (
+        os.getenv("YANDEX_GEOCODER_API_KEY", "").strip()
+        or os.getenv("VITE_YANDEX_GEOCODER_API_KEY", "").strip()
+    )
+
+
+def fetch_geocode(address):
+    """
+    @brief Запрос координат адреса у Yandex Geocoder API (без кэша)
+    Адрес геокодера задается настройкой GEOCODER_URL, что позволяет подменить его
+    локальной заглушкой
+    @param address Адрес для геокодирования
+    @return tuple|None Кортеж (широта, долгота) или None, если адрес не найден
+    @throws GeocoderError При сетевой ошибке, таймауте или ошибке сервиса
+    """
+    api_key = _get_api_key()
+    if not api_key:
+        raise GeocoderError("YANDEX_GEOCODER_API_KEY is not configured")
+
+    query = urlencode(
+        {
+            "apikey": api_key,
+            "geocode": address,
+            "format": "json",
+            "lang": "ru_RU",
+        }
+    )
+
+    try:
+        with urlopen(f"{settings.GEOCODER_URL}?{query}", timeout=settings.GEOCODER_TIMEOUT) as response:
+            payload = json.loads(response.read().decode("utf-8"))
+    except HTTPError as exc:
+        raise GeocoderError(f"Geocoder responded with HTTP {exc.code}")
+    except (URLError, TimeoutError, OSError) as exc:
+        raise GeocoderError(str(exc))
+    except ValueError:
+        raise GeocoderError("Geocoder returned invalid JSON")
+
+    members = (
+        payload.get("response", {})
+        .get("GeoObjectCollection", {})
+        .get("featureMember", [])
+    )
+    if not members:
+        return None
+
+    point_pos = (
+        members[0]
+        .get("GeoObject", {})
+        .get("Point", {})
+        .get("pos", "")
+    )
+    if not point_pos:
+        return None
+
+    try:
+        lon_str, lat_str = point_pos.split()
+        return float(lat_str), float(lon_str)
+    except (ValueError, TypeError):
+        return None
+
+
+class _GeocodeLRU:
+    """
+    @brief Потокобезопасный LRU-кэш результатов геокодирования в памяти процесса
+    Хранит пары (координаты или None, момент истечения по time.monotonic() или None)
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        @brief Получение результата из кэша
+        @param key Нормализованный адрес
+        @return tuple Кортеж (найден ли результат, координаты или None)
+        """
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return False, None
+            coords, expires_at = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._items[key]
+                return False, None
+            self._items.move_to_end(key)
+            return True, coords
+
+    def set(self, key, coords, ttl=None):
+        """
+        @brief Сохранение результата в кэше
+        @param key Нормализованный адрес
+        @param coords Координаты или None для отрицательного результата
+        @param ttl Время жизни в секундах (None - без ограничения)
+        """
+        if self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._items[key] = (coords, expires_at)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        """
+        @brief Очистка кэша
+        """
+        with self._lock:
+            self._items.clear()
+
+
+_memory_cache = _GeocodeLRU(settings.GEOCODE_LRU_SIZE)
+
+
+def _entry_result(entry, now):
+    """
+    @brief Результат из записи кэша в БД с учетом срока жизни отрицательных результатов
+    @param entry Запись GeocodeCacheEntry
+    @param now Текущее время
+    @return tuple Кортеж (актуальна ли запись, координаты или None, оставшийся TTL в секундах или None)
+    """
+    if entry.lat is not None and entry.lng is not None:
+        return True, (entry.lat, entry.lng), None
+    expires_at = entry.fetched_at + timedelta(seconds=settings.GEOCODE_NEGATIVE_TTL)
+    if expires_at <= now:
+        return False, None, None
+    return True, None, (expires_at - now).total_seconds()
+
+
+def get_cached_geocode(address):
+    """
+    @brief Поиск адреса в кэше геокодирования (память процесса, затем таблица БД)
+    @param address Адрес
+    @return tuple Кортеж (найден ли результат, координаты или None)
+    """
+    key = normalize_address(address)
+    if not key:
+        return True, None
+
+    found, coords = _memory_cache.get(key)
+    if found:
+        return True, coords
+
+    entry = GeocodeCacheEntry.objects.filter(normalized_address=key).first()
+    if entry is None:
+        return False, None
+    fresh, coords, ttl = _entry_result(entry, timezone.now())
+    if not fresh:
+        return False, None
+    _memory_cache.set(key, coords, ttl)
+    return True, coords
+
+
+def store_geocode(address, coords):
+    """
+    @brief Сохранение результата геокодирования в кэше (БД и память процесса)
+    @param address Адрес
+    @param coords Координаты или None, если адрес не найден
+    """
+    key = normalize_address(address)
+    if key:
+        store_geocodes({key: coords})
+
+
+def get_cached_geocodes(addresses):
+    """
+    @brief Пакетный поиск адресов в кэше геокодирования
+    Адреса, которых нет в памяти процесса, ищутся в таблице одним запросом
+    @param addresses Список адресов
+    @return dict Словарь {нормализованный адрес: координаты или None} для найденных адресов
+    """
+    results = {}
+    missing = set()
+    for address in addresses:
+        key = normalize_address(address)
+        if not key or key in results:
+            continue
+        found, coords = _memory_cache.get(key)
+        if found:
+            results[key] = coords
+        else:
+            missing.add(key)
+
+    now = timezone.now()
+    for entry in GeocodeCacheEntry.objects.filter(normalized_address__in=missing):
+        fresh, coords, ttl = _entry_result(entry, now)
+        if fresh:
+            results[entry.normalized_address] = coords
+            _memory_cache.set(entry.normalized_address, coords, ttl)
+    return results
+
+
+def store_geocodes(results):
+    """
+    @brief Пакетное сохранение результатов геокодирования в кэше
+    Записи вставляются одним INSERT ... ON CONFLICT (normalized_address) DO UPDATE
+    @param results Словарь {нормализованный адрес: координаты или None}
+    """
+    now = timezone.now()
+    GeocodeCacheEntry.objects.bulk_create(
+        [
+            GeocodeCacheEntry(
+                normalized_address=key,
+                lat=coords[0] if coords else None,
+                lng=coords[1] if coords else None,
+                provider=GEOCODER_PROVIDER,
+                fetched_at=now,
+            )
+            for key, coords in results.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["normalized_address"],
+        update_fields=["lat", "lng", "provider", "fetched_at"],
+    )
+    for key, coords in results.items():
+        _memory_cache.set(key, coords, None if coords else settings.GEOCODE_NEGATIVE_TTL)
+
+
+def resolve_address(address):
+    """
+    @brief Геокодирование адреса через кэш
+    Повторные адреса обслуживаются из памяти процесса или таблицы кэша без
+    обращения к геокодеру. Отрицательный результат кэшируется на GEOCODE_NEGATIVE_TTL
+    @param address Адрес
+    @return tuple|None Кортеж (широта, долгота) или None, если адрес не найден
+    @throws GeocoderError При временной ошибке геокодера (результат не кэшируется)
+    """
+    found, coords = get_cached_geocode(address)
+    if found:
+        return coords
+    coords = fetch_geocode(str(address).strip())
+    store_geocode(address, coords)
+    return coords
+
+
+def geocode_address(address):
+    """
+    @brief Геокодирование адреса через кэш без исключений
+    @param address Адрес для геокодирования
+    @return tuple|None Кортеж (широта, долгота) или None, если адрес не найден или геокодер недоступен
+    """
+    if not str(address or "").strip():
+        return None
+    try:
+        return resolve_address(address)
+    except GeocoderError:
+        return None
+
+
+def locate_address(address, deferred=False):
+    """
+    @brief Определение координат адреса при сохранении места
+    В отложенном режиме используется только кэш; если адреса в кэше нет, место
+    получает статус pending и координаты определяет воркер run_geocode_worker.
+    В синхронном режиме временная ошибка геокодера также откладывает геокодирование
+    @param address Адрес места
+    @param deferred Не обращаться к геокодеру в текущем запросе
+    @return tuple Кортеж (координаты или None, статус геокодирования PlaceObject.GEOCODE_*)
+    """
+    if not normalize_address(address):
+        return None, PlaceObject.GEOCODE_NONE
+
+    found, coords = get_cached_geocode(address)
+    if not found:
+        if not _get_api_key():
+            return None, PlaceObject.GEOCODE_NONE
+        if deferred:
+            return None, PlaceObject.GEOCODE_PENDING
+        try:
+            coords = resolve_address(address)
+        except GeocoderError:
+            return None, PlaceObject.GEOCODE_PENDING
+    return coords, PlaceObject.GEOCODE_RESOLVED if coords else PlaceObject.GEOCODE_NOT_FOUND
+
+
+def claim_pending_geocodes(limit):
+    """
+    @brief Захват мест, ожидающих геокодирования
+    Строки блокируются через SELECT ... FOR UPDATE SKIP LOCKED, захваченным местам
+    сдвигается geocode_next_attempt_at на GEOCODE_LEASE_TIMEOUT, поэтому другие
+    воркеры их не берут, а после падения воркера места захватываются повторно
+    @param limit Максимальное количество мест
+    @return list Список мест (загружены только id, address и geocode_attempts)
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        places = list(
+            PlaceObject.objects.select_for_update(skip_locked=True)
+            .filter(geocode_status=PlaceObject.GEOCODE_PENDING, geocode_next_attempt_at__lte=now)
+            .only("id", "address", "geocode_attempts")
+            .order_by("geocode_next_attempt_at", "id")[:limit]
+        )
+        if places:
+            PlaceObject.objects.filter(id__in=[place.id for place in places]).update(
+                geocode_attempts=F("geocode_attempts") + 1,
+                geocode_next_attempt_at=now + timedelta(seconds=settings.GEOCODE_LEASE_TIMEOUT),
+            )
+    for place in places:
+        place.geocode_attempts += 1
+    return places
+
+
+def _retry_delay(attempts):
+    """
+    @brief Задержка перед повторной попыткой геокодирования (экспоненциальный рост)
+    @param attempts Номер выполненной попытки (с 1)
+    @return timedelta Задержка
+    """
+    delay = settings.GEOCODE_RETRY_BASE_DELAY * (2 ** (attempts - 1))
+    return timedelta(seconds=min(delay, settings.GEOCODE_RETRY_MAX_DELAY))
+
+
+def process_pending_geocode(place):
+    """
+    @brief Геокодирование одного захваченного места
+    Результат записывается, только если место все еще ожидает геокодирования того же
+    адреса (адрес могли изменить, пока воркер ждал ответа геокодера)
+    @param place Место из claim_pending_geocodes
+    @return str Новый статус геокодирования
+    """
+    pending = PlaceObject.objects.filter(
+        id=place.id,
+        address=place.address,
+        geocode_status=PlaceObject.GEOCODE_PENDING,
+    )
+    try:
+        coords = resolve_address(place.address)
+    except GeocoderError:
+        if place.geocode_attempts < settings.GEOCODE_MAX_ATTEMPTS:
+            pending.update(geocode_next_attempt_at=timezone.now() + _retry_delay(place.geocode_attempts))
+            return PlaceObject.GEOCODE_PENDING
+        fields = {"geocode_status": PlaceObject.GEOCODE_FAILED}
+    else:
+        fields = {"geocode_status": PlaceObject.GEOCODE_RESOLVED if coords else PlaceObject.GEOCODE_NOT_FOUND}
+        if coords:
+            fields.update(lat=coords[0], lng=coords[1])
+
+    # Статус и координаты входят в ответы API, поэтому сдвигается версия каталога.
+    if pending.update(geocode_next_attempt_at=None, updated_at=Now(), **fields):
+        invalidate_catalogue_version()
+    return fields["geocode_status"]
+
+
+def geocode_places_batch(places, concurrency=1, bucket=None):
+    """
+    @brief Пакетное геокодирование мест без координат
+    Кэш проверяется одним запросом на пакет, каждый уникальный адрес запрашивается
+    у геокодера один раз; запросы выполняются параллельно (не больше concurrency)
+    с ограничением частоты bucket. Потоки только обращаются к геокодеру, запись в БД
+    выполняется в вызывающем потоке одним INSERT в кэш и одним UPDATE мест
+    @param places Список мест (id, address, lat, lng)
+    @param concurrency Количество параллельных запросов к геокодеру
+    @param bucket Ограничитель частоты запросов (core.rate_limit.TokenBucket) или None
+    @return dict Статистика: resolved, not_found, errors, cache_hits, requests
+    """
+    addresses = {}
+    for place in places:
+        key = normalize_address(place.address)
+        if key:
+            addresses.setdefault(key, place.address.strip())
+
+    results = get_cached_geocodes(addresses.values())
+    misses = [key for key in addresses if key not in results]
+
+    def fetch(key):
+        if bucket is not None:
+            bucket.acquire()
+        try:
+            return key, fetch_geocode(addresses[key]), None
+        except GeocoderError as exc:
+            return key, None, str(exc)
+
+    fetched = {}
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        for key, coords, error in executor.map(fetch, misses):
+            if error is None:
+                fetched[key] = coords
+            else:
+                errors[key] = error
+    if fetched:
+        store_geocodes(fetched)
+    results.update(fetched)
+
+    stats = {
+        "resolved": 0,
+        "not_found": 0,
+        "errors": 0,
+        "cache_hits": len(addresses) - len(misses),
+        "requests": len(misses),
+    }
+    now = timezone.now()
+    updated = []
+    for place in places:
+        key = normalize_address(place.address)
+        if not key:
+            continue
+        if key in errors:
+            stats["errors"] += 1
+            continue
+        coords = results.get(key)
+        if coords:
+            place.lat = place.lat if place.lat is not None else coords[0]
+            place.lng = place.lng if place.lng is not None else coords[1]
+            place.geocode_status = PlaceObject.GEOCODE_RESOLVED
+            stats["resolved"] += 1
+        else:
+            place.geocode_status = PlaceObject.GEOCODE_NOT_FOUND
+            stats["not_found"] += 1
+        place.geocode_next_attempt_at = None
+        place.updated_at = now
+        updated.append(place)
+
+    if updated:
+        PlaceObject.objects.bulk_update(
+            updated,
+            ["lat", "lng", "geocode_status", "geocode_next_attempt_at", "updated_at"],
+        )
+        invalidate_catalogue_version()
+    return stats
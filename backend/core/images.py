@@ -0,0 +1,319 @@
+import hashlib
+import io
+import posixpath
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models.functions import Now
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .catalogue import invalidate_catalogue_version
+from .media import describe_media_file
+from .media_cache import invalidate_media_cache
+from .models import PlaceObject
+
+
+IMAGE_VARIANT_DIR = "places/variants"
+# Форматы вариантов: WebP для браузеров, которые его принимают, JPEG - для остальных.
+IMAGE_VARIANT_FORMATS = (
+    ("webp", "WEBP", "image/webp"),
+    ("jpeg", "JPEG", "image/jpeg"),
+)
+IMAGE_VARIANT_CONTENT_TYPES = {name: content_type for name, _, content_type in IMAGE_VARIANT_FORMATS}
+
+
+class ImageVariantError(Exception):
+    """
+    @brief Ошибка построения вариантов изображения (файл не читается как изображение)
+    """
+
+
+def content_addressed_name(file):
+    """
+    @brief Имя файла по хэшу содержимого
+    Одинаковое содержимое получает одинаковое имя, измененное - новое, поэтому
+    URL изображения с этим именем можно кэшировать как неизменяемый
+    @param file Загружаемый файл
+    @return str Имя вида <sha256>.<расширение исходного файла>
+    """
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    extension = posixpath.splitext(file.name or "")[1].lower()
+    return f"{digest.hexdigest()}{extension}"
+
+
+def _has_alpha(image):
+    """
+    @brief Проверка наличия прозрачности у изображения
+    @param image Изображение Pillow
+    @return bool True, если у изображения есть альфа-канал или прозрачный цвет
+    """
+    return "A" in image.getbands() or "transparency" in image.info
+
+
+def _load_source(image_file, max_width):
+    """
+    @brief Загрузка исходного изображения для построения вариантов
+    Для JPEG декодирование сразу выполняется в уменьшенном масштабе (draft),
+    не меньшем max_width, что многократно ускоряет обработку фотографий с телефона
+    @param image_file Открытый файл изображения
+    @param max_width Наибольшая ширина варианта
+    @return Image Изображение в режиме RGB или RGBA с примененной EXIF-ориентацией
+    """
+    try:
+        image = Image.open(image_file)
+        image.draft("RGB", (max_width, max_width))
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    except (OSError, ValueError, Image.DecompressionBombError) as exc:
+        raise ImageVariantError(f"Cannot read image: {exc}")
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if _has_alpha(image) else "RGB")
+    return image
+
+
+def _encode(image, pil_format):
+    """
+    @brief Кодирование варианта изображения
+    @param image Изображение Pillow
+    @param pil_format Формат Pillow (WEBP или JPEG)
+    @return bytes Содержимое файла
+    """
+    buffer = io.BytesIO()
+    if pil_format == "JPEG":
+        if image.mode == "RGBA":
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        image.save(buffer, "JPEG", quality=settings.IMAGE_VARIANT_JPEG_QUALITY, optimize=True, progressive=True)
+    else:
+        image.save(buffer, "WEBP", quality=settings.IMAGE_VARIANT_WEBP_QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def _save_variants(source, storage, prefix, widths, square=False):
+    """
+    @brief Сохранение вариантов изображения заданных ширин в WebP и JPEG
+    Изображения не увеличиваются, поэтому ширины больше исходной сводятся к исходной
+    @param source Исходное изображение (_load_source)
+    @param storage Хранилище файлов
+    @param prefix Префикс имен файлов; имя варианта - <prefix>_<ширина>w.<расширение>
+    @param widths Ширины по возрастанию
+    @param square Обрезать по центру до квадрата
+    @return list Варианты {width, height, format, name, size, modified}, упорядоченные по ширине
+    """
+    variants = []
+    done = set()
+    for width in widths:
+        width = min(width, min(source.size) if square else source.width)
+        if width in done:
+            continue
+        done.add(width)
+        if square:
+            height = width
+            resized = ImageOps.fit(source, (width, width), Image.LANCZOS)
+        else:
+            height = max(1, round(source.height * width / source.width))
+            resized = source if width == source.width else source.resize((width, height), Image.LANCZOS)
+        for name, pil_format, _ in IMAGE_VARIANT_FORMATS:
+            extension = "jpg" if name == "jpeg" else name
+            content = _encode(resized, pil_format)
+            saved_name = storage.save(f"{prefix}_{width}w.{extension}", ContentFile(content))
+            variants.append({
+                "width": width,
+                "height": height,
+                "format": name,
+                "name": saved_name,
+                **describe_media_file(storage, saved_name, size=len(content), modified=timezone.now()),
+            })
+    return variants
+
+
+def generate_image_variants(image_field):
+    """
+    @brief Построение уменьшенных вариантов изображения места
+    Для каждой ширины IMAGE_VARIANT_WIDTHS сохраняются WebP и JPEG
+    @param image_field Файловое поле с исходным изображением
+    @return list Варианты {width, height, format, name, size, modified}, упорядоченные по ширине
+    """
+    widths = sorted({width for width in settings.IMAGE_VARIANT_WIDTHS if width > 0})
+    if not widths:
+        return []
+
+    with image_field.open("rb") as image_file:
+        source = _load_source(image_file, widths[-1])
+    stem = posixpath.splitext(posixpath.basename(image_field.name))[0]
+    return _save_variants(source, image_field.storage, f"{IMAGE_VARIANT_DIR}/{stem}", widths)
+
+
+def generate_avatar_variants(upload, storage, prefix):
+    """
+    @brief Нормализация аватара: квадратные варианты AVATAR_SIZES в WebP и JPEG
+    Исходный файл в хранилище не сохраняется
+    @param upload Загруженный файл
+    @param storage Хранилище файлов
+    @param prefix Префикс имен файлов вариантов
+    @return list Варианты {width, height, format, name, size, modified}, упорядоченные по размеру
+    """
+    sizes = sorted({size for size in settings.AVATAR_SIZES if size > 0})
+    if not sizes:
+        raise ImageVariantError("AVATAR_SIZES is empty")
+    source = _load_source(upload, sizes[-1])
+    return _save_variants(source, storage, prefix, sizes, square=True)
+
+
+def delete_image_variants(variants, storage):
+    """
+    @brief Удаление файлов вариантов изображения
+    Ошибки хранилища игнорируются, как и при удалении исходного изображения;
+    файлы удаляются и из дискового кэша
+    @param variants Список вариантов
+    @param storage Хранилище файлов
+    """
+    for variant in variants or []:
+        try:
+            storage.delete(variant["name"])
+        except Exception:
+            pass
+        invalidate_media_cache(variant["name"])
+
+
+def refresh_place_image_variants(place):
+    """
+    @brief Перестроение вариантов и метаданных изображения места
+    Варианты сохраняются условным UPDATE по имени исходного файла (и снимают место
+    с очереди воркера): если изображение успели заменить, построенные варианты
+    удаляются, а место остается в очереди для нового файла. Прежние варианты удаляются
+    после сохранения новых. Если файл не читается как изображение, вариантов нет
+    и отдается оригинал
+    @param place Объект места
+    @return list Сохраненные варианты
+    """
+    previous = list(place.image_variants or [])
+    storage = place.image.storage
+    variants = []
+    image_meta = None
+    if place.image:
+        image_meta = describe_media_file(storage, place.image.name)
+        try:
+            variants = generate_image_variants(place.image)
+        except ImageVariantError:
+            variants = []
+
+    image_filter = {"image": place.image.name} if place.image else {}
+    updated = PlaceObject.objects.filter(id=place.id, **image_filter).update(
+        image_variants=variants,
+        image_meta=image_meta,
+        image_variants_pending_at=None,
+        updated_at=Now(),
+    )
+    if not updated:
+        delete_image_variants(variants, storage)
+        return previous
+
+    place.image_variants = variants
+    place.image_meta = image_meta
+    invalidate_catalogue_version()
+    delete_image_variants(
+        [variant for variant in previous if variant["name"] not in {item["name"] for item in variants}],
+        storage,
+    )
+    return variants
+
+
+def queue_place_image_variants(place):
+    """
+    @brief Постановка построения вариантов изображения места в очередь
+    Варианты и метаданные прежнего файла сбрасываются сразу, чтобы до работы воркера
+    отдавался оригинал нового изображения, а не варианты старого. Вызывается до
+    сохранения места; файлы прежних вариантов удаляет вызывающий код после сохранения
+    @param place Объект места с новым изображением
+    @return list Прежние варианты
+    """
+    previous = list(place.image_variants or [])
+    place.image_variants = []
+    place.image_meta = None
+    place.image_variants_pending_at = timezone.now() if place.image else None
+    return previous
+
+
+def claim_pending_image_variants(limit):
+    """
+    @brief Захват мест, ожидающих построения вариантов изображения
+    Строки блокируются через SELECT ... FOR UPDATE SKIP LOCKED, захваченным местам
+    image_variants_pending_at сдвигается на IMAGE_VARIANT_LEASE_TIMEOUT, поэтому другие
+    воркеры их не берут, а после падения воркера места захватываются повторно
+    @param limit Максимальное количество мест
+    @return list Список мест (загружены только id, image и image_variants)
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        places = list(
+            PlaceObject.objects.select_for_update(skip_locked=True)
+            .filter(image_variants_pending_at__lte=now)
+            .only("id", "image", "image_variants")
+            .order_by("image_variants_pending_at", "id")[:limit]
+        )
+        if places:
+            PlaceObject.objects.filter(id__in=[place.id for place in places]).update(
+                image_variants_pending_at=now + timedelta(seconds=settings.IMAGE_VARIANT_LEASE_TIMEOUT),
+            )
+    return places
+
+
+def store_place_image_meta(place, variant, meta):
+    """
+    @brief Сохранение метаданных файла изображения, полученных при первом запросе
+    Нужно для изображений, загруженных до появления метаданных: следующие запросы
+    обслуживаются без обращения к хранилищу
+    @param place Объект места
+    @param variant Вариант изображения или None для исходного файла
+    @param meta Метаданные describe_media_file
+    """
+    places = PlaceObject.objects.filter(id=place.id, image=place.image.name)
+    if variant is None:
+        place.image_meta = meta
+        places.update(image_meta=meta)
+        return
+    place.image_variants = [
+        {**item, **meta} if item["name"] == variant["name"] else item
+        for item in place.image_variants
+    ]
+    places.update(image_variants=place.image_variants)
+
+
+def select_image_variant(variants, width, accepts_webp):
+    """
+    @brief Выбор варианта изображения для запрошенной ширины
+    Выбирается самый узкий вариант не уже запрошенной ширины, иначе самый широкий
+    @param variants Список вариантов
+    @param width Запрошенная ширина в пикселях
+    @param accepts_webp Клиент принимает WebP
+    @return dict|None Вариант или None, если вариантов нет
+    """
+    preferred = "webp" if accepts_webp else "jpeg"
+    candidates = [variant for variant in variants or [] if variant["format"] == preferred]
+    if not candidates:
+        return None
+    candidates.sort(key=lambda variant: variant["width"])
+    for variant in candidates:
+        if variant["width"] >= width:
+            return variant
+    return candidates[-1]
+
+
+def build_image_srcset(base_url, variants):
+    """
+    @brief Построение атрибута srcset по вариантам изображения
+    @param base_url URL изображения (object_image) с параметром key
+    @param variants Список вариантов
+    @return str Значение srcset или пустая строка без вариантов
+    """
+    widths = sorted({variant["width"] for variant in variants or []})
+    separator = "&" if "?" in base_url else "?"
+    return ", ".join(f"{base_url}{separator}w={width} {width}w" for width in widths)
@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from core.place_io import PLACE_IO_FORMATS, export_places
+
+
+class Command(BaseCommand):
+    help = "Export places (and reviews) to NDJSON or CSV using a server-side cursor."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default="-",
+            help="Output file path, or - for standard output.",
+        )
+        parser.add_argument(
+            "--format",
+            choices=PLACE_IO_FORMATS,
+            help="Output format (default: detected from the file extension, ndjson for stdout).",
+        )
+        parser.add_argument(
+            "--no-reviews",
+            action="store_true",
+            help="Do not include reviews (CSV never includes them).",
+        )
+
+    def handle(self, *args, **options):
+        output = options["output"]
+        file_format = options["format"] or ("csv" if output.lower().endswith(".csv") else "ndjson")
+        lines = export_places(file_format, include_reviews=not options["no_reviews"])
+
+        if output == "-":
+            sys.stdout.writelines(lines)
+            return
+
+        count = 0
+        with open(output, "w", encoding="utf-8", newline="") as stream:
+            for line in lines:
+                stream.write(line)
+                count += 1
+        if file_format == "csv":
+            count -= 1
+        self.stdout.write(self.style.SUCCESS(f"Exported {count} places to {output}."))
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.images import refresh_place_image_variants
+from core.models import PlaceObject
+
+
+class Command(BaseCommand):
+    help = "Generate resized WebP/JPEG variants for place images that do not have them yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regenerate variants for all place images (e.g. after changing IMAGE_VARIANT_WIDTHS).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Number of places loaded at a time.",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be a positive integer.")
+
+        places = PlaceObject.objects.exclude(image="").exclude(image__isnull=True)
+        if not options["force"]:
+            places = places.filter(image_variants=[])
+        places = places.only("id", "image", "image_variants").order_by("id")
+
+        processed = 0
+        without_variants = 0
+        last_id = 0
+        while True:
+            batch = list(places.filter(id__gt=last_id)[:options["batch_size"]])
+            if not batch:
+                break
+            for place in batch:
+                if not refresh_place_image_variants(place):
+                    without_variants += 1
+                processed += 1
+            last_id = batch[-1].id
+            self.stdout.write(f"Processed {processed} images.")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated variants for {processed - without_variants} of {processed} images "
+                f"({without_variants} could not be read)."
+            )
+        )
@@ -0,0 +1,98 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from core.geocoding import geocode_places_batch
+from core.models import PlaceObject
+from core.rate_limit import TokenBucket
+
+
+class Command(BaseCommand):
+    help = (
+        "Geocode places without coordinates in batches. Results are committed per batch, "
+        "so an interrupted run resumes where it stopped when started again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=8,
+            help="Maximum number of parallel geocoder requests.",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=10.0,
+            help="Maximum geocoder requests per second (0 - unlimited).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="Number of places loaded and saved at a time.",
+        )
+        parser.add_argument(
+            "--retry-not-found",
+            action="store_true",
+            help="Also retry places previously marked as not found or failed.",
+        )
+        parser.add_argument(
+            "--start-id",
+            type=int,
+            default=0,
+            help="Skip places with a smaller or equal id.",
+        )
+
+    def handle(self, *args, **options):
+        if options["concurrency"] < 1 or options["batch_size"] < 1:
+            raise CommandError("--concurrency and --batch-size must be positive integers.")
+
+        places = (
+            PlaceObject.objects.filter(Q(lat__isnull=True) | Q(lng__isnull=True))
+            .exclude(address="")
+            .only("id", "address", "lat", "lng", "geocode_status")
+            .order_by("id")
+        )
+        if not options["retry_not_found"]:
+            places = places.exclude(
+                geocode_status__in=[PlaceObject.GEOCODE_NOT_FOUND, PlaceObject.GEOCODE_FAILED],
+            )
+
+        total = places.filter(id__gt=options["start_id"]).count()
+        self.stdout.write(f"{total} places to geocode.")
+
+        bucket = TokenBucket(options["rate"])
+        totals = {"resolved": 0, "not_found": 0, "errors": 0, "cache_hits": 0, "requests": 0}
+        processed = 0
+        last_id = options["start_id"]
+        started = time.monotonic()
+
+        while True:
+            batch = list(places.filter(id__gt=last_id)[:options["batch_size"]])
+            if not batch:
+                break
+            stats = geocode_places_batch(batch, concurrency=options["concurrency"], bucket=bucket)
+            for key, value in stats.items():
+                totals[key] += value
+            processed += len(batch)
+            last_id = batch[-1].id
+
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"{processed}/{total} places, last id {last_id}: "
+                f"{processed / elapsed:.1f} places/s, {totals['requests'] / elapsed:.1f} requests/s, "
+                f"{totals['cache_hits']} cache hits, {totals['errors']} errors"
+            )
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Resolved {totals['resolved']}, not found {totals['not_found']}, "
+                f"errors {totals['errors']} in {elapsed:.1f}s "
+                f"({totals['requests']} geocoder requests, {totals['cache_hits']} cache hits)."
+            )
+        )
+        if totals["errors"]:
+            self.stdout.write("Places with geocoder errors are retried on the next run.")
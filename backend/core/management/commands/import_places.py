@@ -0,0 +1,76 @@
+import sys
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.place_io import PLACE_IO_BATCH_SIZE, PLACE_IO_FORMATS, import_places
+
+
+class Command(BaseCommand):
+    help = "Import places and reviews from an NDJSON or CSV file in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Input file path, or - for standard input.")
+        parser.add_argument(
+            "--format",
+            choices=PLACE_IO_FORMATS,
+            help="Input format (default: detected from the file extension, ndjson for stdin).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=PLACE_IO_BATCH_SIZE,
+            help="Number of records saved per transaction.",
+        )
+        parser.add_argument(
+            "--skip-existing",
+            action="store_true",
+            help="Keep existing places with the same title and address unchanged.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["format"] or ("csv" if path.lower().endswith(".csv") else "ndjson")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be a positive integer.")
+
+        started = time.monotonic()
+
+        def report(stats):
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"{stats['places']} places, {stats['reviews']} reviews "
+                f"({stats['places'] / elapsed:.0f} places/s), {stats['error_count']} invalid records"
+            )
+
+        if path == "-":
+            stats = self._import(sys.stdin, file_format, options, report)
+        else:
+            if not Path(path).is_file():
+                raise CommandError(f"File not found: {path}")
+            with open(path, encoding="utf-8-sig", newline="") as stream:
+                stats = self._import(stream, file_format, options, report)
+
+        for error in stats["errors"]:
+            self.stderr.write(error)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Processed {stats['places']} places, added {stats['reviews']} reviews "
+                f"in {time.monotonic() - started:.1f}s, skipped {stats['error_count']} invalid records."
+            )
+        )
+        if stats["without_coords"]:
+            self.stdout.write(
+                f"{stats['without_coords']} records have no coordinates; places still missing them are queued "
+                "for run_geocode_worker (or run geocode_places to fill them in now)."
+            )
+
+    def _import(self, stream, file_format, options, report):
+        return import_places(
+            stream,
+            file_format,
+            batch_size=options["batch_size"],
+            update_existing=not options["skip_existing"],
+            progress=report,
+        )
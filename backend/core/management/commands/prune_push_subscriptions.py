@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.push import prune_push_subscriptions
+
+
+class Command(BaseCommand):
+    help = "Delete push subscriptions that have not been refreshed within the configured window."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.PUSH_SUBSCRIPTION_MAX_AGE_DAYS,
+            help="Maximum subscription age in days since the last refresh (default: PUSH_SUBSCRIPTION_MAX_AGE_DAYS).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count stale subscriptions, do not delete them.",
+        )
+
+    def handle(self, *args, **options):
+        days = options["days"]
+        if days < 1:
+            raise CommandError("--days must be a positive integer.")
+
+        count = prune_push_subscriptions(days, dry_run=options["dry_run"])
+        if options["dry_run"]:
+            self.stdout.write(f"{count} push subscriptions are older than {days} days.")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Deleted {count} push subscriptions older than {days} days."))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.ratings import rebuild_place_ratings
+
+
+class Command(BaseCommand):
+    help = "Rebuild or verify stored place rating counters from the reviews table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report mismatched counters, do not fix them.",
+        )
+
+    def handle(self, *args, **options):
+        check_only = options["check"]
+        mismatches = rebuild_place_ratings(dry_run=check_only)
+
+        for place, stored, expected in mismatches:
+            self.stdout.write(
+                f"Place {place.id} ({place.title}): stored sum/count {stored[0]}/{stored[1]}, "
+                f"actual {expected[0]}/{expected[1]}"
+            )
+
+        if check_only and mismatches:
+            raise CommandError(f"{len(mismatches)} place rating counters are out of date.")
+
+        if check_only:
+            self.stdout.write(self.style.SUCCESS("All place rating counters are consistent."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt rating counters for {len(mismatches)} places."))
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.geocoding import claim_pending_geocodes, process_pending_geocode
+
+
+class Command(BaseCommand):
+    help = "Resolve coordinates of places waiting for deferred geocoding."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process currently due places and exit.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=20,
+            help="Maximum number of places claimed at a time.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=2.0,
+            help="Seconds to wait when nothing is pending.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            places = claim_pending_geocodes(options["batch_size"])
+            for place in places:
+                geocode_status = process_pending_geocode(place)
+                self.stdout.write(
+                    f"Place {place.id}: {geocode_status} (attempt {place.geocode_attempts})"
+                )
+
+            if options["once"] and not places:
+                return
+            if not places:
+                time.sleep(options["poll_interval"])
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.images import claim_pending_image_variants, refresh_place_image_variants
+
+
+class Command(BaseCommand):
+    help = "Generate resized variants for newly uploaded place images."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process currently queued images and exit.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10,
+            help="Maximum number of places claimed at a time.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=2.0,
+            help="Seconds to wait when nothing is queued.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            places = claim_pending_image_variants(options["batch_size"])
+            for place in places:
+                try:
+                    variants = refresh_place_image_variants(place)
+                except Exception as exc:
+                    # Место захватывается повторно после IMAGE_VARIANT_LEASE_TIMEOUT.
+                    self.stderr.write(f"Place {place.id}: {exc}")
+                    continue
+                self.stdout.write(f"Place {place.id}: {len(variants)} variants")
+
+            if options["once"] and not places:
+                return
+            if not places:
+                time.sleep(options["poll_interval"])
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.place_io import PLACE_IO_BATCH_SIZE, claim_place_import_job, process_place_import_job
+
+
+class Command(BaseCommand):
+    help = "Process queued place import jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process currently queued jobs and exit.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=PLACE_IO_BATCH_SIZE,
+            help="Number of records saved per transaction.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=5.0,
+            help="Seconds to wait when the queue is empty.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_place_import_job()
+            if job is not None:
+                job = process_place_import_job(job, batch_size=options["batch_size"])
+                stats = job.stats or {}
+                self.stdout.write(
+                    f"Import job {job.id}: {job.status}, {stats.get('places', 0)} places, "
+                    f"{stats.get('reviews', 0)} reviews, {stats.get('error_count', 0)} invalid records"
+                )
+                continue
+
+            if options["once"]:
+                return
+            time.sleep(options["poll_interval"])
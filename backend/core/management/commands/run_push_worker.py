@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.push import claim_push_jobs, process_push_job
+
+
+class Command(BaseCommand):
+    help = "Process queued push notification jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process currently due jobs and exit.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10,
+            help="Maximum number of jobs claimed at a time.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=2.0,
+            help="Seconds to wait when the queue is empty.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            jobs = claim_push_jobs(options["batch_size"])
+            for job in jobs:
+                job = process_push_job(job)
+                self.stdout.write(
+                    f"Push job {job.id}: {job.status}, sent {job.sent}, "
+                    f"failed {job.failed}, removed {job.removed}"
+                )
+
+            if options["once"] and not jobs:
+                return
+            if not jobs:
+                time.sleep(options["poll_interval"])
@@ -0,0 +1,215 @@
+import hashlib
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from .media_cache import get_media_cache
+
+
+MEDIA_DELIVERY_STREAM = "stream"
+MEDIA_DELIVERY_ACCEL = "accel"
+MEDIA_DELIVERY_REDIRECT = "redirect"
+
+# Версионированный URL (имя файла в хранилище не переиспользуется) можно кэшировать навсегда.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+MEDIA_STREAM_CHUNK_SIZE = 64 * 1024
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def describe_media_file(storage, name, size=None, modified=None):
+    """
+    @brief Метаданные файла в хранилище для условных запросов и Range
+    Недостающие значения запрашиваются у хранилища (для S3 - HEAD без чтения содержимого)
+    @param storage Хранилище файлов
+    @param name Имя файла в хранилище
+    @param size Размер в байтах, если известен
+    @param modified Время изменения, если известно
+    @return dict Метаданные {size, modified (ISO 8601)}
+    """
+    if size is None:
+        size = storage.size(name)
+    if modified is None:
+        try:
+            modified = storage.get_modified_time(name)
+        except (NotImplementedError, OSError):
+            modified = timezone.now()
+    return {"size": size, "modified": modified.isoformat()}
+
+
+def media_etag(name, meta):
+    """
+    @brief Сильный ETag файла по имени и метаданным
+    Имя может освободиться и быть занято другим файлом после удаления, поэтому
+    в ETag входят также размер и время изменения
+    @param name Имя файла в хранилище
+    @param meta Метаданные describe_media_file
+    @return str ETag в кавычках
+    """
+    source = f"{name}:{meta['size']}:{meta['modified']}"
+    return quote_etag(hashlib.sha256(source.encode("utf-8")).hexdigest()[:32])
+
+
+def media_public_url(storage, name):
+    """
+    @brief Публичный URL файла в хранилище
+    @param storage Хранилище файлов
+    @param name Имя файла в хранилище
+    @return str MEDIA_PUBLIC_BASE_URL + имя файла или URL, который строит хранилище
+    """
+    if settings.MEDIA_PUBLIC_BASE_URL:
+        return f"{settings.MEDIA_PUBLIC_BASE_URL.rstrip('/')}/{quote(name)}"
+    return storage.url(name)
+
+
+def _parse_range(header, size):
+    """
+    @brief Разбор заголовка Range с одним диапазоном байтов
+    @param header Значение заголовка Range
+    @param size Размер файла
+    @return tuple|str|None (начало, конец включительно), "unsatisfiable" или None,
+    если заголовок не поддерживается (несколько диапазонов, другие единицы) и отдается весь файл
+    """
+    match = _RANGE_RE.match(header.replace(" ", ""))
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        length = int(last)
+        if not length or not size:
+            return "unsatisfiable"
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return "unsatisfiable"
+    return start, end
+
+
+def _if_range_matches(request, etag, last_modified):
+    """
+    @brief Проверка заголовка If-Range
+    @param request HTTP-запрос
+    @param etag ETag файла
+    @param last_modified Время изменения файла (timestamp)
+    @return bool True, если диапазон можно отдать (заголовка нет или версия совпадает)
+    """
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if not if_range:
+        return True
+    if if_range.startswith(('"', "W/")):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _open_range(storage, name, start, end):
+    """
+    @brief Открытие части файла
+    Для S3 (S3File с объектом obj) выполняется GET с заголовком Range, поэтому из
+    хранилища читаются только запрошенные байты; для остальных хранилищ файл
+    открывается со смещением
+    @param storage Хранилище файлов
+    @param name Имя файла в хранилище
+    @param start Первый байт
+    @param end Последний байт (включительно)
+    @return file Файлоподобный объект, начиная с байта start
+    """
+    media_file = storage.open(name, "rb")
+    s3_object = getattr(media_file, "obj", None)
+    if s3_object is not None:
+        media_file.close()
+        return s3_object.get(Range=f"bytes={start}-{end}")["Body"]
+    media_file.seek(start)
+    return media_file
+
+
+def _iter_file(media_file, length):
+    """
+    @brief Потоковое чтение length байт из файла
+    @param media_file Файлоподобный объект
+    @param length Количество байт
+    @return generator Части файла
+    """
+    try:
+        while length > 0:
+            chunk = media_file.read(min(MEDIA_STREAM_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        media_file.close()
+
+
+def media_file_response(request, storage, name, meta, content_type, cache_control="no-cache"):
+    """
+    @brief Ответ с файлом из хранилища в режиме MEDIA_DELIVERY
+    Условные запросы (If-None-Match, If-Modified-Since) обрабатываются по сохраненным
+    метаданным без обращения к хранилищу. Режимы отдачи:
+    stream - файл отдается воркером Django через дисковый кэш MEDIA_CACHE_DIR (если
+    задан), Range при промахе кэша обслуживается частичным чтением из хранилища;
+    accel - nginx получает заголовок X-Accel-Redirect и сам отдает файл (и диапазоны)
+    из внутреннего location MEDIA_ACCEL_REDIRECT_PREFIX, воркер освобождается сразу;
+    redirect - клиент перенаправляется на публичный URL бакета
+    @param request HTTP-запрос
+    @param storage Хранилище файлов
+    @param name Имя файла в хранилище
+    @param meta Метаданные describe_media_file
+    @param content_type MIME-тип файла
+    @param cache_control Значение заголовка Cache-Control
+    @return HttpResponse Файл, его часть, 304/412, 416, X-Accel-Redirect или перенаправление
+    """
+    etag = media_etag(name, meta)
+    last_modified = int(parse_datetime(meta["modified"]).timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+    if response is None:
+        delivery = settings.MEDIA_DELIVERY
+        if delivery == MEDIA_DELIVERY_ACCEL:
+            response = HttpResponse(content_type=content_type)
+            response["X-Accel-Redirect"] = f"{settings.MEDIA_ACCEL_REDIRECT_PREFIX}{quote(name)}"
+        elif delivery == MEDIA_DELIVERY_REDIRECT:
+            response = HttpResponseRedirect(media_public_url(storage, name))
+        else:
+            size = meta["size"]
+            byte_range = None
+            if request.META.get("HTTP_RANGE") and _if_range_matches(request, etag, last_modified):
+                byte_range = _parse_range(request.META["HTTP_RANGE"], size)
+            cache = get_media_cache()
+            if byte_range == "unsatisfiable":
+                response = HttpResponse(status=416)
+                response["Content-Range"] = f"bytes */{size}"
+            elif byte_range:
+                start, end = byte_range
+                # Диапазон читается из дискового кэша, при промахе - частичным чтением
+                # из хранилища без заполнения кэша.
+                media_file = cache.open(name, etag) if cache else None
+                if media_file:
+                    media_file.seek(start)
+                else:
+                    media_file = _open_range(storage, name, start, end)
+                response = StreamingHttpResponse(
+                    _iter_file(media_file, end - start + 1),
+                    status=206,
+                    content_type=content_type,
+                )
+                response["Content-Range"] = f"bytes {start}-{end}/{size}"
+                response["Content-Length"] = str(end - start + 1)
+            else:
+                media_file = None
+                if cache:
+                    media_file = cache.open(name, etag) or cache.fill(storage, name, etag)
+                response = FileResponse(media_file or storage.open(name, "rb"), content_type=content_type)
+                response["Content-Length"] = str(size)
+            response["Accept-Ranges"] = "bytes"
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    response["Cache-Control"] = cache_control
+    return response
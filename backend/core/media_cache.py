@@ -0,0 +1,252 @@
+import fcntl
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+
+
+MEDIA_CACHE_CHUNK_SIZE = 256 * 1024
+# Доля лимита, до которой сокращается кэш при вытеснении, чтобы не вытеснять на каждом заполнении.
+MEDIA_CACHE_EVICT_TO = 0.9
+# Незавершенные заполнения старше этого срока (секунды) считаются брошенными и удаляются.
+MEDIA_CACHE_STALE_FILL_AGE = 3600
+_FILL_PREFIX = ".fill-"
+_LOCK_NAME = ".evict.lock"
+# Счетчик суммарного размера файлов кэша: позволяет не обходить каталог при каждом заполнении.
+_SIZE_NAME = ".size"
+
+
+class MediaDiskCache:
+    """
+    @brief Ограниченный по размеру дисковый кэш файлов хранилища (read-through)
+    Общий для всех воркеров узла: файлы лежат в каталоге root, заполнение атомарно
+    (временный файл + os.replace), суммарный размер ведется счетчиком в файле .size.
+    Вытеснение по давности последнего чтения (mtime) запускается, только когда счетчик
+    превышает лимит, и выполняется под файловой блокировкой; обход каталога заодно
+    исправляет расхождение счетчика. Файл кэшируется под версией (ETag), поэтому
+    повторно занятое имя в хранилище не отдает старое содержимое
+    """
+
+    def __init__(self, root, max_bytes):
+        """
+        @brief Создание кэша
+        @param root Каталог кэша
+        @param max_bytes Максимальный суммарный размер файлов в байтах
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def _entry_dir(self, name):
+        """
+        @brief Каталог версий файла
+        @param name Имя файла в хранилище
+        @return str Путь каталога
+        """
+        return os.path.join(self.root, hashlib.sha256(name.encode("utf-8")).hexdigest())
+
+    def _entry_path(self, name, version):
+        """
+        @brief Путь версии файла в кэше
+        @param name Имя файла в хранилище
+        @param version Версия файла (ETag)
+        @return str Путь файла
+        """
+        return os.path.join(self._entry_dir(name), hashlib.sha256(version.encode("utf-8")).hexdigest()[:32])
+
+    def open(self, name, version):
+        """
+        @brief Открытие файла из кэша
+        Время изменения файла обновляется и служит временем последнего чтения для LRU
+        @param name Имя файла в хранилище
+        @param version Версия файла (ETag)
+        @return file|None Открытый файл или None при промахе
+        """
+        path = self._entry_path(name, version)
+        try:
+            cached_file = open(path, "rb")
+        except OSError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return cached_file
+
+    def fill(self, storage, name, version):
+        """
+        @brief Загрузка файла из хранилища в кэш
+        Файл пишется во временный файл в том же каталоге и переименовывается,
+        поэтому параллельные читатели никогда не видят недописанный файл
+        @param storage Хранилище файлов
+        @param name Имя файла в хранилище
+        @param version Версия файла (ETag)
+        @return file|None Открытый файл из кэша или None, если записать в кэш не удалось
+        """
+        path = self._entry_path(name, version)
+        temp_path = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            descriptor, temp_path = tempfile.mkstemp(prefix=_FILL_PREFIX, dir=os.path.dirname(path))
+            with os.fdopen(descriptor, "wb") as temp_file, storage.open(name, "rb") as source:
+                shutil.copyfileobj(source, temp_file, MEDIA_CACHE_CHUNK_SIZE)
+            size = os.path.getsize(temp_path)
+            replaced = os.path.exists(path)
+            os.replace(temp_path, path)
+            temp_path = None
+            cached_file = open(path, "rb")
+        except OSError:
+            # Каталог удален параллельной инвалидацией или диск недоступен - читаем мимо кэша.
+            return None
+        finally:
+            if temp_path:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+        total = self._add_size(0 if replaced else size)
+        if total is not None and total > self.max_bytes:
+            self.evict()
+        return cached_file
+
+    def invalidate(self, name):
+        """
+        @brief Удаление всех версий файла из кэша
+        @param name Имя файла в хранилище
+        """
+        directory = self._entry_dir(name)
+        removed = 0
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                continue
+            if not entry.name.startswith(_FILL_PREFIX):
+                removed += size
+        shutil.rmtree(directory, ignore_errors=True)
+        if removed:
+            self._add_size(-removed)
+
+    def total_size(self):
+        """
+        @brief Суммарный размер файлов кэша по счетчику
+        @return int|None Размер в байтах или None, если счетчик недоступен
+        """
+        return self._add_size(0)
+
+    def _add_size(self, delta):
+        """
+        @brief Изменение счетчика суммарного размера под файловой блокировкой
+        @param delta Изменение в байтах
+        @return int|None Новое значение или None, если счетчик недоступен
+        """
+        try:
+            descriptor = os.open(os.path.join(self.root, _SIZE_NAME), os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError:
+            return None
+        with os.fdopen(descriptor, "r+") as size_file:
+            fcntl.flock(size_file, fcntl.LOCK_EX)
+            try:
+                total = int(size_file.read() or 0)
+            except ValueError:
+                total = 0
+            total = max(total + delta, 0)
+            if delta:
+                size_file.seek(0)
+                size_file.truncate()
+                size_file.write(str(total))
+            return total
+
+    def evict(self):
+        """
+        @brief Вытеснение давно не читавшихся файлов при превышении лимита
+        Выполняется одним воркером за раз; если блокировка занята, вытеснение пропускается.
+        Счетчик размера исправляется по фактическому обходу с сохранением изменений,
+        внесенных параллельными заполнениями во время обхода
+        """
+        try:
+            lock_file = open(os.path.join(self.root, _LOCK_NAME), "a")
+        except OSError:
+            return
+        with lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return
+            counted = self.total_size()
+            entries = []
+            total = 0
+            now = time.time()
+            for directory, _, files in os.walk(self.root):
+                for file_name in files:
+                    path = os.path.join(directory, file_name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    if file_name.startswith(_FILL_PREFIX):
+                        if now - stat.st_mtime > MEDIA_CACHE_STALE_FILL_AGE:
+                            self._remove(path)
+                        continue
+                    if file_name in (_LOCK_NAME, _SIZE_NAME):
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+                    total += stat.st_size
+            if total > self.max_bytes:
+                entries.sort()
+                target = self.max_bytes * MEDIA_CACHE_EVICT_TO
+                for _, size, path in entries:
+                    if total <= target:
+                        break
+                    if self._remove(path):
+                        total -= size
+            if counted is not None:
+                self._add_size(total - counted)
+
+    @staticmethod
+    def _remove(path):
+        """
+        @brief Удаление файла кэша и его каталога, если он опустел
+        Уже открытые читателями файлы дочитываются: удаляется только запись каталога
+        @param path Путь файла
+        @return bool True, если файл удален
+        """
+        try:
+            os.remove(path)
+        except OSError:
+            return False
+        try:
+            os.rmdir(os.path.dirname(path))
+        except OSError:
+            pass
+        return True
+
+
+def get_media_cache():
+    """
+    @brief Дисковый кэш файлов хранилища из настроек
+    @return MediaDiskCache|None Кэш или None, если MEDIA_CACHE_DIR не задан
+    """
+    if not settings.MEDIA_CACHE_DIR:
+        return None
+    return MediaDiskCache(settings.MEDIA_CACHE_DIR, settings.MEDIA_CACHE_MAX_SIZE_MB * 1024 * 1024)
+
+
+def invalidate_media_cache(*names):
+    """
+    @brief Удаление файлов из дискового кэша при замене или удалении в хранилище
+    @param names Имена файлов в хранилище (пустые значения пропускаются)
+    """
+    cache = get_media_cache()
+    if cache is None:
+        return
+    for name in names:
+        if name:
+            cache.invalidate(name)
@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_placeobject_event_discount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='placeobject',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='placeobject',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunSQL(
+            sql="""
+            UPDATE core_placeobject AS place
+            SET rating_sum = summary.rating_sum,
+                rating_count = summary.rating_count
+            FROM (
+                SELECT place_id, SUM(rating) AS rating_sum, COUNT(*) AS rating_count
+                FROM core_placereview
+                GROUP BY place_id
+            ) AS summary
+            WHERE summary.place_id = place.id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_placeobject_rating_summary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='placeobject',
+            index=models.Index(fields=['-created_at', '-id'], name='place_created_id_idx'),
+        ),
+    ]
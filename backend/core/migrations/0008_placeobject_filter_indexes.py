@@ -0,0 +1,36 @@
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_placeobject_created_id_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='placeobject',
+            index=models.Index(fields=['infrastructure_type', '-created_at', '-id'], name='place_infra_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='placeobject',
+            index=models.Index(condition=models.Q(('sign_language', True)), fields=['-created_at', '-id'], name='place_sign_language_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='placeobject',
+            index=models.Index(condition=models.Q(('subtitles', True)), fields=['-created_at', '-id'], name='place_subtitles_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='placeobject',
+            index=models.Index(condition=models.Q(('ramps', True)), fields=['-created_at', '-id'], name='place_ramps_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='placeobject',
+            index=models.Index(condition=models.Q(('braille', True)), fields=['-created_at', '-id'], name='place_braille_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='placeobject',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['metros'], name='place_metros_gin', opclasses=['jsonb_path_ops']),
+        ),
+    ]
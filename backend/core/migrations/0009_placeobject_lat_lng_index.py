@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_placeobject_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='placeobject',
+            index=models.Index(fields=['lat', 'lng'], name='place_lat_lng_idx'),
+        ),
+    ]
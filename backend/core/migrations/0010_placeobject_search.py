@@ -0,0 +1,63 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.functions.comparison
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+SEARCH_VECTOR_TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION core_placeobject_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('russian', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(NEW.metros::text, '')), 'B') ||
+        setweight(to_tsvector('russian', coalesce(NEW.infrastructure_type, '') || ' ' || coalesce(NEW.address, '')), 'B') ||
+        setweight(to_tsvector('russian', coalesce(NEW.description, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_placeobject_search_vector_trigger
+BEFORE INSERT OR UPDATE OF title, metros, infrastructure_type, address, description, search_vector
+ON core_placeobject
+FOR EACH ROW EXECUTE FUNCTION core_placeobject_search_vector_update();
+
+UPDATE core_placeobject SET search_vector = NULL;
+"""
+
+DROP_SEARCH_VECTOR_TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS core_placeobject_search_vector_trigger ON core_placeobject;
+DROP FUNCTION IF EXISTS core_placeobject_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_placeobject_lat_lng_index'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='placeobject',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            sql=SEARCH_VECTOR_TRIGGER_SQL,
+            reverse_sql=DROP_SEARCH_VECTOR_TRIGGER_SQL,
+        ),
+        migrations.AddIndex(
+            model_name='placeobject',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='place_search_vector_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='placeobject',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='place_title_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='placeobject',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.comparison.Cast('metros', models.TextField()), name='gin_trgm_ops'), name='place_metros_trgm'),
+        ),
+    ]
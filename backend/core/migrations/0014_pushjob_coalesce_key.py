@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_pushsubscription_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pushjob',
+            name='coalesce_key',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='pushjob',
+            index=models.Index(condition=models.Q(('status', 'pending'), models.Q(('coalesce_key', ''), _negated=True)), fields=['coalesce_key'], name='pushjob_pending_coalesce_idx'),
+        ),
+    ]
@@ -0,0 +1,85 @@
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_pushjob_coalesce_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pushjob',
+            name='audience',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pushsubscription',
+            name='area_lat',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pushsubscription',
+            name='area_lng',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pushsubscription',
+            name='area_max_lat',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pushsubscription',
+            name='area_max_lng',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pushsubscription',
+            name='area_min_lat',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pushsubscription',
+            name='area_min_lng',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pushsubscription',
+            name='area_radius_m',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pushsubscription',
+            name='infrastructure_types',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='pushsubscription',
+            name='metros',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='pushsubscription',
+            name='notification_types',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddIndex(
+            model_name='pushsubscription',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['notification_types'], name='pushsub_types_gin', opclasses=['jsonb_path_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='pushsubscription',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['infrastructure_types'], name='pushsub_infra_gin', opclasses=['jsonb_path_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='pushsubscription',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['metros'], name='pushsub_metros_gin', opclasses=['jsonb_path_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='pushsubscription',
+            index=models.Index(condition=models.Q(('area_radius_m__isnull', False)), fields=['area_min_lat', 'area_max_lat', 'area_min_lng', 'area_max_lng'], name='pushsub_area_bbox_idx'),
+        ),
+    ]
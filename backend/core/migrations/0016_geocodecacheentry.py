@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_pushsubscription_preferences'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodeCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('normalized_address', models.CharField(max_length=255, unique=True)),
+                ('lat', models.FloatField(blank=True, null=True)),
+                ('lng', models.FloatField(blank=True, null=True)),
+                ('provider', models.CharField(max_length=32)),
+                ('fetched_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['-fetched_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_geocodecacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='placeobject',
+            name='geocode_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='placeobject',
+            name='geocode_next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='placeobject',
+            name='geocode_status',
+            field=models.CharField(blank=True, choices=[('', 'Not geocoded'), ('pending', 'Pending'), ('resolved', 'Resolved'), ('not_found', 'Not found'), ('failed', 'Failed')], default='', max_length=16),
+        ),
+        migrations.AddIndex(
+            model_name='placeobject',
+            index=models.Index(condition=models.Q(('geocode_status', 'pending')), fields=['geocode_next_attempt_at'], name='place_geocode_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_placeobject_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='placeobject',
+            name='image_meta',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
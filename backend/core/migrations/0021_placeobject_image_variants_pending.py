@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_placeimportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='placeobject',
+            name='image_variants_pending_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='placeobject',
+            index=models.Index(condition=models.Q(('image_variants_pending_at__isnull', False)), fields=['image_variants_pending_at'], name='place_image_pending_idx'),
+        ),
+    ]
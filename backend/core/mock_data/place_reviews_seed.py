@@ -3,6 +3,7 @@ from pathlib import Path
 from django.core.files import File
 
 from core.models import PlaceObject, PlaceReview
+from core.ratings import rebuild_place_ratings
 
 
 SEED_PLACES = [
@@ -210,6 +211,7 @@ def _apply_local_image(place: PlaceObject, image_local_path: str) -> None:
 
 
 def seed_place_objects_and_reviews() -> None:
+    seeded_place_ids = []
     for seed_item in SEED_PLACES:
         item = {
             k: v
@@ -226,6 +228,7 @@ def seed_place_objects_and_reviews() -> None:
             defaults=item,
         )
         _apply_local_image(place, image_local_path)
+        seeded_place_ids.append(place.id)
 
         for review_data in reviews:
             # Отзывы seed тоже добавляются без дублей по автору + тексту.
@@ -235,3 +238,6 @@ def seed_place_objects_and_reviews() -> None:
                 text=review_data['text'],
                 defaults={'rating': review_data.get('rating', 5)},
             )
+
+    # Отзывы создаются напрямую, поэтому сводку рейтинга пересчитываем одним проходом.
+    rebuild_place_ratings(place_ids=seeded_place_ids)
@@ -1,4 +1,10 @@
+import copy
+
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.functions import Cast
+from django.utils import timezone
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.conf import settings
 
@@ -19,17 +25,66 @@ class PlaceObject(models.Model):
     metros = models.JSONField(default=list, blank=True)
     image_url = models.URLField(blank=True)
     image = models.FileField(upload_to="places/", blank=True, null=True)
+    # Уменьшенные варианты изображения (core.images): [{width, height, format, name, size, modified}]
+    image_variants = models.JSONField(default=list, blank=True, editable=False)
+    # Размер и время изменения исходного файла (core.media.describe_media_file) для
+    # ответов на условные запросы и Range без обращения к хранилищу
+    image_meta = models.JSONField(null=True, blank=True, editable=False)
+    # Варианты изображения ждут воркера run_image_worker: время, с которого место можно
+    # захватить (при захвате сдвигается на IMAGE_VARIANT_LEASE_TIMEOUT); None - очереди нет
+    image_variants_pending_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     lat = models.FloatField(null=True, blank=True)
     lng = models.FloatField(null=True, blank=True)
 
+    # Состояние геокодирования адреса (core.geocoding): pending - координаты
+    # определяет воркер run_geocode_worker с повторами по geocode_next_attempt_at.
+    GEOCODE_NONE = ""
+    GEOCODE_PENDING = "pending"
+    GEOCODE_RESOLVED = "resolved"
+    GEOCODE_NOT_FOUND = "not_found"
+    GEOCODE_FAILED = "failed"
+    GEOCODE_STATUS_CHOICES = [
+        (GEOCODE_NONE, "Not geocoded"),
+        (GEOCODE_PENDING, "Pending"),
+        (GEOCODE_RESOLVED, "Resolved"),
+        (GEOCODE_NOT_FOUND, "Not found"),
+        (GEOCODE_FAILED, "Failed"),
+    ]
+    geocode_status = models.CharField(max_length=16, choices=GEOCODE_STATUS_CHOICES, blank=True, default=GEOCODE_NONE)
+    geocode_attempts = models.PositiveSmallIntegerField(default=0)
+    geocode_next_attempt_at = models.DateTimeField(null=True, blank=True)
+
     sign_language = models.BooleanField(default=False)
     subtitles = models.BooleanField(default=False)
     ramps = models.BooleanField(default=False)
     braille = models.BooleanField(default=False)
 
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+
+    # Поисковый вектор заполняется триггером БД (миграция 0010_placeobject_search).
+    search_vector = SearchVectorField(null=True, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
-    
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    # Сводка рейтинга обновляется только инкрементально (core.ratings), а поисковый
+    # вектор - триггером, поэтому обычное сохранение формы не должно их перезаписывать.
+    DB_MAINTAINED_FIELDS = ("rating_sum", "rating_count", "search_vector")
+    # Варианты изображения и результат геокодирования записывают воркеры через .update(),
+    # поэтому сохранение формы пишет их, только если они изменены в этом экземпляре.
+    WORKER_MAINTAINED_FIELDS = (
+        "image_variants",
+        "image_meta",
+        "image_variants_pending_at",
+        "lat",
+        "lng",
+        "geocode_status",
+        "geocode_attempts",
+        "geocode_next_attempt_at",
+    )
+
     class Meta:
         """
         @brief Метаданные модели PlaceObject
@@ -40,6 +95,53 @@ class PlaceObject(models.Model):
                 name="unique_place_title_address",
             )
         ]
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="place_created_id_idx"),
+            models.Index(fields=["lat", "lng"], name="place_lat_lng_idx"),
+            models.Index(
+                fields=["infrastructure_type", "-created_at", "-id"],
+                name="place_infra_created_idx",
+            ),
+            # Частичные индексы: признаки доступности фильтруются только по значению True.
+            models.Index(
+                fields=["-created_at", "-id"],
+                condition=models.Q(sign_language=True),
+                name="place_sign_language_idx",
+            ),
+            models.Index(
+                fields=["-created_at", "-id"],
+                condition=models.Q(subtitles=True),
+                name="place_subtitles_idx",
+            ),
+            models.Index(
+                fields=["-created_at", "-id"],
+                condition=models.Q(ramps=True),
+                name="place_ramps_idx",
+            ),
+            models.Index(
+                fields=["-created_at", "-id"],
+                condition=models.Q(braille=True),
+                name="place_braille_idx",
+            ),
+            models.Index(
+                fields=["geocode_next_attempt_at"],
+                condition=models.Q(geocode_status="pending"),
+                name="place_geocode_pending_idx",
+            ),
+            models.Index(
+                fields=["image_variants_pending_at"],
+                condition=models.Q(image_variants_pending_at__isnull=False),
+                name="place_image_pending_idx",
+            ),
+            GinIndex(fields=["metros"], opclasses=["jsonb_path_ops"], name="place_metros_gin"),
+            GinIndex(fields=["search_vector"], name="place_search_vector_gin"),
+            GinIndex(fields=["title"], opclasses=["gin_trgm_ops"], name="place_title_trgm"),
+            GinIndex(
+                OpClass(Cast("metros", models.TextField()), name="gin_trgm_ops"),
+                name="place_metros_trgm",
+            ),
+        ]
+
     def __str__(self):
         """
         @brief Возвращает строковое представление объекта места
@@ -47,6 +149,61 @@ class PlaceObject(models.Model):
         """
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        @brief Создание экземпляра из строки БД с запоминанием загруженных полей воркеров
+        @param db Псевдоним БД
+        @param field_names Имена загруженных полей
+        @param values Значения полей
+        @return PlaceObject Экземпляр места
+        """
+        instance = super().from_db(db, field_names, values)
+        instance._remember_worker_fields()
+        return instance
+
+    def _remember_worker_fields(self):
+        """
+        @brief Снимок загруженных значений WORKER_MAINTAINED_FIELDS (отложенные поля пропускаются)
+        """
+        self._loaded_worker_values = {
+            name: copy.deepcopy(self.__dict__[name])
+            for name in self.WORKER_MAINTAINED_FIELDS
+            if name in self.__dict__
+        }
+
+    def save(self, *args, **kwargs):
+        """
+        @brief Сохранение объекта места без перезаписи полей, которые ведут БД и воркеры
+        При обновлении существующей строки, как и в Django по умолчанию, пишутся только
+        загруженные (не отложенные) поля, кроме DB_MAINTAINED_FIELDS, чтобы не затереть
+        параллельные инкременты рейтинга и поисковый вектор. Поля WORKER_MAINTAINED_FIELDS
+        пишутся, только если их значение изменилось после загрузки
+        """
+        if not self._state.adding and kwargs.get("update_fields") is None and not kwargs.get("force_insert"):
+            deferred = self.get_deferred_fields()
+            loaded = getattr(self, "_loaded_worker_values", {})
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred
+                and field.name not in self.DB_MAINTAINED_FIELDS
+                and not (field.name in loaded and getattr(self, field.attname) == loaded[field.name])
+            ]
+        super().save(*args, **kwargs)
+        self._remember_worker_fields()
+
+    @property
+    def rating_avg(self):
+        """
+        @brief Средний рейтинг места по сохраненной сводке
+        @return float Средняя оценка, округленная до десятых, или 0 без отзывов
+        """
+        if not self.rating_count:
+            return 0
+        return round(self.rating_sum / self.rating_count, 1)
+
 
 class PlaceReview(models.Model):
     """
@@ -89,14 +246,38 @@ class PushSubscription(models.Model):
     endpoint = models.URLField(unique=True)
     p256dh = models.TextField()
     auth = models.TextField()
+
+    # Настройки адресной рассылки (core.audience); пустой список - без ограничения.
+    notification_types = models.JSONField(default=list, blank=True)
+    infrastructure_types = models.JSONField(default=list, blank=True)
+    metros = models.JSONField(default=list, blank=True)
+    area_lat = models.FloatField(null=True, blank=True)
+    area_lng = models.FloatField(null=True, blank=True)
+    area_radius_m = models.FloatField(null=True, blank=True)
+    # Описанный вокруг области прямоугольник для индексного отбора подписок.
+    area_min_lat = models.FloatField(null=True, blank=True)
+    area_max_lat = models.FloatField(null=True, blank=True)
+    area_min_lng = models.FloatField(null=True, blank=True)
+    area_max_lng = models.FloatField(null=True, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         """
         @brief Метаданные модели PushSubscription
         """
         ordering = ["-updated_at"]
+        indexes = [
+            GinIndex(fields=["notification_types"], opclasses=["jsonb_path_ops"], name="pushsub_types_gin"),
+            GinIndex(fields=["infrastructure_types"], opclasses=["jsonb_path_ops"], name="pushsub_infra_gin"),
+            GinIndex(fields=["metros"], opclasses=["jsonb_path_ops"], name="pushsub_metros_gin"),
+            models.Index(
+                fields=["area_min_lat", "area_max_lat", "area_min_lng", "area_max_lng"],
+                condition=models.Q(area_radius_m__isnull=False),
+                name="pushsub_area_bbox_idx",
+            ),
+        ]
 
     def __str__(self):
         """
@@ -104,3 +285,137 @@ class PushSubscription(models.Model):
         @return Строка с ID пользователя и началом эндпоинта
         """
         return f"{self.user.pk}: {self.endpoint[:60]}"
+
+
+class PushJob(models.Model):
+    """
+    @brief Модель задания рассылки push-уведомления
+    Хранит очередь рассылок в БД: представление ставит задание и сразу отвечает,
+    воркер run_push_worker отправляет уведомления с повторами и сохраняет статистику
+    """
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    payload = models.JSONField()
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    retry_subscription_ids = models.JSONField(default=list, blank=True)
+    # Ключ объединения: уведомления с одинаковым ключом, поставленные в пределах
+    # PUSH_COALESCE_WINDOW, объединяются в одно задание (например, "place:42")
+    coalesce_key = models.CharField(max_length=64, blank=True, default="")
+    # Критерии аудитории (core.audience.build_place_audience); None - всем подписчикам
+    audience = models.JSONField(null=True, blank=True)
+
+    sent = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    removed = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        """
+        @brief Метаданные модели PushJob
+        """
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="pushjob_status_next_idx"),
+            models.Index(
+                fields=["coalesce_key"],
+                name="pushjob_pending_coalesce_idx",
+                condition=models.Q(status="pending") & ~models.Q(coalesce_key=""),
+            ),
+        ]
+
+    def __str__(self):
+        """
+        @brief Возвращает строковое представление задания
+        @return Строка с ID, типом уведомления и статусом
+        """
+        return f"{self.pk}: {self.payload.get('type', '')} ({self.status})"
+
+
+class GeocodeCacheEntry(models.Model):
+    """
+    @brief Модель записи кэша геокодирования
+    Хранит координаты по нормализованному адресу; запись без координат -
+    отрицательный результат, действующий GEOCODE_NEGATIVE_TTL секунд
+    """
+    normalized_address = models.CharField(max_length=255, unique=True)
+    lat = models.FloatField(null=True, blank=True)
+    lng = models.FloatField(null=True, blank=True)
+    provider = models.CharField(max_length=32)
+    fetched_at = models.DateTimeField()
+
+    class Meta:
+        """
+        @brief Метаданные модели GeocodeCacheEntry
+        """
+        ordering = ["-fetched_at"]
+
+    def __str__(self):
+        """
+        @brief Возвращает строковое представление записи кэша
+        @return Строка с адресом и координатами
+        """
+        return f"{self.normalized_address}: {self.lat}, {self.lng}"
+
+
+class PlaceImportJob(models.Model):
+    """
+    @brief Модель задания импорта мест из файла
+    Загруженный через API файл сохраняется в хранилище, представление сразу отвечает,
+    воркер run_import_worker импортирует его пакетами и сохраняет статистику
+    """
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    file = models.FileField(upload_to="imports/", blank=True)
+    file_format = models.CharField(max_length=16)
+    update_existing = models.BooleanField(default=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Статистика import_places; обновляется после каждого пакета
+    stats = models.JSONField(default=dict, blank=True)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        """
+        @brief Метаданные модели PlaceImportJob
+        """
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "updated_at"], name="importjob_status_updated_idx"),
+        ]
+
+    def __str__(self):
+        """
+        @brief Возвращает строковое представление задания
+        @return Строка с ID, форматом и статусом
+        """
+        return f"{self.pk}: {self.file_format} ({self.status})"
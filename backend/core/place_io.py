@@ -0,0 +1,497 @@
+import csv
+import io
+import json
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .catalogue import invalidate_catalogue_version
+from .models import PlaceImportJob, PlaceObject, PlaceReview
+from .ratings import rebuild_place_ratings
+
+
+PLACE_IO_FORMATS = ("ndjson", "csv")
+PLACE_IO_BATCH_SIZE = 1000
+PLACE_IO_MAX_ERRORS = 50
+
+PLACE_TEXT_FIELDS = (
+    "title",
+    "description",
+    "upcoming_event",
+    "discount_info",
+    "infrastructure_type",
+    "address",
+    "schedule",
+    "image_url",
+)
+PLACE_FLAG_FIELDS = ("sign_language", "subtitles", "ramps", "braille")
+PLACE_EXPORT_FIELDS = (
+    "id",
+    *PLACE_TEXT_FIELDS,
+    "metros",
+    "lat",
+    "lng",
+    *PLACE_FLAG_FIELDS,
+)
+# Поля, перезаписываемые при импорте существующего места (ключ - title + address).
+# Координаты из файла сбрасывают отложенное геокодирование; запись без координат
+# не затирает сохраненные координаты места.
+PLACE_IMPORT_GEOCODE_FIELDS = ["geocode_status", "geocode_attempts", "geocode_next_attempt_at"]
+PLACE_IMPORT_UPDATE_FIELDS = [
+    field for field in PLACE_EXPORT_FIELDS if field not in ("id", "title", "address")
+] + ["updated_at"]
+PLACE_IMPORT_UPDATE_FIELDS_WITHOUT_COORDS = [
+    field for field in PLACE_IMPORT_UPDATE_FIELDS if field not in ("lat", "lng")
+]
+
+
+class PlaceRecordError(ValueError):
+    """
+    @brief Ошибка в записи импортируемого файла
+    """
+
+
+def _to_bool(value):
+    """
+    @brief Преобразование значения из файла в булевый тип
+    @param value Значение (bool, число или строка)
+    @return bool Булево значение
+    """
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return bool(value)
+    return str(value or "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _to_float(value, name):
+    """
+    @brief Преобразование координаты из файла в число
+    @param value Значение
+    @param name Имя поля для сообщения об ошибке
+    @return float|None Число или None для пустого значения
+    """
+    if value in (None, ""):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise PlaceRecordError(f"{name} must be a number")
+
+
+def _to_metros(value):
+    """
+    @brief Преобразование списка станций метро из файла
+    @param value Список, JSON-массив в строке или строка через запятую
+    @return list Список станций метро
+    """
+    if isinstance(value, str):
+        stripped = value.strip()
+        if stripped.startswith("["):
+            try:
+                value = json.loads(stripped)
+            except json.JSONDecodeError:
+                pass
+        else:
+            value = stripped.split(",")
+    if not isinstance(value, list):
+        return []
+    return [str(item).strip() for item in value if str(item).strip()]
+
+
+def _text_value(record, name):
+    """
+    @brief Текстовое поле записи с проверкой максимальной длины поля модели
+    @param record Словарь записи
+    @param name Имя поля
+    @return str Значение поля
+    """
+    value = str(record.get(name) or "").strip()
+    max_length = PlaceObject._meta.get_field(name).max_length
+    if max_length and len(value) > max_length:
+        raise PlaceRecordError(f"{name} must be at most {max_length} characters")
+    return value
+
+
+def _parse_reviews(value):
+    """
+    @brief Парсинг отзывов импортируемого места
+    @param value Список словарей {author_name, text, rating}
+    @return list Список кортежей (автор, текст, оценка)
+    """
+    if value in (None, ""):
+        return []
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            raise PlaceRecordError("reviews must be a JSON list")
+    if not isinstance(value, list):
+        raise PlaceRecordError("reviews must be a list")
+
+    reviews = []
+    for item in value:
+        if not isinstance(item, dict):
+            raise PlaceRecordError("each review must be an object")
+        author_name = str(item.get("author_name") or item.get("author") or "").strip()[:150]
+        text = str(item.get("text") or "").strip()
+        try:
+            rating = int(item.get("rating", 5))
+        except (TypeError, ValueError):
+            raise PlaceRecordError("review rating must be an integer from 1 to 5")
+        if not author_name or not text:
+            raise PlaceRecordError("review author_name and text are required")
+        if not 1 <= rating <= 5:
+            raise PlaceRecordError("review rating must be an integer from 1 to 5")
+        reviews.append((author_name, text, rating))
+    return reviews
+
+
+def record_to_place(record):
+    """
+    @brief Преобразование записи файла в несохраненное место и его отзывы
+    @param record Словарь записи (поля PLACE_EXPORT_FIELDS и reviews)
+    @return tuple Кортеж (PlaceObject, список отзывов (автор, текст, оценка))
+    """
+    if not isinstance(record, dict):
+        raise PlaceRecordError("record must be an object")
+    fields = {name: _text_value(record, name) for name in PLACE_TEXT_FIELDS}
+    if not fields["title"]:
+        raise PlaceRecordError("title is required")
+    place = PlaceObject(
+        **fields,
+        metros=_to_metros(record.get("metros")),
+        lat=_to_float(record.get("lat"), "lat"),
+        lng=_to_float(record.get("lng"), "lng"),
+        **{name: _to_bool(record.get(name)) for name in PLACE_FLAG_FIELDS},
+    )
+    return place, _parse_reviews(record.get("reviews"))
+
+
+def read_records(stream, file_format):
+    """
+    @brief Построчное чтение записей из текстового потока
+    @param stream Текстовый поток (файл, загруженный файл)
+    @param file_format Формат: ndjson или csv
+    @return generator Пары (номер строки, словарь записи или исключение PlaceRecordError)
+    """
+    if file_format == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield line_number, PlaceRecordError(f"invalid JSON: {exc.msg}")
+
+
+def _save_batch(batch, update_existing):
+    """
+    @brief Сохранение пакета мест и отзывов
+    Места вставляются INSERT ... ON CONFLICT по ограничению unique_place_title_address
+    (DO UPDATE или DO NOTHING), отдельно для записей с координатами и без них, чтобы
+    пустые координаты не затирали сохраненные. Места с адресом, оставшиеся без координат,
+    ставятся в очередь отложенного геокодирования (run_geocode_worker). Отзывы
+    сохраняются одним bulk_create без дублей по автору и тексту
+    @param batch Словарь {(title, address): (PlaceObject, отзывы)}
+    @param update_existing Перезаписывать поля существующих мест
+    @return dict Статистика пакета: places, reviews
+    """
+    places = [place for place, _ in batch.values()]
+    now = timezone.now()
+    located = []
+    unlocated = []
+    for place in places:
+        if place.lat is not None and place.lng is not None:
+            located.append(place)
+            continue
+        place.lat = place.lng = None
+        if place.address:
+            place.geocode_status = PlaceObject.GEOCODE_PENDING
+            place.geocode_next_attempt_at = now
+        unlocated.append(place)
+
+    if update_existing:
+        for group, update_fields in (
+            (located, PLACE_IMPORT_UPDATE_FIELDS + PLACE_IMPORT_GEOCODE_FIELDS),
+            (unlocated, PLACE_IMPORT_UPDATE_FIELDS_WITHOUT_COORDS),
+        ):
+            if group:
+                PlaceObject.objects.bulk_create(
+                    group,
+                    update_conflicts=True,
+                    unique_fields=["title", "address"],
+                    update_fields=update_fields,
+                )
+        # Существующие места без координат и в файле, и в БД.
+        PlaceObject.objects.filter(
+            Q(lat__isnull=True) | Q(lng__isnull=True),
+            id__in=[place.pk for place in unlocated],
+        ).exclude(address="").exclude(geocode_status=PlaceObject.GEOCODE_PENDING).update(
+            geocode_status=PlaceObject.GEOCODE_PENDING,
+            geocode_attempts=0,
+            geocode_next_attempt_at=now,
+        )
+    else:
+        PlaceObject.objects.bulk_create(places, ignore_conflicts=True)
+
+    # При DO UPDATE ID всех строк возвращаются через RETURNING, при DO NOTHING - нет.
+    place_ids = {key: place.pk for key, (place, _) in batch.items() if place.pk}
+    missing = [key for key in batch if key not in place_ids]
+    if missing:
+        for place_id, title, address in PlaceObject.objects.filter(
+            title__in={key[0] for key in missing},
+            address__in={key[1] for key in missing},
+        ).values_list("id", "title", "address"):
+            place_ids.setdefault((title, address), place_id)
+
+    reviewed_ids = [place_ids[key] for key, (_, reviews) in batch.items() if reviews and key in place_ids]
+    existing_reviews = set(
+        PlaceReview.objects.filter(place_id__in=reviewed_ids).values_list("place_id", "author_name", "text")
+    )
+    new_reviews = []
+    for key, (_, reviews) in batch.items():
+        place_id = place_ids.get(key)
+        for author_name, text, rating in reviews:
+            if place_id is None or (place_id, author_name, text) in existing_reviews:
+                continue
+            existing_reviews.add((place_id, author_name, text))
+            new_reviews.append(PlaceReview(place_id=place_id, author_name=author_name, text=text, rating=rating))
+    if new_reviews:
+        PlaceReview.objects.bulk_create(new_reviews)
+        rebuild_place_ratings(place_ids={review.place_id for review in new_reviews})
+
+    return {"places": len(places), "reviews": len(new_reviews)}
+
+
+def import_places(stream, file_format, batch_size=PLACE_IO_BATCH_SIZE, update_existing=True, progress=None):
+    """
+    @brief Потоковый импорт мест и отзывов
+    Файл читается построчно и сохраняется пакетами по batch_size записей, каждый пакет -
+    в отдельной транзакции, поэтому память не растет с размером файла. Записи с ошибками
+    пропускаются. Сигналы при массовой вставке не срабатывают, поэтому версия каталога
+    сбрасывается один раз в конце
+    @param stream Текстовый поток
+    @param file_format Формат: ndjson или csv
+    @param batch_size Количество записей в пакете
+    @param update_existing Перезаписывать существующие места (иначе пропускать)
+    @param progress Функция, вызываемая со статистикой после каждого пакета
+    @return dict Статистика: places, reviews, without_coords, error_count, errors (первые PLACE_IO_MAX_ERRORS)
+    """
+    if file_format not in PLACE_IO_FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(PLACE_IO_FORMATS)}")
+
+    stats = {"places": 0, "reviews": 0, "without_coords": 0, "error_count": 0, "errors": []}
+    records = read_records(stream, file_format)
+    while True:
+        batch = {}
+        consumed = 0
+        for line_number, record in islice(records, batch_size):
+            consumed += 1
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                place, reviews = record_to_place(record)
+            except PlaceRecordError as exc:
+                stats["error_count"] += 1
+                if len(stats["errors"]) < PLACE_IO_MAX_ERRORS:
+                    stats["errors"].append(f"line {line_number}: {exc}")
+                continue
+            # Повтор места внутри пакета: побеждает последняя запись, отзывы объединяются.
+            key = (place.title, place.address)
+            if key in batch:
+                reviews = batch[key][1] + reviews
+            batch[key] = (place, reviews)
+
+        if batch:
+            with transaction.atomic():
+                saved = _save_batch(batch, update_existing)
+            stats["places"] += saved["places"]
+            stats["reviews"] += saved["reviews"]
+            stats["without_coords"] += sum(
+                1 for place, _ in batch.values() if place.lat is None or place.lng is None
+            )
+            if progress:
+                progress(stats)
+        if consumed < batch_size:
+            break
+
+    if stats["places"]:
+        invalidate_catalogue_version()
+    return stats
+
+
+def enqueue_place_import(upload, file_format, update_existing=True):
+    """
+    @brief Постановка импорта загруженного файла в очередь
+    Файл сохраняется в хранилище, импорт выполняет воркер (команда run_import_worker)
+    @param upload Загруженный файл
+    @param file_format Формат: ndjson или csv
+    @param update_existing Перезаписывать существующие места (иначе пропускать)
+    @return PlaceImportJob Созданное задание
+    """
+    job = PlaceImportJob(file_format=file_format, update_existing=update_existing)
+    job.file.save(upload.name, upload, save=False)
+    job.save()
+    return job
+
+
+def claim_place_import_job():
+    """
+    @brief Захват следующего задания импорта
+    Строка блокируется через SELECT ... FOR UPDATE SKIP LOCKED. Статистика сохраняется
+    после каждого пакета, поэтому задание running без обновлений дольше
+    PLACE_IMPORT_STALE_TIMEOUT (воркер упал) захватывается повторно; импорт
+    идемпотентен (upsert мест, отзывы без повторов)
+    @return PlaceImportJob|None Захваченное задание или None, если очередь пуста
+    """
+    stale_before = timezone.now() - timedelta(seconds=settings.PLACE_IMPORT_STALE_TIMEOUT)
+    with transaction.atomic():
+        job = (
+            PlaceImportJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=PlaceImportJob.STATUS_PENDING)
+                | Q(status=PlaceImportJob.STATUS_RUNNING, updated_at__lt=stale_before)
+            )
+            .order_by("created_at", "id")
+            .first()
+        )
+        if job is not None:
+            job.status = PlaceImportJob.STATUS_RUNNING
+            job.attempts += 1
+            job.save(update_fields=["status", "attempts", "updated_at"])
+    return job
+
+
+def process_place_import_job(job, batch_size=PLACE_IO_BATCH_SIZE):
+    """
+    @brief Выполнение задания импорта
+    После успешного импорта или последней попытки (PLACE_IMPORT_MAX_ATTEMPTS)
+    файл удаляется из хранилища
+    @param job Захваченное задание
+    @param batch_size Количество записей в пакете
+    @return PlaceImportJob Обновленное задание
+    """
+    def report(stats):
+        job.stats = stats
+        job.save(update_fields=["stats", "updated_at"])
+
+    try:
+        with job.file.open("rb") as upload:
+            job.stats = import_places(
+                io.TextIOWrapper(upload, encoding="utf-8-sig", newline=""),
+                job.file_format,
+                batch_size=batch_size,
+                update_existing=job.update_existing,
+                progress=report,
+            )
+    except UnicodeDecodeError:
+        job.status = PlaceImportJob.STATUS_FAILED
+        job.last_error = "file must be UTF-8 encoded"
+    except Exception as exc:
+        job.last_error = str(exc)
+        job.status = (
+            PlaceImportJob.STATUS_FAILED
+            if job.attempts >= settings.PLACE_IMPORT_MAX_ATTEMPTS
+            else PlaceImportJob.STATUS_PENDING
+        )
+    else:
+        job.status = PlaceImportJob.STATUS_DONE
+        job.last_error = ""
+
+    if job.status != PlaceImportJob.STATUS_PENDING:
+        job.finished_at = timezone.now()
+        job.file.delete(save=False)
+    job.save()
+    return job
+
+
+def serialize_place_import_job(job):
+    """
+    @brief Сериализация задания импорта
+    @param job Задание
+    @return dict Статус и статистика импорта
+    """
+    return {
+        "id": job.id,
+        "status": job.status,
+        "attempts": job.attempts,
+        "stats": job.stats,
+        "last_error": job.last_error,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def place_to_record(place, include_reviews=True):
+    """
+    @brief Преобразование места в запись для экспорта
+    @param place Объект места (с предзагруженными отзывами, если include_reviews)
+    @param include_reviews Включать отзывы
+    @return dict Запись с полями PLACE_EXPORT_FIELDS (и reviews)
+    """
+    record = {name: getattr(place, name) for name in PLACE_EXPORT_FIELDS}
+    if include_reviews:
+        record["reviews"] = [
+            {"author_name": review.author_name, "text": review.text, "rating": review.rating}
+            for review in place.reviews.all()
+        ]
+    return record
+
+
+def iter_place_records(include_reviews=True, chunk_size=PLACE_IO_BATCH_SIZE):
+    """
+    @brief Потоковое чтение мест для экспорта
+    QuerySet.iterator() на PostgreSQL использует серверный курсор, поэтому в памяти
+    находится не больше chunk_size мест (и их отзывов) одновременно
+    @param include_reviews Включать отзывы
+    @param chunk_size Размер порции курсора
+    @return generator Записи place_to_record
+    """
+    places = PlaceObject.objects.only(*PLACE_EXPORT_FIELDS).order_by("id")
+    if include_reviews:
+        places = places.prefetch_related("reviews")
+    for place in places.iterator(chunk_size=chunk_size):
+        yield place_to_record(place, include_reviews)
+
+
+class _LineBuffer:
+    """
+    @brief Буфер для csv.writer, возвращающий записанную строку вместо сохранения
+    """
+
+    def write(self, value):
+        return value
+
+
+def export_places(file_format, include_reviews=True):
+    """
+    @brief Потоковый экспорт мест
+    В CSV отзывы не выгружаются, станции метро записываются JSON-массивом
+    @param file_format Формат: ndjson или csv
+    @param include_reviews Включать отзывы (только ndjson)
+    @return generator Строки файла
+    """
+    if file_format not in PLACE_IO_FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(PLACE_IO_FORMATS)}")
+
+    if file_format == "ndjson":
+        for record in iter_place_records(include_reviews):
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+        return
+
+    writer = csv.writer(_LineBuffer())
+    yield writer.writerow(PLACE_EXPORT_FIELDS)
+    for record in iter_place_records(include_reviews=False):
+        record["metros"] = json.dumps(record["metros"], ensure_ascii=False)
+        yield writer.writerow([record[name] for name in PLACE_EXPORT_FIELDS])
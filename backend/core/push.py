@@ -0,0 +1,580 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from functools import lru_cache
+from itertools import zip_longest
+from urllib.parse import urlparse
+
+import requests
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from py_vapid import Vapid
+from pywebpush import WebPusher
+from requests.adapters import HTTPAdapter
+
+from .audience import select_push_audience
+from .models import PushJob, PushSubscription
+from .rate_limit import TokenBucket
+
+
+def build_notification_payload(notification_type, title, body, url):
+    """
+    @brief Построение полезной нагрузки уведомления
+    @param notification_type Тип уведомления
+    @param title Заголовок уведомления
+    @param body Текст уведомления
+    @param url URL для перехода по умолчанию "/"
+    @return dict Словарь с данными уведомления
+    """
+    return {
+        "type": notification_type,
+        "title": title,
+        "body": body,
+        "url": url or "/",
+    }
+
+
+def _endpoint_origin(endpoint):
+    """
+    @brief Origin push-сервиса по адресу подписки
+    @param endpoint URL подписки
+    @return str Строка вида "scheme://host[:port]"
+    """
+    url = urlparse(endpoint)
+    return f"{url.scheme}://{url.netloc}"
+
+
+def _group_by_origin(subscriptions):
+    """
+    @brief Группировка подписок по push-сервису (FCM, Mozilla, Apple и т.д.)
+    @param subscriptions Список подписок
+    @return dict Словарь {origin: список подписок}
+    """
+    groups = defaultdict(list)
+    for subscription in subscriptions:
+        groups[_endpoint_origin(subscription.endpoint)].append(subscription)
+    return groups
+
+
+def _build_origin_session(pool_size):
+    """
+    @brief HTTP-сессия с пулом keep-alive соединений к одному push-сервису
+    @param pool_size Максимальное количество одновременных соединений
+    @return requests.Session Сессия
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _interleave(groups):
+    """
+    @brief Чередование подписок разных push-сервисов
+    Медленный или ограниченный по частоте сервис не занимает все потоки подряд
+    @param groups Словарь {origin: список подписок}
+    @return list Список пар (origin, подписка)
+    """
+    queues = [[(origin, item) for item in items] for origin, items in groups.items()]
+    return [pair for batch in zip_longest(*queues) for pair in batch if pair is not None]
+
+
+@lru_cache(maxsize=4)
+def _load_vapid_key(private_key):
+    """
+    @brief Разбор приватного ключа VAPID (кэшируется на время жизни процесса)
+    @param private_key Ключ в формате base64url (raw или DER) либо PEM
+    @return Vapid Ключ для подписи заголовков
+    """
+    return Vapid.from_string(private_key=private_key)
+
+
+class PushBroadcast:
+    """
+    @brief Контекст одной рассылки
+    Полезная нагрузка сериализуется один раз, ключ VAPID разбирается один раз,
+    подписанные заголовки VAPID кэшируются по audience (origin push-сервиса) до
+    истечения срока действия. Для каждого подписчика выполняется только шифрование
+    """
+
+    def __init__(self, payload, vapid_private_key, vapid_subject):
+        """
+        @brief Подготовка рассылки
+        @param payload Полезная нагрузка уведомления
+        @param vapid_private_key Приватный ключ VAPID
+        @param vapid_subject Контакт отправителя (mailto: или https:)
+        """
+        # Исходные части объединенного уведомления нужны только очереди, браузеру
+        # отправляется итоговый текст (размер сообщения Web Push ограничен ~4 КБ).
+        message = {key: value for key, value in payload.items() if key != "parts"}
+        self.data = json.dumps(message, ensure_ascii=False).encode("utf-8")
+        self.vapid = _load_vapid_key(vapid_private_key)
+        self.vapid_subject = vapid_subject
+        self._vapid_headers = {}
+        self._lock = threading.Lock()
+
+    def vapid_headers(self, origin):
+        """
+        @brief Подписанные заголовки VAPID для push-сервиса
+        Заголовки переподписываются, когда до истечения срока остается меньше
+        PUSH_VAPID_RENEW_BEFORE секунд
+        @param origin Origin push-сервиса (claim aud)
+        @return dict Заголовки Authorization (и Crypto-Key для старых схем)
+        """
+        now = int(time.time())
+        with self._lock:
+            cached = self._vapid_headers.get(origin)
+            if cached and cached[1] - now > settings.PUSH_VAPID_RENEW_BEFORE:
+                return cached[0]
+            expires_at = now + settings.PUSH_VAPID_TOKEN_TTL
+            headers = self.vapid.sign({
+                "sub": self.vapid_subject,
+                "aud": origin,
+                "exp": expires_at,
+            })
+            self._vapid_headers[origin] = (headers, expires_at)
+            return headers
+
+    def deliver(self, subscription, origin, session, bucket):
+        """
+        @brief Отправка уведомления одному подписчику (выполняется в потоке пула)
+        Поток не обращается к БД, результат обрабатывается в вызывающем потоке
+        @param subscription Подписка
+        @param origin Origin push-сервиса подписки
+        @param session HTTP-сессия push-сервиса
+        @param bucket Ограничитель частоты запросов к push-сервису
+        @return tuple Кортеж (подписка, HTTP-статус ошибки или None, текст ошибки или None)
+        """
+        bucket.acquire()
+        try:
+            response = WebPusher(
+                {
+                    "endpoint": subscription.endpoint,
+                    "keys": {
+                        "p256dh": subscription.p256dh,
+                        "auth": subscription.auth,
+                    },
+                },
+                requests_session=session,
+            ).send(
+                self.data,
+                headers=dict(self.vapid_headers(origin)),
+                timeout=settings.PUSH_REQUEST_TIMEOUT,
+            )
+        except Exception as exc:
+            return subscription, None, str(exc)
+        if response.status_code > 202:
+            return (
+                subscription,
+                response.status_code,
+                f"Push failed: {response.status_code} {response.reason}",
+            )
+        return subscription, None, None
+
+
+def remove_push_subscriptions(subscription_ids):
+    """
+    @brief Удаление подписок, отклоненных push-сервисом (404/410)
+    Все подписки удаляются одним запросом DELETE ... WHERE id IN (...)
+    @param subscription_ids Список ID подписок
+    @return int Количество удаленных подписок
+    """
+    if not subscription_ids:
+        return 0
+    deleted, _ = PushSubscription.objects.filter(id__in=subscription_ids).delete()
+    return deleted
+
+
+def prune_push_subscriptions(max_age_days, dry_run=False):
+    """
+    @brief Удаление подписок, которые браузер давно не обновлял
+    updated_at обновляется при каждой повторной регистрации подписки клиентом;
+    подписки, не обновлявшиеся дольше окна, считаются заброшенными
+    @param max_age_days Допустимый возраст подписки в днях
+    @param dry_run Только подсчитать подписки, не удаляя их
+    @return int Количество удаленных (или подлежащих удалению) подписок
+    """
+    stale = PushSubscription.objects.filter(
+        updated_at__lt=timezone.now() - timedelta(days=max_age_days),
+    )
+    if dry_run:
+        return stale.count()
+    deleted, _ = stale.delete()
+    return deleted
+
+
+def send_push_to_subscriptions(subscriptions, payload):
+    """
+    @brief Отправка push-уведомлений подписчикам
+    Подписки группируются по push-сервису; для каждого сервиса используется своя
+    сессия с keep-alive соединениями и ограничение частоты PUSH_ORIGIN_RATE_LIMIT.
+    Запросы выполняются параллельно в пуле из PUSH_MAX_CONCURRENCY потоков.
+    Подписки, отклоненные push-сервисом, удаляются одним запросом после рассылки
+    @param subscriptions Список подписок
+    @param payload Полезная нагрузка уведомления
+    @return dict Результат отправки уведомлений; retry_ids - подписки с временной ошибкой
+    """
+    vapid_private_key = os.getenv("VAPID_PRIVATE_KEY", "").strip()
+    vapid_subject = os.getenv("VAPID_SUBJECT", "mailto:admin@example.com").strip()
+
+    if not vapid_private_key:
+        return {
+            "sent": 0,
+            "failed": len(subscriptions),
+            "removed": 0,
+            "errors": ["VAPID_PRIVATE_KEY is not configured"],
+            "retry_ids": [subscription.id for subscription in subscriptions],
+        }
+
+    sent = 0
+    failed = 0
+    errors = []
+    retry_ids = []
+    expired_ids = []
+
+    broadcast = PushBroadcast(payload, vapid_private_key, vapid_subject)
+    groups = _group_by_origin(subscriptions)
+    concurrency = max(1, settings.PUSH_MAX_CONCURRENCY)
+    sessions = {origin: _build_origin_session(concurrency) for origin in groups}
+    buckets = {origin: TokenBucket(settings.PUSH_ORIGIN_RATE_LIMIT) for origin in groups}
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [
+                executor.submit(
+                    broadcast.deliver,
+                    subscription,
+                    origin,
+                    sessions[origin],
+                    buckets[origin],
+                )
+                for origin, subscription in _interleave(groups)
+            ]
+            for future in as_completed(futures):
+                subscription, status_code, error = future.result()
+                if error is None:
+                    sent += 1
+                    continue
+                failed += 1
+                if status_code in (404, 410):
+                    expired_ids.append(subscription.id)
+                    continue
+                errors.append(error)
+                retry_ids.append(subscription.id)
+    finally:
+        for session in sessions.values():
+            session.close()
+
+    removed = remove_push_subscriptions(expired_ids)
+
+    return {
+        "sent": sent,
+        "failed": failed,
+        "removed": removed,
+        "errors": errors[:10],
+        "retry_ids": sorted(retry_ids),
+    }
+
+
+def merge_notification_payloads(payloads):
+    """
+    @brief Объединение нескольких уведомлений в одно
+    Заголовок берется из первого уведомления, тексты объединяются построчно;
+    более позднее уведомление того же типа заменяет текст предыдущего.
+    Исходные уведомления сохраняются в поле parts, типы - в поле types
+    @param payloads Список полезных нагрузок (build_notification_payload)
+    @return dict Полезная нагрузка объединенного уведомления
+    """
+    if len(payloads) == 1:
+        return payloads[0]
+
+    parts = {}
+    for payload in payloads:
+        for part in payload.get("parts") or [payload]:
+            parts.pop(part.get("type"), None)
+            parts[part.get("type")] = {
+                "type": part.get("type"),
+                "title": part.get("title"),
+                "body": part.get("body"),
+                "url": part.get("url") or "/",
+            }
+    parts = list(parts.values())
+    urls = {part["url"] for part in parts}
+
+    merged = build_notification_payload(
+        payloads[0].get("type"),
+        payloads[0].get("title"),
+        "\n".join(part["body"] for part in parts if part["body"]),
+        urls.pop() if len(urls) == 1 else "/",
+    )
+    merged["types"] = [part["type"] for part in parts]
+    merged["parts"] = parts
+    return merged
+
+
+def payload_for_notification_types(payload, notification_types):
+    """
+    @brief Полезная нагрузка объединенного уведомления для подписчика с выбранными типами
+    В уведомление попадают только части, тип которых подписчик принимает
+    @param payload Полезная нагрузка (возможно объединенная merge_notification_payloads)
+    @param notification_types Типы уведомлений подписки (пустой список - все типы)
+    @return dict Полезная нагрузка для подписчика
+    """
+    parts = payload.get("parts")
+    if not parts or not notification_types:
+        return payload
+    accepted = [part for part in parts if part["type"] in notification_types]
+    if not accepted or len(accepted) == len(parts):
+        return payload
+    return merge_notification_payloads(accepted)
+
+
+def _send_push_batch(subscriptions, payload):
+    """
+    @brief Отправка пакета подписчиков с учетом принимаемых ими типов уведомлений
+    Подписчики группируются по итоговой полезной нагрузке (payload_for_notification_types),
+    каждая группа отправляется одной рассылкой send_push_to_subscriptions
+    @param subscriptions Список подписок
+    @param payload Полезная нагрузка задания
+    @return dict Суммарный результат отправки в формате send_push_to_subscriptions
+    """
+    groups = {}
+    for subscription in subscriptions:
+        message = payload_for_notification_types(payload, subscription.notification_types)
+        key = tuple(message.get("types") or [message.get("type")])
+        groups.setdefault(key, (message, []))[1].append(subscription)
+
+    delivery = {"sent": 0, "failed": 0, "removed": 0, "errors": [], "retry_ids": []}
+    for message, items in groups.values():
+        result = send_push_to_subscriptions(items, message)
+        for key in ("sent", "failed", "removed"):
+            delivery[key] += result[key]
+        delivery["errors"].extend(result["errors"])
+        delivery["retry_ids"].extend(result["retry_ids"])
+    delivery["retry_ids"].sort()
+    return delivery
+
+
+def enqueue_push(payload, coalesce_key="", audience=None):
+    """
+    @brief Постановка рассылки push-уведомления в очередь
+    Рассылку выполняет воркер (команда run_push_worker), HTTP-запрос не ждет отправки.
+    Если задан coalesce_key и PUSH_COALESCE_WINDOW больше нуля, рассылка откладывается
+    на это окно, а уведомления с тем же ключом, поставленные за время ожидания,
+    объединяются с ней в одно уведомление на подписчика
+    @param payload Полезная нагрузка уведомления
+    @param coalesce_key Ключ объединения (например, "place:42")
+    @param audience Критерии аудитории (core.audience.build_place_audience), None - всем
+    @return PushJob Созданное или дополненное задание
+    """
+    window = settings.PUSH_COALESCE_WINDOW
+    if not coalesce_key or window <= 0:
+        return PushJob.objects.create(
+            payload=payload,
+            audience=audience,
+            max_attempts=settings.PUSH_JOB_MAX_ATTEMPTS,
+        )
+
+    now = timezone.now()
+    with transaction.atomic():
+        # Ожидающее задание еще не захвачено воркером: next_attempt_at в будущем,
+        # а блокировка строки не дает захватить его до конца транзакции.
+        job = (
+            PushJob.objects.select_for_update()
+            .filter(
+                status=PushJob.STATUS_PENDING,
+                coalesce_key=coalesce_key,
+                attempts=0,
+                next_attempt_at__gt=now,
+            )
+            .order_by("id")
+            .first()
+        )
+        if job is not None:
+            job.payload = merge_notification_payloads([job.payload, payload])
+            job.audience = audience
+            job.save(update_fields=["payload", "audience", "updated_at"])
+            return job
+        return PushJob.objects.create(
+            payload=payload,
+            audience=audience,
+            coalesce_key=coalesce_key,
+            max_attempts=settings.PUSH_JOB_MAX_ATTEMPTS,
+            next_attempt_at=now + timedelta(seconds=window),
+        )
+
+
+def claim_push_jobs(limit):
+    """
+    @brief Захват готовых к выполнению заданий рассылки
+    Строки блокируются через SELECT ... FOR UPDATE SKIP LOCKED, поэтому несколько
+    воркеров не получают одно задание. Воркер продлевает захват (locked_at) перед
+    каждым пакетом подписчиков, поэтому повторно захватываются только задания, захват
+    которых не продлевался дольше PUSH_JOB_STALE_TIMEOUT (например, после падения воркера)
+    @param limit Максимальное количество заданий
+    @return list Список захваченных заданий
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=settings.PUSH_JOB_STALE_TIMEOUT)
+    with transaction.atomic():
+        jobs = list(
+            PushJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=PushJob.STATUS_PENDING, next_attempt_at__lte=now)
+                | Q(status=PushJob.STATUS_RUNNING, locked_at__lt=stale_before)
+            )
+            .order_by("next_attempt_at", "id")[:limit]
+        )
+        for job in jobs:
+            job.status = PushJob.STATUS_RUNNING
+            job.locked_at = now
+            job.attempts += 1
+            job.save(update_fields=["status", "locked_at", "attempts", "updated_at"])
+    return jobs
+
+
+def _retry_delay(attempts):
+    """
+    @brief Задержка перед повторной попыткой (экспоненциальный рост)
+    @param attempts Номер выполненной попытки (с 1)
+    @return timedelta Задержка
+    """
+    delay = settings.PUSH_JOB_RETRY_BASE_DELAY * (2 ** (attempts - 1))
+    return timedelta(seconds=min(delay, settings.PUSH_JOB_RETRY_MAX_DELAY))
+
+
+def _owned_push_job(job):
+    """
+    @brief Строка задания, пока оно захвачено этим воркером
+    Захват принадлежит воркеру, пока в строке записано выставленное им значение
+    locked_at; задание, перехваченное другим воркером, строке не соответствует
+    @param job Захваченное задание
+    @return QuerySet Набор из строки задания или пустой набор
+    """
+    return PushJob.objects.filter(id=job.id, status=PushJob.STATUS_RUNNING, locked_at=job.locked_at)
+
+
+def _renew_push_job_lease(job):
+    """
+    @brief Продление захвата задания перед отправкой очередного пакета подписчиков
+    @param job Захваченное задание
+    @return bool True, если задание по-прежнему принадлежит воркеру
+    """
+    now = timezone.now()
+    if not _owned_push_job(job).update(locked_at=now, updated_at=now):
+        return False
+    job.locked_at = now
+    return True
+
+
+PUSH_JOB_RESULT_FIELDS = (
+    "sent",
+    "failed",
+    "removed",
+    "last_error",
+    "locked_at",
+    "status",
+    "retry_subscription_ids",
+    "next_attempt_at",
+    "finished_at",
+    "updated_at",
+)
+
+
+def process_push_job(job):
+    """
+    @brief Выполнение одного задания рассылки
+    Подписчики выбираются запросом по критериям аудитории задания (core.audience)
+    и отправляются пакетами по PUSH_JOB_BATCH_SIZE; из объединенного уведомления
+    подписчик получает только принимаемые им части (payload_for_notification_types).
+    Перед каждым пакетом захват задания продлевается. Если задание перехвачено другим
+    воркером, рассылка прекращается, а результат не записывается. При повторной попытке
+    уведомление отправляется только подписчикам, доставка которым ранее завершилась
+    временной ошибкой. sent/removed накапливаются по попыткам, failed - количество
+    подписчиков, которым доставка пока не удалась
+    @param job Захваченное задание
+    @return PushJob Обновленное задание
+    """
+    subscriptions = select_push_audience(
+        job.audience,
+        job.payload.get("types") or [job.payload.get("type")],
+    ).order_by("id")
+    if job.retry_subscription_ids:
+        subscriptions = subscriptions.filter(id__in=job.retry_subscription_ids)
+
+    batch_size = max(1, settings.PUSH_JOB_BATCH_SIZE)
+    delivery = {"sent": 0, "removed": 0, "errors": [], "retry_ids": []}
+    job_failed = False
+    last_id = 0
+    while True:
+        if not _renew_push_job_lease(job):
+            job.refresh_from_db()
+            return job
+        batch = list(subscriptions.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            break
+        try:
+            result = _send_push_batch(batch, job.payload)
+        except Exception as exc:
+            # Пакет и оставшиеся подписчики получат уведомление при следующей попытке.
+            delivery["errors"].append(str(exc))
+            delivery["retry_ids"].extend(subscription.id for subscription in batch)
+            delivery["retry_ids"].extend(subscriptions.filter(id__gt=batch[-1].id).values_list("id", flat=True))
+            job_failed = True
+            break
+        delivery["sent"] += result["sent"]
+        delivery["removed"] += result["removed"]
+        delivery["errors"].extend(result["errors"])
+        delivery["retry_ids"].extend(result["retry_ids"])
+        last_id = batch[-1].id
+    job_failed = job_failed or bool(delivery["retry_ids"])
+
+    owned = _owned_push_job(job)
+    now = timezone.now()
+    job.sent += delivery["sent"]
+    job.removed += delivery["removed"]
+    job.failed = len(delivery["retry_ids"])
+    job.last_error = "\n".join(delivery["errors"][:10])
+    job.locked_at = None
+    job.updated_at = now
+
+    if job_failed and job.attempts < job.max_attempts:
+        job.status = PushJob.STATUS_PENDING
+        job.retry_subscription_ids = delivery["retry_ids"]
+        job.next_attempt_at = now + _retry_delay(job.attempts)
+    else:
+        job.status = PushJob.STATUS_FAILED if job_failed else PushJob.STATUS_DONE
+        job.retry_subscription_ids = []
+        job.finished_at = now
+
+    if not owned.update(**{field: getattr(job, field) for field in PUSH_JOB_RESULT_FIELDS}):
+        job.refresh_from_db()
+    return job
+
+
+def serialize_push_job(job):
+    """
+    @brief Сериализация задания рассылки
+    @param job Задание
+    @return dict Статус и статистика доставки
+    """
+    return {
+        "id": job.id,
+        "status": job.status,
+        "attempts": job.attempts,
+        "sent": job.sent,
+        "failed": job.failed,
+        "removed": job.removed,
+        "last_error": job.last_error,
+        "created_at": job.created_at,
+        "next_attempt_at": job.next_attempt_at,
+        "finished_at": job.finished_at,
+    }
@@ -0,0 +1,51 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    @brief Потокобезопасный ограничитель частоты запросов (token bucket)
+    Токены пополняются со скоростью rate в секунду до емкости capacity;
+    каждый запрос забирает один токен, при их отсутствии вызывающий поток ждет
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        @brief Создание ограничителя
+        @param rate Количество запросов в секунду; 0 или меньше - без ограничения
+        @param capacity Максимальный размер всплеска (по умолчанию равен rate, но не меньше 1)
+        """
+        self.rate = float(rate or 0)
+        self.capacity = float(capacity or max(self.rate, 1.0))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """
+        @brief Попытка забрать токен
+        @return float 0, если токен получен, иначе время ожидания до следующего токена
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """
+        @brief Ожидание и получение токена
+        @return float Суммарное время ожидания в секундах
+        """
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            delay = self._reserve()
+            if not delay:
+                return waited
+            time.sleep(delay)
+            waited += delay
@@ -0,0 +1,83 @@
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from .models import PlaceObject, PlaceReview
+
+
+def apply_review_rating(place_id, rating, delta):
+    """
+    @brief Инкрементальное обновление сводки рейтинга места
+    Изменяет rating_sum и rating_count одним UPDATE через F-выражения, без чтения строки,
+    и сдвигает updated_at места, чтобы изменилась версия каталога
+    @param place_id ID места
+    @param rating Оценка отзыва (1-5)
+    @param delta 1 при добавлении отзыва, -1 при удалении
+    @return int Количество обновленных строк
+    """
+    return PlaceObject.objects.filter(id=place_id).update(
+        rating_sum=F("rating_sum") + rating * delta,
+        rating_count=F("rating_count") + delta,
+        updated_at=Now(),
+    )
+
+
+def touch_places(place_ids):
+    """
+    @brief Сдвиг updated_at мест после изменения их отзывов
+    Правка текста отзыва не меняет сводку рейтинга, но меняет ответ деталей места,
+    поэтому ETag, Last-Modified и версия каталога должны измениться в любом случае
+    @param place_ids ID мест
+    @return int Количество обновленных строк
+    """
+    return PlaceObject.objects.filter(id__in=place_ids).update(updated_at=Now())
+
+
+def collect_place_ratings(place_ids=None):
+    """
+    @brief Подсчет фактической сводки рейтинга по таблице отзывов
+    @param place_ids Список ID мест (по умолчанию все места)
+    @return dict Словарь {ID места: (сумма оценок, количество отзывов)}
+    """
+    reviews = PlaceReview.objects.order_by()
+    if place_ids is not None:
+        reviews = reviews.filter(place_id__in=place_ids)
+    return {
+        row["place_id"]: (row["rating_sum"] or 0, row["rating_count"])
+        for row in reviews.values("place_id").annotate(
+            rating_sum=Sum("rating"),
+            rating_count=Count("id"),
+        )
+    }
+
+
+def rebuild_place_ratings(place_ids=None, dry_run=False):
+    """
+    @brief Пересчет сохраненной сводки рейтинга мест с нуля
+    @param place_ids Список ID мест (по умолчанию все места)
+    @param dry_run Только проверить расхождения, не исправляя их
+    @return list Список расхождений (место, сохраненная сводка, фактическая сводка)
+    """
+    actual = collect_place_ratings(place_ids)
+    places = PlaceObject.objects.only("id", "title", "rating_sum", "rating_count", "updated_at").order_by("id")
+    if place_ids is not None:
+        places = places.filter(id__in=place_ids)
+
+    now = timezone.now()
+    mismatches = []
+    for place in places.iterator():
+        expected = actual.get(place.id, (0, 0))
+        stored = (place.rating_sum, place.rating_count)
+        if stored == expected:
+            continue
+        mismatches.append((place, stored, expected))
+        place.rating_sum, place.rating_count = expected
+        place.updated_at = now
+
+    if not dry_run and mismatches:
+        PlaceObject.objects.bulk_update(
+            [place for place, _, _ in mismatches],
+            ["rating_sum", "rating_count", "updated_at"],
+            batch_size=500,
+        )
+    return mismatches
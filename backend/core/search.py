@@ -0,0 +1,35 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db.models import F, Q, TextField
+from django.db.models.functions import Cast, Greatest
+
+
+SEARCH_CONFIG = "russian"
+
+
+def search_places(queryset, text):
+    """
+    @brief Полнотекстовый поиск мест с ранжированием
+    Совпадения ищутся по tsvector (GIN-индекс place_search_vector_gin) и, для
+    устойчивости к опечаткам, по триграммам названия и станций метро
+    (индексы place_title_trgm и place_metros_trgm)
+    @param queryset Исходный набор мест
+    @param text Поисковая строка пользователя
+    @return QuerySet Найденные места по убыванию релевантности (поле search_rank)
+    """
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type="websearch")
+    return (
+        queryset.annotate(metros_text=Cast("metros", TextField()))
+        .filter(
+            Q(search_vector=query)
+            | Q(title__trigram_word_similar=text)
+            | Q(metros_text__trigram_word_similar=text)
+        )
+        .annotate(
+            search_rank=SearchRank(F("search_vector"), query)
+            + Greatest(
+                TrigramWordSimilarity(text, "title"),
+                TrigramWordSimilarity(text, "metros_text"),
+            ),
+        )
+        .order_by("-search_rank", "-created_at", "-id")
+    )
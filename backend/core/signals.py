@@ -0,0 +1,20 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .catalogue import invalidate_catalogue_version
+from .models import PlaceObject, PlaceReview
+
+
+@receiver(post_save, sender=PlaceObject)
+@receiver(post_delete, sender=PlaceObject)
+@receiver(post_save, sender=PlaceReview)
+@receiver(post_delete, sender=PlaceReview)
+def invalidate_catalogue_cache(sender, **kwargs):
+    """
+    @brief Сброс версии каталога при изменении мест и отзывов
+    Сброс откладывается до фиксации транзакции, чтобы параллельный запрос
+    не закэшировал версию, посчитанную до коммита
+    @param sender Класс модели, отправившей сигнал
+    """
+    transaction.on_commit(invalidate_catalogue_version)
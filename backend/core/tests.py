@@ -1,3 +1,1192 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+from urllib.error import URLError
+from urllib.parse import quote
 
-# Create your tests here.
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import FileSystemStorage
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from py_vapid import Vapid01
+import requests
+from rest_framework.test import APIClient
+
+from .admin import PlaceReviewAdmin
+from .audience import select_push_audience
+from .catalogue import CATALOGUE_VERSION_CACHE_KEY, get_catalogue_version
+from .geo import haversine_m, nearest_places
+from .geocoding import (
+    GeocoderError,
+    _memory_cache,
+    claim_pending_geocodes,
+    process_pending_geocode,
+    resolve_address,
+)
+from .images import claim_pending_image_variants, content_addressed_name, refresh_place_image_variants
+from .media_cache import MediaDiskCache
+from .models import GeocodeCacheEntry, PlaceImportJob, PlaceObject, PlaceReview, PushJob, PushSubscription
+from .place_io import claim_place_import_job, export_places, import_places, process_place_import_job
+from .push import (
+    build_notification_payload,
+    claim_push_jobs,
+    enqueue_push,
+    merge_notification_payloads,
+    process_push_job,
+    send_push_to_subscriptions,
+)
+from .ratings import rebuild_place_ratings
+
+
+def _b64(raw):
+    """
+    @brief Кодирование байтов в base64url без выравнивания
+    @param raw Байты
+    @return str Строка base64url
+    """
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _generate_vapid_key():
+    """
+    @brief Генерация приватного ключа VAPID для тестов
+    @return str Ключ в формате base64url (raw)
+    """
+    vapid = Vapid01()
+    vapid.generate_keys()
+    return _b64(vapid.private_key.private_numbers().private_value.to_bytes(32, "big"))
+
+
+def _push_response(status_code):
+    """
+    @brief Ответ заглушки push-сервиса
+    @param status_code HTTP-статус
+    @return requests.Response Ответ без тела
+    """
+    response = requests.Response()
+    response.status_code = status_code
+    response.reason = "Stub"
+    response._content = b""
+    return response
+
+
+class StubPushSession:
+    """
+    @brief Заглушка HTTP-сессии push-сервиса
+    Код ответа выбирается по адресу подписки: "gone" - 410, "flaky" - 500
+    (пока не исчерпано число сбоев failures), иначе 201
+    """
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.requests = []
+
+    def post(self, endpoint, **kwargs):
+        self.requests.append(endpoint)
+        if "gone" in endpoint:
+            return _push_response(410)
+        if "flaky" in endpoint and self.failures.get(endpoint, 0) > 0:
+            self.failures[endpoint] -= 1
+            return _push_response(500)
+        return _push_response(201)
+
+    def close(self):
+        pass
+
+
+class CatalogueTestCase(TestCase):
+    """
+    @brief Базовый класс тестов API каталога: клиент и пустой кэш ответов
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = APIClient(HTTP_ACCEPT="*/*")
+
+    def _login(self, username="reviewer", is_moderator=False):
+        user = get_user_model().objects.create_user(username=username, password="password", is_moderator=is_moderator)
+        self.client.force_authenticate(user)
+        return user
+
+    def _get(self, path, **params):
+        # Версия каталога сбрасывается после коммита, а TestCase не фиксирует транзакцию.
+        cache.delete(CATALOGUE_VERSION_CACHE_KEY)
+        return self.client.get(path, params)
+
+
+class RatingTests(CatalogueTestCase):
+    """
+    @brief Сводка рейтинга мест: выдача без запросов по отзывам и инкрементальные счетчики
+    """
+
+    def _review(self, place, rating):
+        return self.client.post(f"/api/objects/{place.id}/reviews", {"text": "Отзыв", "rating": rating}, format="json")
+
+    def test_list_reads_rating_summary_without_review_queries(self):
+        self._login()
+        for index in range(3):
+            place = PlaceObject.objects.create(title=f"Место {index}", address=f"Адрес {index}")
+            self._review(place, 4)
+            self._review(place, 5)
+
+        cache.delete(CATALOGUE_VERSION_CACHE_KEY)
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/objects")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(item["rating_avg"], item["rating_count"]) for item in response.json()], [(4.5, 2)] * 3)
+
+    def test_counters_follow_review_create_and_delete(self):
+        self._login()
+        place = PlaceObject.objects.create(title="Музей", address="Арбат, 1")
+        self._review(place, 5)
+        review_id = self._review(place, 2).json()["id"]
+
+        place.refresh_from_db()
+        self.assertEqual((place.rating_sum, place.rating_count, place.rating_avg), (7, 2, 3.5))
+
+        self.assertEqual(self.client.delete(f"/api/objects/{place.id}/reviews/{review_id}").status_code, 204)
+        place.refresh_from_db()
+        self.assertEqual((place.rating_sum, place.rating_count), (5, 1))
+
+    def test_stale_instance_save_keeps_counters(self):
+        place = PlaceObject.objects.create(title="Театр", address="Тверская, 2")
+        stale = PlaceObject.objects.get(id=place.id)
+        self._login()
+        self._review(place, 3)
+
+        stale.description = "Новое описание"
+        stale.save()
+
+        place.refresh_from_db()
+        self.assertEqual((place.rating_sum, place.rating_count, place.description), (3, 1, "Новое описание"))
+
+    def test_rebuild_fixes_drifted_summary(self):
+        place = PlaceObject.objects.create(title="Парк", address="Лужники")
+        PlaceReview.objects.create(place=place, author_name="a", text="t", rating=4)
+        PlaceObject.objects.filter(id=place.id).update(rating_sum=40, rating_count=3)
+
+        mismatches = rebuild_place_ratings(place_ids=[place.id])
+
+        place.refresh_from_db()
+        self.assertEqual([(stored, expected) for _, stored, expected in mismatches], [((40, 3), (4, 1))])
+        self.assertEqual((place.rating_sum, place.rating_count), (4, 1))
+
+
+class PlacePaginationTests(CatalogueTestCase):
+    """
+    @brief Постраничная выдача мест по курсору (created_at, id)
+    """
+
+    def test_pages_cover_all_places_once_in_order(self):
+        created_at = timezone.now()
+        places = [PlaceObject.objects.create(title=f"Место {index}", address="Адрес") for index in range(5)]
+        # Одинаковое время создания: порядок внутри страницы и между страницами задает id.
+        PlaceObject.objects.update(created_at=created_at)
+
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            page = self._get("/api/objects", **params).json()
+            seen.extend(item["id"] for item in page["items"])
+            cursor = page["next"]
+            if cursor is None:
+                break
+
+        self.assertEqual(seen, sorted((place.id for place in places), reverse=True))
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self._get("/api/objects", cursor="not-a-cursor")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("error", response.json())
+
+
+class PlaceFilterTests(CatalogueTestCase):
+    """
+    @brief Фильтрация мест по доступности, типу инфраструктуры и метро на стороне БД
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.museum = PlaceObject.objects.create(
+            title="Музей", address="1", infrastructure_type="museum", ramps=True, metros=["Арбатская"],
+        )
+        self.theatre = PlaceObject.objects.create(
+            title="Театр", address="2", infrastructure_type="theatre", ramps=True, braille=True, metros=["Пушкинская"],
+        )
+        self.cafe = PlaceObject.objects.create(
+            title="Кафе", address="3", infrastructure_type="cafe", metros=["Арбатская", "Смоленская"],
+        )
+
+    def _ids(self, **params):
+        return {item["id"] for item in self._get("/api/objects", **params).json()}
+
+    def test_flags_are_combined(self):
+        self.assertEqual(self._ids(ramps="true"), {self.museum.id, self.theatre.id})
+        self.assertEqual(self._ids(ramps="true", braille="1"), {self.theatre.id})
+        self.assertEqual(self._ids(ramps="false"), {self.cafe.id})
+
+    def test_infrastructure_type_and_metro_lists(self):
+        self.assertEqual(self._ids(infrastructure_type="museum,cafe"), {self.museum.id, self.cafe.id})
+        self.assertEqual(self._ids(metro="Смоленская"), {self.cafe.id})
+        self.assertEqual(self._ids(metro=["Пушкинская", "Смоленская"]), {self.theatre.id, self.cafe.id})
+        self.assertEqual(self._ids(metro="Арбатская", infrastructure_type="museum"), {self.museum.id})
+
+
+class PlaceMapTests(CatalogueTestCase):
+    """
+    @brief Запросы карты: маркеры в видимой области, кластеры и ближайшие места
+    """
+
+    def _place(self, title, lat, lng, **fields):
+        return PlaceObject.objects.create(title=title, address=title, lat=lat, lng=lng, **fields)
+
+    def test_bbox_returns_markers_inside_viewport(self):
+        inside = self._place("Внутри", 55.75, 37.61, ramps=True)
+        self._place("Снаружи", 59.93, 30.31)
+        self._place("Без координат", None, None)
+
+        response = self._get("/api/objects", bbox="37.5,55.7,37.7,55.8")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item["id"] for item in response.json()], [inside.id])
+        self.assertEqual(
+            set(response.json()[0]),
+            {"id", "title", "address", "infrastructure_type", "image_url", "image_srcset", "lat", "lng",
+             "sign_language", "subtitles", "ramps", "braille"},
+        )
+        self.assertEqual(self._get("/api/objects", bbox="37.7,55.7,37.5,55.8").status_code, 400)
+
+
+    def test_clusters_group_places_by_grid_cell(self):
+        self._place("Арбат 1", 55.7520, 37.5920, ramps=True)
+        self._place("Арбат 2", 55.7521, 37.5921, braille=True)
+        lone = self._place("Питер", 59.93, 30.31)
+
+        response = self._get("/api/objects", cluster="1", zoom="10")
+
+        self.assertEqual(response.status_code, 200)
+        clusters = sorted(response.json(), key=lambda cluster: -cluster["count"])
+        self.assertEqual([cluster["count"] for cluster in clusters], [2, 1])
+        self.assertEqual(clusters[0]["flags"], {"sign_language": 0, "subtitles": 0, "ramps": 1, "braille": 1})
+        self.assertAlmostEqual(clusters[0]["lat"], 55.75205)
+        self.assertNotIn("id", clusters[0])
+        self.assertEqual(clusters[1]["id"], lone.id)
+
+    def test_cluster_cache_follows_catalogue_version(self):
+        self._place("Арбат 1", 55.7520, 37.5920)
+        self.assertEqual(self._get("/api/objects", cluster="1", zoom="10").json()[0]["count"], 1)
+
+        self._place("Арбат 2", 55.7521, 37.5921)
+
+        self.assertEqual(self._get("/api/objects", cluster="1", zoom="10").json()[0]["count"], 2)
+
+
+    def test_nearest_places_are_ordered_by_distance_within_radius(self):
+        lat, lng = 55.7520, 37.6175
+        # Восточнее на 0.012° долготы (~750 м) ближе, чем севернее на 0.009° широты (~1000 м),
+        # хотя разница в градусах у первого больше.
+        east = self._place("Восток", lat, lng + 0.012)
+        north = self._place("Север", lat + 0.009, lng)
+        near = self._place("Рядом", lat + 0.001, lng + 0.001)
+        # Угол описанного прямоугольника: в запрос по индексу попадает, но дальше радиуса.
+        self._place("Угол", lat + 0.017, lng + 0.029)
+        self._place("Далеко", 55.90, 37.90)
+
+        results = nearest_places(PlaceObject.objects.all(), lat, lng, 2000, 10)
+
+        self.assertEqual([place.id for place, _ in results], [near.id, east.id, north.id])
+        distances = [distance for _, distance in results]
+        self.assertEqual(distances, sorted(distances))
+        self.assertAlmostEqual(distances[2], haversine_m(lat, lng, lat + 0.009, lng))
+
+        limited = nearest_places(PlaceObject.objects.all(), lat, lng, 2000, 2)
+        self.assertEqual([place.id for place, _ in limited], [near.id, east.id])
+
+    def test_near_query_returns_distance_and_applies_filters(self):
+        lat, lng = 55.7520, 37.6175
+        self._place("Рядом", lat + 0.001, lng)
+        ramp = self._place("С пандусом", lat + 0.002, lng, ramps=True)
+
+        response = self._get("/api/objects", near=f"{lat},{lng}", radius="1000", ramps="true")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(item["id"], item["distance_m"]) for item in response.json()], [(ramp.id, 222)])
+        self.assertEqual(self._get("/api/objects", near="91,0").status_code, 400)
+
+
+class PlaceSearchTests(CatalogueTestCase):
+    """
+    @brief Полнотекстовый поиск мест: ранжирование, опечатки и форма ответа
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.title_match = PlaceObject.objects.create(title="Театр кукол", address="Садовая, 3")
+        self.description_match = PlaceObject.objects.create(
+            title="Дом культуры", address="Ленина, 5", description="При доме работает детский театр",
+        )
+        self.metro_match = PlaceObject.objects.create(title="Библиотека", address="Арбат, 7", metros=["Смоленская"])
+        PlaceObject.objects.create(title="Стадион", address="Лужники")
+
+    def _ids(self, payload):
+        return [item["id"] for item in payload]
+
+    def test_title_match_ranks_above_description_match(self):
+        response = self._get("/api/objects", q="театры")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._ids(response.json()), [self.title_match.id, self.description_match.id])
+
+    def test_metro_station_matches_incomplete_name(self):
+        self.assertEqual(self._ids(self._get("/api/objects", q="Смоленска").json()), [self.metro_match.id])
+
+    def test_bare_query_returns_all_matches(self):
+        for index in range(60):
+            PlaceObject.objects.create(title=f"Театр {index}", address="Тверская")
+
+        self.assertEqual(len(self._get("/api/objects", q="театр").json()), 62)
+
+    def test_limit_and_cursor_page_in_rank_order(self):
+        expected = self._ids(self._get("/api/objects", q="театр").json())
+
+        first = self._get("/api/objects", q="театр", limit=1).json()
+        second = self._get("/api/objects", q="театр", limit=1, cursor=first["next"]).json()
+
+        self.assertEqual(set(first), {"items", "next"})
+        self.assertEqual(self._ids(first["items"]) + self._ids(second["items"]), expected)
+        self.assertIsNone(second["next"])
+        self.assertEqual(self._get("/api/objects", q="театр", cursor="").json()["items"], first["items"] + second["items"])
+
+
+class ConditionalGetTests(CatalogueTestCase):
+    """
+    @brief Условные GET-запросы списка и деталей мест (ETag / Last-Modified)
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.place = PlaceObject.objects.create(title="Музей", address="Арбат, 1")
+
+    def _revalidate(self, path, response, **headers):
+        cache.delete(CATALOGUE_VERSION_CACHE_KEY)
+        return self.client.get(path, HTTP_IF_NONE_MATCH=response["ETag"], **headers)
+
+    def test_list_is_revalidated_by_etag(self):
+        response = self._get("/api/objects")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        self.assertEqual(self._revalidate("/api/objects", response).status_code, 304)
+
+        PlaceObject.objects.create(title="Театр", address="Тверская, 2")
+        self.assertEqual(self._revalidate("/api/objects", response).status_code, 200)
+
+        response = self._get("/api/objects")
+        PlaceObject.objects.filter(id=self.place.id).delete()
+        changed = self._revalidate("/api/objects", response)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(len(changed.json()), 1)
+
+    def test_detail_is_revalidated_by_etag_and_last_modified(self):
+        path = f"/api/objects/{self.place.id}"
+        response = self._get(path)
+
+        self.assertEqual(self._revalidate(path, response).status_code, 304)
+        self.assertEqual(self.client.get(path, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]).status_code, 304)
+
+        self._login()
+        self.client.post(f"{path}/reviews", {"text": "Отзыв", "rating": 5}, format="json")
+
+        changed = self._revalidate(path, response)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(len(changed.json()["reviews"]), 1)
+
+    def test_admin_review_edit_changes_detail_etag(self):
+        review = PlaceReview.objects.create(place=self.place, author_name="a", text="Старый текст", rating=4)
+        path = f"/api/objects/{self.place.id}"
+        response = self._get(path)
+
+        review.text = "Новый текст"
+        PlaceReviewAdmin(PlaceReview, admin.site).save_model(None, review, None, change=True)
+
+        changed = self._revalidate(path, response)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()["reviews"][0]["text"], "Новый текст")
+
+
+class CataloguePayloadCacheTests(CatalogueTestCase):
+    """
+    @brief Кэш сериализованных ответов каталога по версии и его сброс при записи
+    """
+
+    def test_cached_list_is_served_without_building(self):
+        PlaceObject.objects.create(title="Музей", address="Арбат, 1")
+        self.client.get("/api/objects")
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/objects")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 1)
+
+    def test_writes_reset_version_after_commit(self):
+        place = PlaceObject.objects.create(title="Музей", address="Арбат, 1")
+        self.assertEqual(get_catalogue_version()[1], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PlaceObject.objects.create(title="Театр", address="Тверская, 2")
+        self.assertEqual(get_catalogue_version()[1], 2)
+        self.assertEqual(len(self.client.get("/api/objects").json()), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PlaceReview.objects.create(place=place, author_name="a", text="t", rating=5)
+        self.assertIsNone(cache.get(CATALOGUE_VERSION_CACHE_KEY))
+
+
+@override_settings(PUSH_MAX_CONCURRENCY=4, PUSH_ORIGIN_RATE_LIMIT=0, PUSH_COALESCE_WINDOW=0, PUSH_JOB_MAX_ATTEMPTS=3)
+class PushDeliveryTests(TestCase):
+    """
+    @brief Доставка рассылки: удаление отклоненных подписок и повтор временных ошибок
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="push-test", password="password")
+
+    def setUp(self):
+        self.failures = {}
+        self.sessions = []
+
+        def build_session(pool_size):
+            session = StubPushSession(self.failures)
+            self.sessions.append(session)
+            return session
+
+        patchers = [
+            mock.patch("core.push._build_origin_session", side_effect=build_session),
+            mock.patch.dict(os.environ, {"VAPID_PRIVATE_KEY": _generate_vapid_key()}),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _subscribe(self, endpoint):
+        key = ec.generate_private_key(ec.SECP256R1())
+        public_key = key.public_key().public_bytes(
+            serialization.Encoding.X962,
+            serialization.PublicFormat.UncompressedPoint,
+        )
+        return PushSubscription.objects.create(
+            user=self.user,
+            endpoint=endpoint,
+            p256dh=_b64(public_key),
+            auth=_b64(os.urandom(16)),
+        )
+
+    def _requested_endpoints(self):
+        return sorted(endpoint for session in self.sessions for endpoint in session.requests)
+
+    def test_expired_subscriptions_are_removed(self):
+        ok = self._subscribe("https://push.example.com/ok")
+        gone = self._subscribe("https://push.example.com/gone")
+
+        delivery = send_push_to_subscriptions([ok, gone], build_notification_payload("general", "T", "B", "/"))
+
+        self.assertEqual((delivery["sent"], delivery["failed"], delivery["removed"]), (1, 1, 1))
+        self.assertEqual(delivery["retry_ids"], [])
+        self.assertFalse(PushSubscription.objects.filter(id=gone.id).exists())
+        self.assertTrue(PushSubscription.objects.filter(id=ok.id).exists())
+
+    def test_transient_errors_are_retried_for_failed_subscribers_only(self):
+        ok = self._subscribe("https://push.example.com/ok")
+        flaky = self._subscribe("https://push.example.com/flaky")
+        self._subscribe("https://other.example.org/gone")
+        self.failures[flaky.endpoint] = 1
+
+        job = enqueue_push(build_notification_payload("general", "T", "B", "/"))
+        job = process_push_job(claim_push_jobs(10)[0])
+
+        self.assertEqual(job.status, PushJob.STATUS_PENDING)
+        self.assertEqual((job.sent, job.failed, job.removed), (1, 1, 1))
+        self.assertEqual(job.retry_subscription_ids, [flaky.id])
+        self.assertEqual(len(self.sessions), 2)
+
+        self.sessions.clear()
+        PushJob.objects.filter(id=job.id).update(next_attempt_at=job.created_at)
+        job = process_push_job(claim_push_jobs(10)[0])
+
+        self.assertEqual(self._requested_endpoints(), [flaky.endpoint])
+        self.assertEqual(job.status, PushJob.STATUS_DONE)
+        self.assertEqual((job.sent, job.failed, job.removed, job.attempts), (2, 0, 1, 2))
+        self.assertTrue(PushSubscription.objects.filter(id=ok.id).exists())
+
+    def test_job_fails_after_max_attempts(self):
+        flaky = self._subscribe("https://push.example.com/flaky")
+        self.failures[flaky.endpoint] = 10
+
+        job = enqueue_push(build_notification_payload("general", "T", "B", "/"))
+        for _ in range(3):
+            PushJob.objects.filter(id=job.id).update(next_attempt_at=job.created_at)
+            job = process_push_job(claim_push_jobs(10)[0])
+
+        self.assertEqual(job.status, PushJob.STATUS_FAILED)
+        self.assertEqual((job.attempts, job.failed), (3, 1))
+        self.assertIn("500", job.last_error)
+        self.assertEqual(claim_push_jobs(10), [])
+
+    def _send_with_hook(self, hook):
+        # Хук выполняется в вызывающем потоке между пакетами, где видны данные теста.
+        def send(subscriptions, payload):
+            hook(subscriptions, payload)
+            return send_push_to_subscriptions(subscriptions, payload)
+
+        patcher = mock.patch("core.push.send_push_to_subscriptions", side_effect=send)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_claimed_job_is_not_claimed_twice_until_stale(self):
+        job = enqueue_push(build_notification_payload("general", "T", "B", "/"))
+
+        claimed = claim_push_jobs(10)
+        self.assertEqual([item.id for item in claimed], [job.id])
+        self.assertEqual((claimed[0].status, claimed[0].attempts), (PushJob.STATUS_RUNNING, 1))
+        self.assertEqual(claim_push_jobs(10), [])
+
+        PushJob.objects.filter(id=job.id).update(locked_at=timezone.now() - timedelta(seconds=601))
+        reclaimed = claim_push_jobs(10)
+        self.assertEqual([(item.id, item.attempts) for item in reclaimed], [(job.id, 2)])
+
+    @override_settings(PUSH_JOB_BATCH_SIZE=1)
+    def test_lease_is_renewed_before_every_batch(self):
+        for index in range(3):
+            self._subscribe(f"https://push.example.com/ok-{index}")
+        job = enqueue_push(build_notification_payload("general", "T", "B", "/"))
+        claimed = claim_push_jobs(10)[0]
+        leases = [claimed.locked_at]
+        self._send_with_hook(lambda *args: leases.append(PushJob.objects.get(id=job.id).locked_at))
+
+        job = process_push_job(claimed)
+
+        self.assertEqual(len(leases), 4)
+        self.assertEqual(leases, sorted(set(leases)))
+        self.assertEqual((job.status, job.sent, job.locked_at), (PushJob.STATUS_DONE, 3, None))
+
+    @override_settings(PUSH_JOB_BATCH_SIZE=1)
+    def test_worker_stops_and_keeps_results_after_losing_the_job(self):
+        for index in range(3):
+            self._subscribe(f"https://push.example.com/ok-{index}")
+        job = enqueue_push(build_notification_payload("general", "T", "B", "/"))
+        claimed = claim_push_jobs(10)[0]
+        other_lease = timezone.now() + timedelta(seconds=5)
+        batches = []
+
+        def reclaim_after_first_batch(subscriptions, payload):
+            batches.append(1)
+            # Другой воркер перехватил задание, пока отправлялся первый пакет.
+            PushJob.objects.filter(id=job.id).update(locked_at=other_lease, attempts=2)
+
+        self._send_with_hook(reclaim_after_first_batch)
+
+        job = process_push_job(claimed)
+
+        self.assertEqual(len(batches), 1)
+        self.assertEqual(len(self._requested_endpoints()), 1)
+        self.assertEqual((job.status, job.sent, job.attempts, job.locked_at), (PushJob.STATUS_RUNNING, 0, 2, other_lease))
+
+    def test_merged_notification_is_split_by_subscriber_types(self):
+        everything = self._subscribe("https://push.example.com/ok-all")
+        events = self._subscribe("https://push.example.com/ok-events")
+        discounts = self._subscribe("https://push.example.com/ok-discounts")
+        PushSubscription.objects.filter(id=events.id).update(notification_types=["event"])
+        PushSubscription.objects.filter(id=discounts.id).update(notification_types=["discount"])
+        sent = {}
+        self._send_with_hook(
+            lambda subscriptions, payload: sent.update({item.id: payload for item in subscriptions})
+        )
+
+        enqueue_push(merge_notification_payloads([
+            build_notification_payload("event", "Событие", "Концерт", "/building/1"),
+            build_notification_payload("discount", "Скидка", "Скидка 10%", "/building/1"),
+        ]))
+        job = process_push_job(claim_push_jobs(10)[0])
+
+        self.assertEqual(job.sent, 3)
+        self.assertEqual(sent[everything.id]["body"], "Концерт\nСкидка 10%")
+        self.assertEqual((sent[events.id]["type"], sent[events.id]["body"]), ("event", "Концерт"))
+        self.assertEqual((sent[discounts.id]["type"], sent[discounts.id]["body"]), ("discount", "Скидка 10%"))
+
+    @override_settings(PUSH_COALESCE_WINDOW=60)
+    def test_notifications_for_one_place_are_coalesced_within_window(self):
+        first = enqueue_push(build_notification_payload("event", "Событие", "Концерт", "/building/1"), "place:1")
+        enqueue_push(build_notification_payload("discount", "Скидка", "Скидка 10%", "/building/1"), "place:1")
+        job = enqueue_push(build_notification_payload("event", "Событие", "Спектакль", "/building/1"), "place:1")
+        other = enqueue_push(build_notification_payload("event", "Событие", "Лекция", "/building/2"), "place:2")
+
+        self.assertEqual(job.id, first.id)
+        self.assertNotEqual(other.id, first.id)
+        self.assertEqual(PushJob.objects.count(), 2)
+        job.refresh_from_db()
+        self.assertEqual(job.payload["types"], ["discount", "event"])
+        self.assertEqual(job.payload["body"], "Скидка 10%\nСпектакль")
+        self.assertEqual(claim_push_jobs(10), [])
+
+
+class PushAudienceTests(TestCase):
+    """
+    @brief Выбор подписчиков по настройкам адресной рассылки
+    """
+
+    def test_broadcast_respects_notification_types(self):
+        user = get_user_model().objects.create_user(username="audience-test", password="password")
+        subscriptions = {
+            name: PushSubscription.objects.create(
+                user=user,
+                endpoint=f"https://push.example.com/{name}",
+                p256dh="key",
+                auth="auth",
+                notification_types=types,
+                metros=["Арбатская"],
+            )
+            for name, types in (("any", []), ("general", ["general"]), ("events", ["event"]))
+        }
+
+        selected = set(select_push_audience(None, ["general"]).values_list("id", flat=True))
+
+        self.assertEqual(selected, {subscriptions["any"].id, subscriptions["general"].id})
+
+
+class StubGeocoder:
+    """
+    @brief Заглушка Yandex Geocoder API вместо urlopen
+    Ответы задаются очередью: координаты (широта, долгота), None - адрес не найден,
+    исключение - сетевая ошибка
+    """
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def __call__(self, url, timeout=None):
+        self.calls += 1
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        members = []
+        if response is not None:
+            members = [{"GeoObject": {"Point": {"pos": f"{response[1]} {response[0]}"}}}]
+        payload = {"response": {"GeoObjectCollection": {"featureMember": members}}}
+        return io.BytesIO(json.dumps(payload).encode("utf-8"))
+
+
+@override_settings(
+    GEOCODE_NEGATIVE_TTL=3600,
+    GEOCODE_MAX_ATTEMPTS=2,
+    GEOCODE_RETRY_BASE_DELAY=60,
+    GEOCODE_RETRY_MAX_DELAY=3600,
+    GEOCODE_LEASE_TIMEOUT=300,
+)
+class GeocodingTests(TestCase):
+    """
+    @brief Кэш геокодирования и повторы отложенного геокодирования
+    """
+
+    def setUp(self):
+        _memory_cache.clear()
+        self.addCleanup(_memory_cache.clear)
+        patcher = mock.patch.dict(os.environ, {"YANDEX_GEOCODER_API_KEY": "test-key"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _stub(self, *responses):
+        geocoder = StubGeocoder(*responses)
+        patcher = mock.patch("core.geocoding.urlopen", geocoder)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return geocoder
+
+    def _pending_place(self, address):
+        return PlaceObject.objects.create(
+            title=address,
+            address=address,
+            geocode_status=PlaceObject.GEOCODE_PENDING,
+            geocode_next_attempt_at=timezone.now(),
+        )
+
+    def test_repeated_addresses_are_served_from_cache(self):
+        geocoder = self._stub((55.75, 37.61))
+
+        self.assertEqual(resolve_address("Москва, Тверская улица, 1"), (55.75, 37.61))
+        self.assertEqual(resolve_address("  москва,тверская  улица, 1 "), (55.75, 37.61))
+        _memory_cache.clear()
+        self.assertEqual(resolve_address("Москва, Тверская улица, 1"), (55.75, 37.61))
+
+        self.assertEqual(geocoder.calls, 1)
+        self.assertEqual(GeocodeCacheEntry.objects.count(), 1)
+
+    def test_negative_results_expire_and_errors_are_not_cached(self):
+        geocoder = self._stub(None, URLError("down"), (55.7, 37.6))
+
+        self.assertIsNone(resolve_address("Нет такого адреса"))
+        self.assertIsNone(resolve_address("Нет такого адреса"))
+        self.assertEqual(geocoder.calls, 1)
+
+        _memory_cache.clear()
+        GeocodeCacheEntry.objects.update(fetched_at=timezone.now() - timedelta(hours=2))
+        with self.assertRaises(GeocoderError):
+            resolve_address("Нет такого адреса")
+        self.assertEqual(resolve_address("Нет такого адреса"), (55.7, 37.6))
+        self.assertEqual(geocoder.calls, 3)
+
+    def test_pending_place_is_retried_with_backoff(self):
+        self._stub(URLError("down"), (55.7, 37.6))
+        place = self._pending_place("Москва, Арбат, 10")
+
+        claimed = claim_pending_geocodes(10)
+        self.assertEqual(process_pending_geocode(claimed[0]), PlaceObject.GEOCODE_PENDING)
+        place.refresh_from_db()
+        self.assertEqual(place.geocode_attempts, 1)
+        self.assertGreater(place.geocode_next_attempt_at, timezone.now() + timedelta(seconds=30))
+        self.assertEqual(claim_pending_geocodes(10), [])
+
+        PlaceObject.objects.filter(id=place.id).update(geocode_next_attempt_at=timezone.now())
+        updated_at = place.updated_at
+        self.assertEqual(process_pending_geocode(claim_pending_geocodes(10)[0]), PlaceObject.GEOCODE_RESOLVED)
+        place.refresh_from_db()
+        self.assertEqual((place.lat, place.lng, place.geocode_attempts), (55.7, 37.6, 2))
+        self.assertIsNone(place.geocode_next_attempt_at)
+        self.assertGreater(place.updated_at, updated_at)
+
+    def test_pending_place_fails_after_max_attempts(self):
+        self._stub(URLError("down"), URLError("down"))
+        place = self._pending_place("Москва, Арбат, 12")
+
+        for _ in range(2):
+            PlaceObject.objects.filter(id=place.id).update(geocode_next_attempt_at=timezone.now())
+            status = process_pending_geocode(claim_pending_geocodes(10)[0])
+
+        self.assertEqual(status, PlaceObject.GEOCODE_FAILED)
+        place.refresh_from_db()
+        self.assertEqual(place.geocode_status, PlaceObject.GEOCODE_FAILED)
+        self.assertFalse(GeocodeCacheEntry.objects.exists())
+
+    def test_result_is_dropped_when_address_changed(self):
+        self._stub((55.7, 37.6))
+        place = self._pending_place("Москва, Арбат, 14")
+        claimed = claim_pending_geocodes(10)[0]
+        PlaceObject.objects.filter(id=place.id).update(address="Москва, Арбат, 16")
+
+        process_pending_geocode(claimed)
+
+        place.refresh_from_db()
+        self.assertEqual(place.geocode_status, PlaceObject.GEOCODE_PENDING)
+        self.assertIsNone(place.lat)
+
+
+class CountingStorage(FileSystemStorage):
+    """
+    @brief Локальная заглушка хранилища (вместо MinIO), считающая чтения файлов
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reads = []
+
+    def _open(self, name, mode="rb"):
+        self.reads.append(name)
+        return super()._open(name, mode)
+
+
+class MediaDiskCacheTests(SimpleTestCase):
+    """
+    @brief Дисковый read-through кэш файлов хранилища: заполнение, инвалидация, вытеснение
+    """
+
+    def setUp(self):
+        self.storage_dir = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.storage_dir, True)
+        self.addCleanup(shutil.rmtree, self.cache_dir, True)
+        self.storage = CountingStorage(location=self.storage_dir)
+        self.cache = MediaDiskCache(self.cache_dir, 1000)
+
+    def _put(self, name, size):
+        return self.storage.save(name, ContentFile(os.urandom(size)))
+
+    def _read(self, name, version="v1"):
+        cached_file = self.cache.open(name, version) or self.cache.fill(self.storage, name, version)
+        with cached_file:
+            return cached_file.read()
+
+    def _is_cached(self, name, version="v1"):
+        cached_file = self.cache.open(name, version)
+        if cached_file is None:
+            return False
+        cached_file.close()
+        return True
+
+    def test_fill_reads_storage_once(self):
+        name = self._put("a.bin", 300)
+
+        first = self._read(name)
+        second = self._read(name)
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(first), 300)
+        self.assertEqual(self.storage.reads, [name])
+        self.assertEqual(self.cache.total_size(), 300)
+
+    def test_new_version_is_fetched_again(self):
+        name = self._put("a.bin", 100)
+        self._read(name, "v1")
+        self._read(name, "v2")
+
+        self.assertEqual(self.storage.reads, [name, name])
+
+    def test_invalidate_drops_all_versions(self):
+        name = self._put("a.bin", 100)
+        other = self._put("b.bin", 200)
+        self._read(name, "v1")
+        self._read(name, "v2")
+        self._read(other)
+
+        self.cache.invalidate(name)
+
+        self.assertFalse(self._is_cached(name, "v1"))
+        self.assertFalse(self._is_cached(name, "v2"))
+        self.assertEqual(self.cache.total_size(), 200)
+        self._read(other)
+        self.assertEqual(self.storage.reads.count(other), 1)
+
+    def test_evicts_least_recently_read_files_over_limit(self):
+        names = [self._put(f"{index}.bin", 300) for index in range(3)]
+        for index, name in enumerate(names):
+            self._read(name)
+            path = self.cache._entry_path(name, "v1")
+            os.utime(path, (1000 + index, 1000 + index))
+        # Первый файл прочитан последним и должен остаться в кэше.
+        os.utime(self.cache._entry_path(names[0], "v1"), (2000, 2000))
+
+        self._read(self._put("3.bin", 300))
+
+        self.assertTrue(self._is_cached(names[0], "v1"))
+        self.assertFalse(self._is_cached(names[1], "v1"))
+        self.assertLessEqual(self.cache.total_size(), 900)
+
+    def test_counter_is_corrected_by_eviction_scan(self):
+        name = self._put("a.bin", 300)
+        self._read(name)
+        with open(os.path.join(self.cache_dir, ".size"), "w") as size_file:
+            size_file.write("5000")
+
+        self.cache.evict()
+
+        self.assertEqual(self.cache.total_size(), 300)
+        self.assertTrue(self._is_cached(name, "v1"))
+
+
+class PlaceImportExportTests(CatalogueTestCase):
+    """
+    @brief Потоковые импорт и экспорт мест: обратимость, координаты и очередь импорта
+    """
+
+    def _records(self):
+        return sorted(
+            ({key: value for key, value in json.loads(line).items() if key != "id"} for line in export_places("ndjson")),
+            key=lambda record: record["title"],
+        )
+
+    def test_ndjson_export_round_trips_through_import(self):
+        museum = PlaceObject.objects.create(
+            title="Музей", address="Арбат, 1", metros=["Арбатская"], lat=55.75, lng=37.59, ramps=True,
+            description="Описание", schedule="10-18",
+        )
+        PlaceReview.objects.create(place=museum, author_name="Анна", text="Отлично", rating=5)
+        PlaceObject.objects.create(title="Театр", address="Тверская, 2", braille=True)
+        exported = self._records()
+        dump = "".join(export_places("ndjson"))
+
+        PlaceObject.objects.all().delete()
+        stats = import_places(io.StringIO(dump), "ndjson")
+
+        self.assertEqual((stats["places"], stats["reviews"], stats["error_count"]), (2, 1, 0))
+        self.assertEqual(self._records(), exported)
+        self.assertEqual(PlaceObject.objects.get(title="Музей").rating_count, 1)
+
+        stats = import_places(io.StringIO(dump), "ndjson")
+        self.assertEqual((stats["places"], stats["reviews"]), (2, 0))
+        self.assertEqual(PlaceObject.objects.count(), 2)
+
+    def test_csv_without_coordinates_keeps_them_and_queues_geocoding(self):
+        located = PlaceObject.objects.create(title="Музей", address="Арбат, 1", lat=55.75, lng=37.59)
+        unlocated = PlaceObject.objects.create(title="Театр", address="Тверская, 2")
+        pending = PlaceObject.objects.create(
+            title="Парк", address="Лужники", geocode_status=PlaceObject.GEOCODE_PENDING,
+            geocode_next_attempt_at=timezone.now(),
+        )
+        dump = (
+            "title,address,description,lat,lng,metros\n"
+            "Музей,\"Арбат, 1\",Новое описание,,,[]\n"
+            "Театр,\"Тверская, 2\",,,,[]\n"
+            "Парк,Лужники,,55.71,37.55,[]\n"
+            "Кафе,\"Ленина, 5\",,,,\"[\"\"Смоленская\"\"]\"\n"
+        )
+
+        stats = import_places(io.StringIO(dump), "csv")
+
+        self.assertEqual((stats["places"], stats["without_coords"]), (4, 3))
+        located.refresh_from_db()
+        self.assertEqual((located.lat, located.lng, located.description), (55.75, 37.59, "Новое описание"))
+        self.assertEqual(located.geocode_status, PlaceObject.GEOCODE_NONE)
+        unlocated.refresh_from_db()
+        self.assertEqual(unlocated.geocode_status, PlaceObject.GEOCODE_PENDING)
+        pending.refresh_from_db()
+        self.assertEqual((pending.lat, pending.geocode_status), (55.71, PlaceObject.GEOCODE_NONE))
+        self.assertIsNone(pending.geocode_next_attempt_at)
+        created = PlaceObject.objects.get(title="Кафе")
+        self.assertEqual((created.metros, created.geocode_status), (["Смоленская"], PlaceObject.GEOCODE_PENDING))
+        self.assertEqual({place.id for place in claim_pending_geocodes(10)}, {unlocated.id, created.id})
+
+    def test_http_import_runs_in_worker(self):
+        storage_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, storage_dir, True)
+        storages = {
+            "default": {"BACKEND": "django.core.files.storage.FileSystemStorage", "OPTIONS": {"location": storage_dir}},
+            "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+        }
+        self._login("moderator", is_moderator=True)
+        record = {"title": "Музей", "address": "Арбат, 1", "lat": 55.75, "lng": 37.59}
+        upload = io.BytesIO(json.dumps(record).encode("utf-8"))
+        upload.name = "places.ndjson"
+
+        with override_settings(STORAGES=storages):
+            response = self.client.post("/api/objects/import", {"file": upload}, format="multipart")
+            self.assertEqual(response.status_code, 202)
+            self.assertFalse(PlaceObject.objects.exists())
+
+            job = process_place_import_job(claim_place_import_job())
+
+            self.assertEqual(job.status, PlaceImportJob.STATUS_DONE)
+            self.assertEqual(job.stats["places"], 1)
+            self.assertFalse(os.listdir(os.path.join(storage_dir, "imports")))
+        status = self.client.get(f"/api/objects/import/{response.json()['job']['id']}").json()
+        self.assertEqual((status["status"], status["stats"]["places"]), ("done", 1))
+        self.assertTrue(PlaceObject.objects.filter(title="Музей", lat=55.75).exists())
+
+
+def _image_upload(name="photo.png", size=(1200, 800), color=(200, 30, 30)):
+    """
+    @brief Загружаемый файл с изображением PNG
+    @param name Имя файла
+    @param size Размер изображения (ширина, высота)
+    @param color Цвет заливки
+    @return io.BytesIO Файл с атрибутом name
+    """
+    upload = io.BytesIO()
+    Image.new("RGB", size, color).save(upload, "PNG")
+    upload.seek(0)
+    upload.name = name
+    return upload
+
+
+class MediaTestCase(CatalogueTestCase):
+    """
+    @brief Базовый класс тестов изображений: локальное хранилище вместо MinIO, отдача потоком
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.storage_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.storage_dir, True)
+        settings_override = override_settings(
+            STORAGES={
+                "default": {
+                    "BACKEND": "django.core.files.storage.FileSystemStorage",
+                    "OPTIONS": {"location": self.storage_dir},
+                },
+                "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+            },
+            MEDIA_DELIVERY="stream",
+            MEDIA_CACHE_DIR="",
+            IMAGE_VARIANT_WIDTHS=[160, 480],
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.moderator = self._login("moderator", is_moderator=True)
+
+    def _create_place(self, **data):
+        response = self.client.post(
+            "/api/objects",
+            {"title": "Музей", "address": "Арбат, 1", "lat": "55.75", "lng": "37.59", **data},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, 201)
+        return PlaceObject.objects.get(id=response.json()["id"])
+
+    def _run_image_worker(self):
+        for place in claim_pending_image_variants(10):
+            refresh_place_image_variants(place)
+
+    def _image(self, place, accept="*/*", **params):
+        return self.client.get(f"/objects/{place.id}/image", params, HTTP_ACCEPT=accept)
+
+
+class ImageVariantTests(MediaTestCase):
+    """
+    @brief Варианты изображений мест: очередь воркера и выбор варианта по ширине
+    """
+
+    def test_upload_queues_variants_for_worker(self):
+        place = self._create_place(image=_image_upload())
+
+        self.assertEqual(place.image_variants, [])
+        self.assertIsNotNone(place.image_variants_pending_at)
+        self.assertEqual(self._image(place, w="200")["Content-Type"], "image/png")
+
+        self._run_image_worker()
+
+        place.refresh_from_db()
+        self.assertIsNone(place.image_variants_pending_at)
+        self.assertEqual(
+            sorted((variant["width"], variant["height"], variant["format"]) for variant in place.image_variants),
+            [(160, 107, "jpeg"), (160, 107, "webp"), (480, 320, "jpeg"), (480, 320, "webp")],
+        )
+        self.assertEqual(claim_pending_image_variants(10), [])
+        srcset = self._get(f"/api/objects/{place.id}").json()["image_srcset"]
+        self.assertEqual([entry.rsplit(" ", 1)[1] for entry in srcset.split(", ")], ["160w", "480w"])
+
+    def test_width_selects_narrowest_variant_in_accepted_format(self):
+        place = self._create_place(image=_image_upload())
+        self._run_image_worker()
+
+        webp = self._image(place, accept="image/avif,image/webp,*/*", w="200")
+        jpeg = self._image(place, accept="image/png,*/*", w="200")
+        widest = self._image(place, w="2000")
+
+        self.assertEqual(webp["Content-Type"], "image/webp")
+        self.assertEqual(Image.open(io.BytesIO(b"".join(webp.streaming_content))).size, (480, 320))
+        self.assertEqual(jpeg["Content-Type"], "image/jpeg")
+        self.assertIn("Accept", jpeg["Vary"])
+        self.assertEqual(Image.open(io.BytesIO(b"".join(widest.streaming_content))).width, 480)
+        self.assertEqual(self._image(place, w="0").status_code, 400)
+
+    def test_replaced_image_drops_old_variants_until_worker_runs(self):
+        place = self._create_place(image=_image_upload())
+        self._run_image_worker()
+        old_names = [variant["name"] for variant in PlaceObject.objects.get(id=place.id).image_variants]
+
+        response = self.client.put(
+            f"/api/objects/{place.id}",
+            {"image": _image_upload(color=(10, 200, 10))},
+            format="multipart",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["image_srcset"], "")
+        place.refresh_from_db()
+        self.assertEqual((place.image_variants, place.image_meta), ([], None))
+        self.assertFalse(any(os.path.exists(os.path.join(self.storage_dir, name)) for name in old_names))
+        self.assertEqual(self._image(place, accept="image/webp,*/*", w="200")["Content-Type"], "image/png")
+
+        self._run_image_worker()
+        place.refresh_from_db()
+        self.assertEqual(len(place.image_variants), 4)
+
+
+class ImageCacheControlTests(MediaTestCase):
+    """
+    @brief Долгое кэширование изображения по URL с актуальным key
+    """
+
+    def test_content_addressed_name_depends_only_on_content(self):
+        first = File(_image_upload("a.PNG"))
+        same = File(_image_upload("b.png"))
+        other = File(_image_upload("a.png", color=(0, 0, 255)))
+
+        self.assertEqual(content_addressed_name(first), content_addressed_name(same))
+        self.assertNotEqual(content_addressed_name(first), content_addressed_name(other))
+        self.assertRegex(content_addressed_name(first), r"^[0-9a-f]{64}\.png$")
+
+    def test_current_key_is_cached_as_immutable(self):
+        place = self._create_place(image=_image_upload())
+        self._run_image_worker()
+        image_url = self._get(f"/api/objects/{place.id}").json()["image_url"]
+
+        self.assertEqual(image_url, f"/objects/{place.id}/image?key={quote(place.image.name, safe='')}")
+        self.assertEqual(self.client.get(image_url)["Cache-Control"], "public, max-age=31536000, immutable")
+        self.assertEqual(
+            self._image(place, key=place.image.name, w="160")["Cache-Control"],
+            "public, max-age=31536000, immutable",
+        )
+
+    def test_stale_key_or_non_variant_width_is_revalidated(self):
+        place = self._create_place(image=_image_upload())
+        self._run_image_worker()
+        old_key = PlaceObject.objects.get(id=place.id).image.name
+        self.client.put(f"/api/objects/{place.id}", {"image": _image_upload(color=(0, 0, 255))}, format="multipart")
+        place.refresh_from_db()
+
+        self.assertNotEqual(place.image.name, old_key)
+        self.assertEqual(self._image(place, key=old_key)["Cache-Control"], "no-cache")
+        self.assertEqual(self._image(place)["Cache-Control"], "no-cache")
+        self._run_image_worker()
+        self.assertEqual(self._image(place, key=place.image.name, w="200")["Cache-Control"], "no-cache")
+
+
+class MediaRangeTests(MediaTestCase):
+    """
+    @brief Range, If-Range и условные запросы при отдаче изображения потоком
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.place = self._create_place(image=_image_upload())
+        with self.place.image.open("rb") as image_file:
+            self.content = image_file.read()
+        response = self._image(self.place)
+        b"".join(response.streaming_content)
+        self.etag = response["ETag"]
+
+    def _range(self, byte_range, **headers):
+        return self.client.get(f"/objects/{self.place.id}/image", HTTP_RANGE=byte_range, **headers)
+
+    def test_range_returns_partial_content(self):
+        response = self._range("bytes=10-19")
+        suffix = self._range("bytes=-5")
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 10-19/{len(self.content)}")
+        self.assertEqual(b"".join(response.streaming_content), self.content[10:20])
+        self.assertEqual(b"".join(suffix.streaming_content), self.content[-5:])
+
+    def test_unsatisfiable_range_returns_416(self):
+        response = self._range(f"bytes={len(self.content)}-")
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(self.content)}")
+
+    def test_if_range_serves_range_only_for_current_version(self):
+        matching = self._range("bytes=0-9", HTTP_IF_RANGE=self.etag)
+        stale = self._range("bytes=0-9", HTTP_IF_RANGE='"stale"')
+
+        self.assertEqual(matching.status_code, 206)
+        self.assertEqual(stale.status_code, 200)
+        self.assertEqual(b"".join(stale.streaming_content), self.content)
+
+    def test_if_none_match_returns_304(self):
+        response = self.client.get(f"/objects/{self.place.id}/image", HTTP_IF_NONE_MATCH=self.etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], self.etag)
+        self.assertEqual(response.content, b"")
@@ -1,20 +1,64 @@
+import base64
+import binascii
 import json
 import mimetypes
 import os
-from urllib.error import URLError
-from urllib.parse import quote, urlencode
-from urllib.request import urlopen
+from urllib.parse import quote
 
-from django.db import IntegrityError
-from django.http import FileResponse
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from pywebpush import webpush, WebPushException
 
-from .models import PlaceObject, PlaceReview, PushSubscription
+from .audience import (
+    build_place_audience,
+    parse_subscription_preferences,
+    serialize_subscription_preferences,
+)
+from .catalogue import build_etag, get_cached_payload, get_catalogue_version
+from .geo import (
+    cluster_cell_size,
+    cluster_places,
+    filter_bbox,
+    nearest_places,
+    parse_bbox,
+    parse_near_limit,
+    parse_point,
+    parse_radius,
+    parse_zoom,
+    snap_bbox_to_grid,
+)
+from .geocoding import locate_address
+from .media import IMMUTABLE_CACHE_CONTROL, describe_media_file, media_file_response
+from .media_cache import invalidate_media_cache
+from .images import (
+    IMAGE_VARIANT_CONTENT_TYPES,
+    build_image_srcset,
+    content_addressed_name,
+    delete_image_variants,
+    queue_place_image_variants,
+    select_image_variant,
+    store_place_image_meta,
+)
+from .models import PlaceImportJob, PlaceObject, PlaceReview, PushJob, PushSubscription
+from .place_io import PLACE_IO_FORMATS, enqueue_place_import, export_places, serialize_place_import_job
+from .push import (
+    build_notification_payload,
+    enqueue_push,
+    merge_notification_payloads,
+    serialize_push_job,
+)
+from .ratings import apply_review_rating
+from .search import search_places
 
 
 def _parse_bool(value):
@@ -55,6 +99,37 @@ def _parse_metros(value):
     return []
 
 
+def _check_not_modified(request, etag, last_modified):
+    """
+    @brief Обработка условного GET-запроса (If-None-Match / If-Modified-Since)
+    @param request HTTP-запрос
+    @param etag ETag актуального ответа
+    @param last_modified Время последнего изменения данных или None
+    @return HttpResponse|None Ответ 304 Not Modified или None, если ответ нужно построить
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        _set_validators(response, etag, last_modified)
+    return response
+
+
+def _set_validators(response, etag, last_modified):
+    """
+    @brief Установка заголовков валидации кэша ответа
+    Клиенты и nginx могут хранить ответ, но обязаны перепроверять его через ETag
+    @param response HTTP-ответ
+    @param etag ETag ответа
+    @param last_modified Время последнего изменения данных или None
+    @return Response Тот же ответ с заголовками ETag, Last-Modified и Cache-Control
+    """
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
 def _build_image_url(request, obj):
     """
     @brief Построение URL изображения для объекта
@@ -68,6 +143,18 @@ def _build_image_url(request, obj):
     return obj.image_url
 
 
+def _build_image_srcset(request, obj):
+    """
+    @brief Построение srcset изображения объекта по его уменьшенным вариантам
+    @param request HTTP-запрос
+    @param obj Объект места
+    @return str Значение srcset или пустая строка без вариантов
+    """
+    if not obj.image:
+        return ""
+    return build_image_srcset(_build_image_url(request, obj), obj.image_variants)
+
+
 def _is_moderator(user):
     """
     @brief Проверка, является ли пользователь модератором
@@ -79,58 +166,19 @@ def _is_moderator(user):
 
 def _geocode_address(address):
     """
-    @brief Геокодирование адреса с использованием Yandex Geocoder API
+    @brief Геокодирование адреса места с использованием Yandex Geocoder API
+    Результаты кэшируются (core.geocoding); в режиме GEOCODE_DEFERRED, а также при
+    временной ошибке геокодера координаты определяет воркер run_geocode_worker
     @param address Адрес для геокодирования
-    @return tuple|None Кортеж (широта, долгота) или None в случае ошибки
+    @return tuple Кортеж (координаты или None, поля состояния геокодирования места)
     """
-    address_value = str(address or "").strip()
-    if not address_value:
-        return None
-
-    api_key = (
-        os.getenv("YANDEX_GEOCODER_API_KEY", "").strip()
-        or os.getenv("VITE_YANDEX_GEOCODER_API_KEY", "").strip()
-    )
-    if not api_key:
-        return None
-
-    query = urlencode(
-        {
-            "apikey": api_key,
-            "geocode": address_value,
-            "format": "json",
-            "lang": "ru_RU",
-        }
-    )
-
-    try:
-        with urlopen(f"https://geocode-maps.yandex.ru/1.x/?{query}", timeout=5) as response:
-            payload = json.loads(response.read().decode("utf-8"))
-    except (URLError, TimeoutError, ValueError, json.JSONDecodeError):
-        return None
-
-    members = (
-        payload.get("response", {})
-        .get("GeoObjectCollection", {})
-        .get("featureMember", [])
-    )
-    if not members:
-        return None
-
-    point_pos = (
-        members[0]
-        .get("GeoObject", {})
-        .get("Point", {})
-        .get("pos", "")
-    )
-    if not point_pos:
-        return None
-
-    try:
-        lon_str, lat_str = point_pos.split()
-        return float(lat_str), float(lon_str)
-    except (ValueError, TypeError):
-        return None
+    coords, geocode_status = locate_address(address, deferred=settings.GEOCODE_DEFERRED)
+    pending = geocode_status == PlaceObject.GEOCODE_PENDING
+    return coords, {
+        "geocode_status": geocode_status,
+        "geocode_attempts": 0,
+        "geocode_next_attempt_at": timezone.now() if pending else None,
+    }
 
 
 def _subscription_payload_to_data(payload):
@@ -154,83 +202,237 @@ def _subscription_payload_to_data(payload):
     }
 
 
-def _build_notification_payload(notification_type, title, body, url):
+def _serialize_push_subscription(item):
     """
-    @brief Построение полезной нагрузки уведомления
-    @param notification_type Тип уведомления
-    @param title Заголовок уведомления
-    @param body Текст уведомления
-    @param url URL для перехода по умолчанию "/"
-    @return dict Словарь с данными уведомления
+    @brief Сериализация подписки на push-уведомления
+    @param item Подписка
+    @return dict Словарь с данными подписки и настройками адресной рассылки
     """
     return {
-        "type": notification_type,
-        "title": title,
-        "body": body,
-        "url": url or "/",
+        "id": item.id,
+        "endpoint": item.endpoint,
+        "preferences": serialize_subscription_preferences(item),
+        "created_at": item.created_at,
+        "updated_at": item.updated_at,
     }
 
 
-def _send_push_to_subscriptions(subscriptions, payload):
+PLACE_FLAG_FILTERS = ("sign_language", "subtitles", "ramps", "braille")
+
+
+def _get_list_param(params, name):
     """
-    @brief Отправка push-уведомлений подписчикам
-    @param subscriptions Список подписок
-    @param payload Полезная нагрузка уведомления
-    @return dict Результат отправки уведомлений
+    @brief Получение списка значений параметра запроса
+    Поддерживает как повторяющийся параметр (?metro=A&metro=B), так и список через запятую
+    @param params Параметры запроса
+    @param name Имя параметра
+    @return list Список непустых значений
     """
-    vapid_private_key = os.getenv("VAPID_PRIVATE_KEY", "").strip()
-    vapid_subject = os.getenv("VAPID_SUBJECT", "mailto:admin@example.com").strip()
+    values = params.getlist(name) if hasattr(params, "getlist") else [params.get(name, "")]
+    return [item.strip() for value in values for item in str(value).split(",") if item.strip()]
 
-    if not vapid_private_key:
-        return {
-            "sent": 0,
-            "failed": len(subscriptions),
-            "removed": 0,
-            "errors": ["VAPID_PRIVATE_KEY is not configured"],
-        }
 
-    sent = 0
-    failed = 0
-    removed = 0
-    errors = []
-
-    for subscription in subscriptions:
-        subscription_info = {
-            "endpoint": subscription.endpoint,
-            "keys": {
-                "p256dh": subscription.p256dh,
-                "auth": subscription.auth,
-            },
-        }
+def _filter_places(queryset, params):
+    """
+    @brief Фильтрация мест по признакам доступности, типу инфраструктуры и метро на стороне БД
+    @param queryset Исходный набор мест
+    @param params Параметры запроса (sign_language, subtitles, ramps, braille, infrastructure_type, metro)
+    @return QuerySet Отфильтрованный набор мест
+    """
+    for flag in PLACE_FLAG_FILTERS:
+        if params.get(flag) not in (None, ""):
+            queryset = queryset.filter(**{flag: _parse_bool(params.get(flag))})
 
-        try:
-            webpush(
-                subscription_info=subscription_info,
-                data=json.dumps(payload, ensure_ascii=False),
-                vapid_private_key=vapid_private_key,
-                vapid_claims={"sub": vapid_subject},
-            )
-            sent += 1
-        except WebPushException as exc:
-            failed += 1
-            status_code = getattr(getattr(exc, "response", None), "status_code", None)
-            if status_code in (404, 410):
-                subscription.delete()
-                removed += 1
-                continue
-            errors.append(str(exc))
-        except Exception as exc:
-            failed += 1
-            errors.append(str(exc))
+    infrastructure_types = _get_list_param(params, "infrastructure_type")
+    if infrastructure_types:
+        queryset = queryset.filter(infrastructure_type__in=infrastructure_types)
+
+    metros = _get_list_param(params, "metro")
+    if metros:
+        metro_filter = Q()
+        for metro in metros:
+            metro_filter |= Q(metros__contains=[metro])
+        queryset = queryset.filter(metro_filter)
+
+    return queryset
+
+
+PLACES_PAGE_DEFAULT_LIMIT = 50
+PLACES_PAGE_MAX_LIMIT = 200
 
+
+def _parse_page_limit(value):
+    """
+    @brief Парсинг размера страницы для постраничной выдачи мест
+    @param value Значение параметра limit
+    @return int Размер страницы в пределах [1, PLACES_PAGE_MAX_LIMIT]
+    """
+    if value in (None, ""):
+        return PLACES_PAGE_DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("limit must be a positive integer")
+    if limit < 1:
+        raise ValueError("limit must be a positive integer")
+    return min(limit, PLACES_PAGE_MAX_LIMIT)
+
+
+def _encode_place_cursor(obj):
+    """
+    @brief Кодирование курсора страницы по ключу (created_at, id)
+    @param obj Последний объект места на странице
+    @return str Непрозрачный курсор для параметра cursor
+    """
+    raw = json.dumps([obj.created_at.isoformat(), obj.id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_place_cursor(value):
+    """
+    @brief Декодирование курсора страницы
+    @param value Значение параметра cursor
+    @return tuple Кортеж (created_at, id) последнего объекта предыдущей страницы
+    """
+    try:
+        padded = value + "=" * (-len(value) % 4)
+        created_at_raw, object_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        created_at = parse_datetime(created_at_raw)
+    except (binascii.Error, UnicodeError, TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if created_at is None or not isinstance(object_id, int):
+        raise ValueError("Invalid cursor")
+    return created_at, object_id
+
+
+def _paginate_places(queryset, params):
+    """
+    @brief Постраничная выдача мест по ключу (created_at, id) без OFFSET
+    @param queryset Набор мест, отсортированный по (-created_at, -id)
+    @param params Параметры запроса (limit, cursor)
+    @return tuple Кортеж (список мест страницы, курсор следующей страницы или None)
+    """
+    limit = _parse_page_limit(params.get("limit"))
+    cursor = str(params.get("cursor", "")).strip()
+    if cursor:
+        created_at, object_id = _decode_place_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=object_id)
+        )
+
+    page = list(queryset[:limit + 1])
+    next_cursor = _encode_place_cursor(page[limit - 1]) if len(page) > limit else None
+    return page[:limit], next_cursor
+
+
+def _encode_search_cursor(offset):
+    """
+    @brief Кодирование курсора страницы результатов поиска
+    @param offset Смещение первого места следующей страницы
+    @return str Непрозрачный курсор для параметра cursor
+    """
+    raw = json.dumps({"offset": offset})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _paginate_search_results(queryset, params):
+    """
+    @brief Постраничная выдача результатов поиска в порядке релевантности
+    Ранг - вычисляемое вещественное значение, поэтому вместо ключа используется
+    смещение; порядок (-search_rank, -created_at, -id) детерминирован
+    @param queryset Найденные места (search_places)
+    @param params Параметры запроса (limit, cursor)
+    @return tuple Кортеж (список мест страницы, курсор следующей страницы или None)
+    """
+    limit = _parse_page_limit(params.get("limit"))
+    cursor = str(params.get("cursor", "")).strip()
+    offset = 0
+    if cursor:
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            offset = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))["offset"]
+        except (binascii.Error, UnicodeError, TypeError, ValueError, KeyError):
+            raise ValueError("Invalid cursor")
+        if not isinstance(offset, int) or offset < 0:
+            raise ValueError("Invalid cursor")
+
+    page = list(queryset[offset:offset + limit + 1])
+    next_cursor = _encode_search_cursor(offset + limit) if len(page) > limit else None
+    return page[:limit], next_cursor
+
+
+PLACE_MARKER_FIELDS = (
+    "id",
+    "title",
+    "address",
+    "infrastructure_type",
+    "image_url",
+    "image",
+    "image_variants",
+    "lat",
+    "lng",
+    "sign_language",
+    "subtitles",
+    "ramps",
+    "braille",
+)
+
+
+def _serialize_place_marker(request, obj):
+    """
+    @brief Облегченная сериализация места для отрисовки маркера на карте
+    @param request HTTP-запрос
+    @param obj Объект места, загруженный с полями PLACE_MARKER_FIELDS
+    @return dict Словарь с данными маркера
+    """
     return {
-        "sent": sent,
-        "failed": failed,
-        "removed": removed,
-        "errors": errors[:10],
+        "id": obj.id,
+        "title": obj.title,
+        "address": obj.address,
+        "infrastructure_type": obj.infrastructure_type,
+        "image_url": _build_image_url(request, obj),
+        "image_srcset": _build_image_srcset(request, obj),
+        "lat": obj.lat,
+        "lng": obj.lng,
+        "sign_language": obj.sign_language,
+        "subtitles": obj.subtitles,
+        "ramps": obj.ramps,
+        "braille": obj.braille,
     }
 
 
+def _get_place_clusters(queryset, params):
+    """
+    @brief Получение кластеров мест для уровня масштаба с кэшированием
+    Ключ кэша строится из версии каталога, уровня масштаба, выровненного по сетке bbox
+    и фильтров, поэтому соседние запросы при панорамировании переиспользуют результат
+    @param queryset Отфильтрованный набор мест
+    @param params Параметры запроса (zoom, bbox и фильтры)
+    @return list Список кластеров
+    """
+    zoom = parse_zoom(params.get("zoom"))
+    bbox = None
+    if "bbox" in params:
+        bbox = snap_bbox_to_grid(parse_bbox(params.get("bbox")), cluster_cell_size(zoom))
+        queryset = filter_bbox(queryset, bbox)
+
+    key_params = sorted(
+        (name, tuple(params.getlist(name)))
+        for name in params
+        if name not in {"zoom", "bbox", "cluster"}
+    )
+    version_key = json.dumps(
+        [str(get_catalogue_version()), zoom, bbox, key_params],
+        ensure_ascii=False,
+    )
+    return get_cached_payload(
+        "clusters",
+        version_key,
+        lambda: cluster_places(queryset, zoom),
+        timeout=settings.PLACE_CLUSTERS_CACHE_TIMEOUT,
+    )
+
+
 def _serialize_place(request, obj, include_reviews=False):
     """
     @brief Сериализация объекта места в словарь
@@ -239,12 +441,6 @@ def _serialize_place(request, obj, include_reviews=False):
     @param include_reviews Флаг включения отзывов
     @return dict Словарь с сериализованными данными места
     """
-    reviews_qs = obj.reviews.all()
-    reviews_list = list(reviews_qs) if include_reviews else None
-    rated_reviews = [review for review in (reviews_list or reviews_qs) if getattr(review, "rating", None)]
-    rating_count = len(rated_reviews)
-    rating_avg = round(sum(review.rating for review in rated_reviews) / rating_count, 1) if rating_count else 0
-
     payload = {
         "id": obj.id,
         "title": obj.title,
@@ -256,15 +452,17 @@ def _serialize_place(request, obj, include_reviews=False):
         "schedule": obj.schedule,
         "metros": obj.metros,
         "image_url": _build_image_url(request, obj),
+        "image_srcset": _build_image_srcset(request, obj),
         "lat": obj.lat,
         "lng": obj.lng,
+        "geocode_status": obj.geocode_status,
         "sign_language": obj.sign_language,
         "subtitles": obj.subtitles,
         "ramps": obj.ramps,
         "braille": obj.braille,
         "created_at": obj.created_at,
-        "rating_avg": rating_avg,
-        "rating_count": rating_count,
+        "rating_avg": obj.rating_avg,
+        "rating_count": obj.rating_count,
     }
 
     if include_reviews:
@@ -276,28 +474,86 @@ def _serialize_place(request, obj, include_reviews=False):
                 "rating": review.rating,
                 "created_at": review.created_at,
             }
-            for review in reviews_list or []
+            for review in obj.reviews.all()
         ]
 
     return payload
 
 
+def _build_objects_list(request):
+    """
+    @brief Построение данных ответа GET /api/objects в зависимости от параметров запроса
+    @param request HTTP-запрос
+    @return list|dict Список мест, страница, маркеры или кластеры
+    @throws ValueError При некорректных параметрах запроса
+    """
+    places = _filter_places(PlaceObject.objects.defer("search_vector"), request.query_params).order_by("-created_at", "-id")
+    search_text = str(request.query_params.get("q", "")).strip()
+    if search_text:
+        places = search_places(places, search_text)
+
+    if _parse_bool(request.query_params.get("cluster")):
+        return _get_place_clusters(places, request.query_params)
+
+    if "near" in request.query_params:
+        lat, lng = parse_point(request.query_params.get("near"))
+        radius = parse_radius(request.query_params.get("radius"))
+        limit = parse_near_limit(request.query_params.get("limit"))
+        items = []
+        for obj, distance in nearest_places(places, lat, lng, radius, limit):
+            item = _serialize_place(request, obj)
+            item["distance_m"] = round(distance)
+            items.append(item)
+        return items
+
+    if "bbox" in request.query_params:
+        bbox = parse_bbox(request.query_params.get("bbox"))
+        markers = filter_bbox(places, bbox).only(*PLACE_MARKER_FIELDS)
+        return [_serialize_place_marker(request, obj) for obj in markers]
+
+    if "limit" not in request.query_params and "cursor" not in request.query_params:
+        return [_serialize_place(request, obj) for obj in places]
+
+    if search_text:
+        page, next_cursor = _paginate_search_results(places, request.query_params)
+    else:
+        page, next_cursor = _paginate_places(places, request.query_params)
+    return {
+        "items": [_serialize_place(request, obj) for obj in page],
+        "next": next_cursor,
+    }
+
+
 @api_view(["GET", "POST"])
 @permission_classes([AllowAny])
 def objects_api(request):
     """
     @brief API для получения и создания объектов мест
-    GET: Возвращает список всех мест
+    GET: Возвращает список мест с фильтрами по доступности, типу и метро;
+         с параметрами limit/cursor - страницу {items, next};
+         с параметром bbox - облегченные маркеры мест в видимой области карты;
+         с параметрами cluster=1&zoom - кластеры мест для уровня масштаба карты;
+         с параметрами near=lat,lng&radius - ближайшие места с расстоянием distance_m;
+         параметр q - полнотекстовый поиск: места по убыванию релевантности,
+         с параметрами limit/cursor - страницу {items, next} в том же порядке;
+         ответ снабжается ETag, условный запрос (If-None-Match) получает 304 Not Modified
     POST: Создает новое место (только для модераторов)
     @param request HTTP-запрос
     @return Response Ответ с данными мест или результатом создания
     """
     if request.method == "GET":
-        items = [
-            _serialize_place(request, obj)
-            for obj in PlaceObject.objects.order_by("-created_at")
-        ]
-        return Response(items)
+        last_modified, places_count = get_catalogue_version()
+        etag = build_etag("objects", last_modified, places_count, request.get_full_path())
+        # Удаление места не сдвигает max(updated_at), поэтому список валидируется только
+        # по ETag (в нем есть количество мест): If-Modified-Since вернул бы 304 с удаленным местом.
+        not_modified = _check_not_modified(request, etag, None)
+        if not_modified is not None:
+            return not_modified
+        try:
+            items = get_cached_payload("objects", etag, lambda: _build_objects_list(request))
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return _set_validators(Response(items), etag, None)
 
     if not _is_moderator(request.user):
         if not request.user.is_authenticated:
@@ -313,12 +569,15 @@ def objects_api(request):
             checklist = {}
 
     image_file = request.FILES.get("image")
+    if image_file:
+        image_file.name = content_addressed_name(image_file)
 
     lat_value = data.get("lat") or data.get("latitude")
     lng_value = data.get("lng") or data.get("longitude")
     fallback_coords = None
+    geocode_fields = {}
     if not lat_value or not lng_value:
-        fallback_coords = _geocode_address(data.get("address", ""))
+        fallback_coords, geocode_fields = _geocode_address(data.get("address", ""))
 
     try:
         obj = PlaceObject.objects.create(
@@ -338,6 +597,9 @@ def objects_api(request):
             subtitles=_parse_bool(data.get("subtitles", checklist.get("subtitles"))),
             ramps=_parse_bool(data.get("ramps", checklist.get("ramps"))),
             braille=_parse_bool(data.get("braille", checklist.get("braille"))),
+            # Варианты изображения строит воркер run_image_worker.
+            image_variants_pending_at=timezone.now() if image_file else None,
+            **geocode_fields,
         )
     except IntegrityError:
         return Response(
@@ -345,9 +607,8 @@ def objects_api(request):
             status=status.HTTP_409_CONFLICT,
         )
 
-    subscriptions = list(PushSubscription.objects.select_related("user").all())
     notifications = [
-        _build_notification_payload(
+        build_notification_payload(
             "new_place",
             "Новое заведение",
             f"Добавлено новое место: {obj.title}",
@@ -356,7 +617,7 @@ def objects_api(request):
     ]
     if obj.upcoming_event:
         notifications.append(
-            _build_notification_payload(
+            build_notification_payload(
                 "event",
                 "Предстоящее событие",
                 f"{obj.title}: {obj.upcoming_event}",
@@ -365,19 +626,103 @@ def objects_api(request):
         )
     if obj.discount_info:
         notifications.append(
-            _build_notification_payload(
+            build_notification_payload(
                 "discount",
                 "Новая скидка",
                 f"{obj.title}: {obj.discount_info}",
                 f"/building/{obj.id}",
             )
         )
-    for notification_payload in notifications:
-        _send_push_to_subscriptions(subscriptions, notification_payload)
+    # Уведомления одной записи уходят подписчику одним push-сообщением из принимаемых им типов.
+    enqueue_push(
+        merge_notification_payloads(notifications),
+        coalesce_key=f"place:{obj.id}",
+        audience=build_place_audience(obj),
+    )
 
     return Response({"id": obj.id}, status=status.HTTP_201_CREATED)
 
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def objects_export(request):
+    """
+    @brief API для выгрузки всех мест в файл
+    Только для модераторов. Ответ передается потоком, места читаются серверным курсором
+    @param request HTTP-запрос с параметрами type (ndjson|csv) и reviews (true|false)
+    @return StreamingHttpResponse Файл выгрузки
+    """
+    if not _is_moderator(request.user):
+        return Response({"error": "Moderator permissions required"}, status=status.HTTP_403_FORBIDDEN)
+
+    file_format = str(request.query_params.get("type", "ndjson")).strip().lower()
+    if file_format not in PLACE_IO_FORMATS:
+        return Response(
+            {"error": f"type must be one of: {', '.join(PLACE_IO_FORMATS)}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    include_reviews = _parse_bool(request.query_params.get("reviews", "true"))
+    response = StreamingHttpResponse(
+        export_places(file_format, include_reviews=include_reviews),
+        content_type="text/csv; charset=utf-8" if file_format == "csv" else "application/x-ndjson; charset=utf-8",
+    )
+    response["Content-Disposition"] = f'attachment; filename="places.{file_format}"'
+    return response
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def objects_import(request):
+    """
+    @brief API для загрузки мест и отзывов из файла
+    Только для модераторов. Файл (поле file) сохраняется в хранилище, импорт ставится
+    в очередь и выполняется воркером run_import_worker: файл читается построчно и
+    сохраняется пакетами; места с совпадающими названием и адресом обновляются
+    (или пропускаются при skip_existing)
+    @param request HTTP-запрос с файлом NDJSON или CSV и параметрами type, skip_existing
+    @return Response Созданное задание импорта (202)
+    """
+    if not _is_moderator(request.user):
+        return Response({"error": "Moderator permissions required"}, status=status.HTTP_403_FORBIDDEN)
+
+    upload = request.FILES.get("file")
+    if upload is None:
+        return Response({"error": "file is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+    default_format = "csv" if upload.name.lower().endswith(".csv") else "ndjson"
+    file_format = str(request.data.get("type") or default_format).strip().lower()
+    if file_format not in PLACE_IO_FORMATS:
+        return Response(
+            {"error": f"type must be one of: {', '.join(PLACE_IO_FORMATS)}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    job = enqueue_place_import(
+        upload,
+        file_format,
+        update_existing=not _parse_bool(request.data.get("skip_existing")),
+    )
+    return Response({"job": serialize_place_import_job(job)}, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def objects_import_job(request, job_id):
+    """
+    @brief API для получения статуса и статистики задания импорта
+    Только для модераторов
+    @param request HTTP-запрос
+    @param job_id ID задания
+    @return Response Статус задания и статистика импорта
+    """
+    if not _is_moderator(request.user):
+        return Response({"error": "Moderator permissions required"}, status=status.HTTP_403_FORBIDDEN)
+
+    job = get_object_or_404(PlaceImportJob, id=job_id)
+    return Response(serialize_place_import_job(job))
+
+
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def health(request):
@@ -423,16 +768,34 @@ def push_public_key(request):
 def object_detail(request, object_id):
     """
     @brief API для получения, обновления и удаления деталей объекта
-    GET: Возвращает подробную информацию о месте
+    GET: Возвращает подробную информацию о месте (с ETag/Last-Modified, поддерживает 304)
     PUT: Обновляет информацию о месте (только для модераторов)
     DELETE: Удаляет место (только для модераторов)
     @param request HTTP-запрос
     @param object_id ID объекта
     @return Response Ответ с данными объекта или результатом операции
     """
-    obj = get_object_or_404(PlaceObject, id=object_id)
     if request.method == "GET":
-        return Response(_serialize_place(request, obj, include_reviews=True))
+        last_modified = get_object_or_404(
+            PlaceObject.objects.values_list("updated_at", flat=True),
+            id=object_id,
+        )
+        etag = build_etag("object", object_id, last_modified)
+        not_modified = _check_not_modified(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        payload = get_cached_payload(
+            "object",
+            etag,
+            lambda: _serialize_place(
+                request,
+                get_object_or_404(PlaceObject.objects.defer("search_vector").prefetch_related("reviews"), id=object_id),
+                include_reviews=True,
+            ),
+        )
+        return _set_validators(Response(payload), etag, last_modified)
+
+    obj = get_object_or_404(PlaceObject, id=object_id)
 
     if request.method == "DELETE":
         if not _is_moderator(request.user):
@@ -440,6 +803,8 @@ def object_detail(request, object_id):
                 return Response({"error": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
             return Response({"error": "Moderator permissions required"}, status=status.HTTP_403_FORBIDDEN)
         if obj.image:
+            delete_image_variants(obj.image_variants, obj.image.storage)
+            invalidate_media_cache(obj.image.name)
             obj.image.delete(save=False)
         obj.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -460,6 +825,8 @@ def object_detail(request, object_id):
             checklist = {}
 
     image_file = request.FILES.get("image")
+    if image_file:
+        image_file.name = content_addressed_name(image_file)
     previous_image_name = obj.image.name if image_file and obj.image else None
 
     try:
@@ -475,48 +842,62 @@ def object_detail(request, object_id):
         obj.lat = data.get("lat") or data.get("latitude") or obj.lat
         obj.lng = data.get("lng") or data.get("longitude") or obj.lng
         if (obj.lat is None or obj.lng is None) and obj.address:
-            fallback_coords = _geocode_address(obj.address)
+            fallback_coords, geocode_fields = _geocode_address(obj.address)
+            for field, value in geocode_fields.items():
+                setattr(obj, field, value)
             if fallback_coords:
                 obj.lat = obj.lat if obj.lat is not None else fallback_coords[0]
                 obj.lng = obj.lng if obj.lng is not None else fallback_coords[1]
+        elif obj.geocode_status == PlaceObject.GEOCODE_PENDING:
+            # Координаты заданы вручную - отложенное геокодирование больше не нужно.
+            obj.geocode_status = PlaceObject.GEOCODE_NONE
+            obj.geocode_next_attempt_at = None
         obj.sign_language = _parse_bool(data.get("sign_language", checklist.get("signLanguage", obj.sign_language)))
         obj.subtitles = _parse_bool(data.get("subtitles", checklist.get("subtitles", obj.subtitles)))
         obj.ramps = _parse_bool(data.get("ramps", checklist.get("ramps", obj.ramps)))
         obj.braille = _parse_bool(data.get("braille", checklist.get("braille", obj.braille)))
+        previous_variants = []
         if image_file:
             obj.image = image_file
+            previous_variants = queue_place_image_variants(obj)
         obj.save()
+        delete_image_variants(previous_variants, obj.image.storage)
         if previous_image_name and obj.image and obj.image.name != previous_image_name:
             try:
                 obj.image.storage.delete(previous_image_name)
             except Exception:
                 pass
+            invalidate_media_cache(previous_image_name)
     except IntegrityError:
         return Response(
             {"error": "Object with same title and address already exists"},
             status=status.HTTP_409_CONFLICT,
         )
 
-    subscriptions = list(PushSubscription.objects.select_related("user").all())
+    notifications = []
     if obj.upcoming_event and obj.upcoming_event != previous_upcoming_event:
-        _send_push_to_subscriptions(
-            subscriptions,
-            _build_notification_payload(
+        notifications.append(
+            build_notification_payload(
                 "event",
                 "Обновление события",
                 f"{obj.title}: {obj.upcoming_event}",
                 f"/building/{obj.id}",
-            ),
+            )
         )
     if obj.discount_info and obj.discount_info != previous_discount_info:
-        _send_push_to_subscriptions(
-            subscriptions,
-            _build_notification_payload(
+        notifications.append(
+            build_notification_payload(
                 "discount",
                 "Обновление скидки",
                 f"{obj.title}: {obj.discount_info}",
                 f"/building/{obj.id}",
-            ),
+            )
+        )
+    if notifications:
+        enqueue_push(
+            merge_notification_payloads(notifications),
+            coalesce_key=f"place:{obj.id}",
+            audience=build_place_audience(obj),
         )
 
     return Response(_serialize_place(request, obj, include_reviews=True))
@@ -527,18 +908,62 @@ def object_detail(request, object_id):
 def object_image(request, object_id):
     """
     @brief Получение изображения объекта по ID
+    С параметром w отдается ближайший не меньший уменьшенный вариант
+    (WebP, если клиент его принимает, иначе JPEG); без вариантов - оригинал.
+    Имя файла в хранилище не переиспользуется, поэтому ответ на URL с актуальным key
+    (и точной шириной варианта) кэшируется как неизменяемый; байты отдаются
+    в режиме MEDIA_DELIVERY (core.media). Условные запросы и Range обслуживаются
+    по метаданным файла, сохраненным в БД
     @param request HTTP-запрос
     @param object_id ID объекта
-    @return FileResponse Файл изображения объекта
+    @return HttpResponse Файл изображения объекта
     """
-    obj = get_object_or_404(PlaceObject, id=object_id)
+    obj = get_object_or_404(PlaceObject.objects.only("id", "image", "image_variants", "image_meta"), id=object_id)
     if not obj.image:
         return Response({"error": "Image not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    content_type, _ = mimetypes.guess_type(obj.image.name)
-    image_file = obj.image.open("rb")
-    response = FileResponse(image_file, content_type=content_type or "application/octet-stream")
-    response["Cache-Control"] = "no-store"
+    width = request.query_params.get("w")
+    variant = None
+    if width:
+        try:
+            width = int(width)
+        except (TypeError, ValueError):
+            return Response({"error": "w must be a positive integer"}, status=status.HTTP_400_BAD_REQUEST)
+        if width <= 0:
+            return Response({"error": "w must be a positive integer"}, status=status.HTTP_400_BAD_REQUEST)
+        variant = select_image_variant(
+            obj.image_variants,
+            width,
+            "image/webp" in request.META.get("HTTP_ACCEPT", ""),
+        )
+
+    if variant:
+        name = variant["name"]
+        content_type = IMAGE_VARIANT_CONTENT_TYPES[variant["format"]]
+        meta = variant if "size" in variant else None
+    else:
+        name = obj.image.name
+        content_type, _ = mimetypes.guess_type(name)
+        meta = obj.image_meta
+    if not meta:
+        meta = describe_media_file(obj.image.storage, name)
+        store_place_image_meta(obj, variant, meta)
+
+    # Устаревший key (изображение заменено) или ширина не из srcset получают тот же файл,
+    # но без долгого кэширования: содержимое по такому URL может измениться.
+    versioned = request.query_params.get("key") == obj.image.name and (
+        not width or (variant is not None and variant["width"] == width)
+    )
+    response = media_file_response(
+        request,
+        obj.image.storage,
+        name,
+        meta,
+        content_type or "application/octet-stream",
+        cache_control=IMMUTABLE_CACHE_CONTROL if versioned else "no-cache",
+    )
+    if width:
+        patch_vary_headers(response, ["Accept"])
     return response
 
 
@@ -569,12 +994,14 @@ def object_reviews(request, object_id):
     if rating < 1 or rating > 5:
         return Response({"error": "Rating must be from 1 to 5"}, status=status.HTTP_400_BAD_REQUEST)
 
-    review = PlaceReview.objects.create(
-        place=obj,
-        author_name=request.user.username,
-        text=text,
-        rating=rating,
-    )
+    with transaction.atomic():
+        review = PlaceReview.objects.create(
+            place=obj,
+            author_name=request.user.username,
+            text=text,
+            rating=rating,
+        )
+        apply_review_rating(obj.id, review.rating, 1)
     return Response(
         {
             "id": review.id,
@@ -612,17 +1039,21 @@ def object_review_detail(request, object_id, review_id):
             status=status.HTTP_403_FORBIDDEN,
         )
 
-    review.delete()
+    with transaction.atomic():
+        deleted_count, _ = PlaceReview.objects.filter(id=review.id).delete()
+        if deleted_count:
+            apply_review_rating(obj.id, review.rating, -1)
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-@api_view(["GET", "POST", "DELETE"])
+@api_view(["GET", "POST", "PATCH", "DELETE"])
 @permission_classes([IsAuthenticated])
 def push_subscriptions_api(request):
     """
     @brief API для управления подписками на push-уведомления
     GET: Возвращает список подписок пользователя
-    POST: Создает новую подписку
+    POST: Создает новую подписку (с необязательными настройками preferences)
+    PATCH: Обновляет настройки адресной рассылки подписки по endpoint
     DELETE: Удаляет существующую подписку
     @param request HTTP-запрос
     @return Response Результат операции с подписками
@@ -631,12 +1062,7 @@ def push_subscriptions_api(request):
 
     if request.method == "GET":
         items = [
-            {
-                "id": item.id,
-                "endpoint": item.endpoint,
-                "created_at": item.created_at,
-                "updated_at": item.updated_at,
-            }
+            _serialize_push_subscription(item)
             for item in PushSubscription.objects.filter(user=user).order_by("-updated_at")
         ]
         return Response({"items": items})
@@ -648,28 +1074,39 @@ def push_subscriptions_api(request):
         deleted_count, _ = PushSubscription.objects.filter(user=user, endpoint=endpoint).delete()
         return Response({"deleted": deleted_count})
 
+    preferences = None
+    if request.data.get("preferences") is not None:
+        try:
+            preferences = parse_subscription_preferences(request.data.get("preferences"))
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if request.method == "PATCH":
+        endpoint = str(request.data.get("endpoint", "")).strip()
+        if not endpoint or preferences is None:
+            return Response({"error": "endpoint and preferences are required"}, status=status.HTTP_400_BAD_REQUEST)
+        item = get_object_or_404(PushSubscription, user=user, endpoint=endpoint)
+        for field, value in preferences.items():
+            setattr(item, field, value)
+        item.save(update_fields=[*preferences, "updated_at"])
+        return Response(_serialize_push_subscription(item))
+
     subscription_data = _subscription_payload_to_data(request.data)
     if not subscription_data:
         return Response({"error": "Invalid subscription payload"}, status=status.HTTP_400_BAD_REQUEST)
 
+    # Повторная регистрация без preferences сохраняет ранее заданные настройки.
     item, _ = PushSubscription.objects.update_or_create(
         endpoint=subscription_data["endpoint"],
         defaults={
             "user": user,
             "p256dh": subscription_data["p256dh"],
             "auth": subscription_data["auth"],
+            **(preferences or {}),
         },
     )
 
-    return Response(
-        {
-            "id": item.id,
-            "endpoint": item.endpoint,
-            "created_at": item.created_at,
-            "updated_at": item.updated_at,
-        },
-        status=status.HTTP_201_CREATED,
-    )
+    return Response(_serialize_push_subscription(item), status=status.HTTP_201_CREATED)
 
 
 @api_view(["POST"])
@@ -677,9 +1114,10 @@ def push_subscriptions_api(request):
 def push_notify_api(request):
     """
     @brief API для отправки push-уведомлений всем подписчикам
-    Только для модераторов
+    Только для модераторов. Рассылка ставится в очередь и выполняется воркером,
+    статистика доставки доступна по GET /api/push/jobs/<id>
     @param request HTTP-запрос с данными уведомления
-    @return Response Результат отправки уведомлений
+    @return Response Полезная нагрузка и созданное задание рассылки (202)
     """
     if not _is_moderator(request.user):
         return Response({"error": "Moderator permissions required"}, status=status.HTTP_403_FORBIDDEN)
@@ -692,11 +1130,30 @@ def push_notify_api(request):
     if not title or not body:
         return Response({"error": "title and body are required"}, status=status.HTTP_400_BAD_REQUEST)
 
-    payload = _build_notification_payload(notification_type, title, body, url)
-    subscriptions = list(PushSubscription.objects.select_related("user").all())
-    delivery = _send_push_to_subscriptions(subscriptions, payload)
+    payload = build_notification_payload(notification_type, title, body, url)
+    job = enqueue_push(payload)
 
-    return Response({
-        "payload": payload,
-        "delivery": delivery,
-    })
+    return Response(
+        {
+            "payload": payload,
+            "job": serialize_push_job(job),
+        },
+        status=status.HTTP_202_ACCEPTED,
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def push_job_detail(request, job_id):
+    """
+    @brief API для получения статуса и статистики задания рассылки
+    Только для модераторов
+    @param request HTTP-запрос
+    @param job_id ID задания
+    @return Response Статус задания и статистика доставки
+    """
+    if not _is_moderator(request.user):
+        return Response({"error": "Moderator permissions required"}, status=status.HTTP_403_FORBIDDEN)
+
+    job = get_object_or_404(PushJob, id=job_id)
+    return Response(serialize_push_job(job))
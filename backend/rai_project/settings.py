@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'corsheaders',
     'rest_framework',
     'rest_framework_simplejwt',
@@ -167,6 +168,94 @@ AWS_S3_OBJECT_PARAMETERS = {
     'CacheControl': 'max-age=86400',
 }
 
+# Cache: локальная память процесса по умолчанию, общий Redis-совместимый бэкенд при REDIS_URL
+REDIS_URL = os.getenv('REDIS_URL', '').strip()
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'rai-default',
+        }
+    }
+
+# Время жизни закэшированной версии каталога (секунды). Ограничивает устаревание
+# в других воркерах, когда кэш локальный и сигналы сбрасывают его только в своем процессе
+CATALOGUE_VERSION_CACHE_TIMEOUT = int(os.getenv('CATALOGUE_VERSION_CACHE_TIMEOUT', '30'))
+# Время жизни закэшированных сериализованных ответов каталога (секунды)
+CATALOGUE_CACHE_TIMEOUT = int(os.getenv('CATALOGUE_CACHE_TIMEOUT', '3600'))
+# Время жизни кэша кластеров маркеров карты (секунды)
+PLACE_CLUSTERS_CACHE_TIMEOUT = int(os.getenv('PLACE_CLUSTERS_CACHE_TIMEOUT', '600'))
+
+# Очередь push-рассылок (core.PushJob, воркер run_push_worker)
+PUSH_JOB_MAX_ATTEMPTS = int(os.getenv('PUSH_JOB_MAX_ATTEMPTS', '5'))
+PUSH_JOB_RETRY_BASE_DELAY = int(os.getenv('PUSH_JOB_RETRY_BASE_DELAY', '30'))
+PUSH_JOB_RETRY_MAX_DELAY = int(os.getenv('PUSH_JOB_RETRY_MAX_DELAY', '3600'))
+# Захват задания продлевается перед каждым пакетом из PUSH_JOB_BATCH_SIZE подписчиков;
+# задание без продления дольше PUSH_JOB_STALE_TIMEOUT (секунды) захватывается повторно
+PUSH_JOB_BATCH_SIZE = int(os.getenv('PUSH_JOB_BATCH_SIZE', '500'))
+PUSH_JOB_STALE_TIMEOUT = int(os.getenv('PUSH_JOB_STALE_TIMEOUT', '600'))
+# Окно объединения уведомлений об одном месте (секунды, 0 - объединять только
+# уведомления одного запроса)
+PUSH_COALESCE_WINDOW = int(os.getenv('PUSH_COALESCE_WINDOW', '0'))
+# Доставка push-уведомлений: число параллельных запросов, ограничение частоты
+# запросов к одному push-сервису (в секунду, 0 - без ограничения) и таймаут запроса
+PUSH_MAX_CONCURRENCY = int(os.getenv('PUSH_MAX_CONCURRENCY', '32'))
+PUSH_ORIGIN_RATE_LIMIT = float(os.getenv('PUSH_ORIGIN_RATE_LIMIT', '0'))
+PUSH_REQUEST_TIMEOUT = float(os.getenv('PUSH_REQUEST_TIMEOUT', '10'))
+# Срок действия подписанного токена VAPID и запас до истечения, после которого
+# токен подписывается заново (секунды; push-сервисы принимают не больше 24 часов)
+PUSH_VAPID_TOKEN_TTL = int(os.getenv('PUSH_VAPID_TOKEN_TTL', '43200'))
+PUSH_VAPID_RENEW_BEFORE = int(os.getenv('PUSH_VAPID_RENEW_BEFORE', '600'))
+# Подписки, не обновлявшиеся дольше этого срока (дни), удаляет prune_push_subscriptions
+PUSH_SUBSCRIPTION_MAX_AGE_DAYS = int(os.getenv('PUSH_SUBSCRIPTION_MAX_AGE_DAYS', '180'))
+
+# Очередь импорта мест из API (core.PlaceImportJob, воркер run_import_worker): задание
+# running без обновлений статистики дольше PLACE_IMPORT_STALE_TIMEOUT (секунды) захватывается повторно
+PLACE_IMPORT_MAX_ATTEMPTS = int(os.getenv('PLACE_IMPORT_MAX_ATTEMPTS', '3'))
+PLACE_IMPORT_STALE_TIMEOUT = int(os.getenv('PLACE_IMPORT_STALE_TIMEOUT', '600'))
+
+# Геокодирование адресов (Yandex Geocoder API) и его кэш: таймаут запроса (секунды),
+# срок жизни отрицательного результата (секунды) и размер LRU-кэша в памяти процесса
+GEOCODER_URL = os.getenv('GEOCODER_URL', 'https://geocode-maps.yandex.ru/1.x/')
+GEOCODER_TIMEOUT = float(os.getenv('GEOCODER_TIMEOUT', '5'))
+GEOCODE_NEGATIVE_TTL = int(os.getenv('GEOCODE_NEGATIVE_TTL', '86400'))
+GEOCODE_LRU_SIZE = int(os.getenv('GEOCODE_LRU_SIZE', '2048'))
+# Отложенное геокодирование: место сохраняется сразу со статусом pending, координаты
+# определяет воркер run_geocode_worker с повторами и экспоненциальной задержкой
+GEOCODE_DEFERRED = os.getenv('GEOCODE_DEFERRED', 'False') == 'True'
+GEOCODE_MAX_ATTEMPTS = int(os.getenv('GEOCODE_MAX_ATTEMPTS', '5'))
+GEOCODE_RETRY_BASE_DELAY = int(os.getenv('GEOCODE_RETRY_BASE_DELAY', '30'))
+GEOCODE_RETRY_MAX_DELAY = int(os.getenv('GEOCODE_RETRY_MAX_DELAY', '3600'))
+GEOCODE_LEASE_TIMEOUT = int(os.getenv('GEOCODE_LEASE_TIMEOUT', '300'))
+# Варианты изображений мест: ширины в пикселях (WebP и JPEG для каждой) и качество сжатия
+IMAGE_VARIANT_WIDTHS = [
+    int(width) for width in os.getenv('IMAGE_VARIANT_WIDTHS', '160,480,1080').split(',') if width.strip()
+]
+IMAGE_VARIANT_WEBP_QUALITY = int(os.getenv('IMAGE_VARIANT_WEBP_QUALITY', '80'))
+IMAGE_VARIANT_JPEG_QUALITY = int(os.getenv('IMAGE_VARIANT_JPEG_QUALITY', '82'))
+# Варианты строит воркер run_image_worker; место, захваченное упавшим воркером,
+# захватывается повторно через IMAGE_VARIANT_LEASE_TIMEOUT секунд
+IMAGE_VARIANT_LEASE_TIMEOUT = int(os.getenv('IMAGE_VARIANT_LEASE_TIMEOUT', '300'))
+# Размеры квадратных вариантов аватара в пикселях; исходный файл аватара не хранится
+AVATAR_SIZES = [int(size) for size in os.getenv('AVATAR_SIZES', '48,96,256').split(',') if size.strip()]
+# Отдача файлов из хранилища: stream - поток через Django (разработка), accel - заголовок
+# X-Accel-Redirect для nginx (внутренний location MEDIA_ACCEL_REDIRECT_PREFIX), redirect -
+# перенаправление на публичный URL бакета (MEDIA_PUBLIC_BASE_URL или URL хранилища)
+MEDIA_DELIVERY = os.getenv('MEDIA_DELIVERY', 'stream')
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv('MEDIA_ACCEL_REDIRECT_PREFIX', '/internal-media/')
+MEDIA_PUBLIC_BASE_URL = os.getenv('MEDIA_PUBLIC_BASE_URL', '')
+# Дисковый read-through кэш файлов хранилища для режима stream (общий для воркеров узла):
+# каталог (пусто - без кэша) и максимальный размер в мегабайтах
+MEDIA_CACHE_DIR = os.getenv('MEDIA_CACHE_DIR', '')
+MEDIA_CACHE_MAX_SIZE_MB = int(os.getenv('MEDIA_CACHE_MAX_SIZE_MB', '512'))
+
 CORS_ALLOWED_ORIGINS = os.getenv(
     'CORS_ALLOWED_ORIGINS',
     'http://localhost,http://127.0.0.1,http://0.0.0.0,http://localhost:5173,http://127.0.0.1:5173,http://0.0.0.0:5173'
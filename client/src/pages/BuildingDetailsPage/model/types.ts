@@ -15,6 +15,7 @@ export interface BuildingDetails {
   upcoming_event?: string;
   discount_info?: string;
   image_url: string;
+  image_srcset?: string;
   sign_language: boolean;
   subtitles: boolean;
   ramps: boolean;
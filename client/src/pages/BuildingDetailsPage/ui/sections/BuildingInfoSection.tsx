@@ -78,6 +78,8 @@ export const BuildingInfoSection: React.FC<BuildingInfoSectionProps> = ({
       {building.image_url && !isImageBroken ? (
         <img
           src={building.image_url}
+          srcSet={building.image_srcset || undefined}
+          sizes="(max-width: 768px) 100vw, 50vw"
           alt={building.title}
           className="building-image"
           onError={() => setIsImageBroken(true)}
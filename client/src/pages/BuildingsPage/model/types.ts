@@ -6,6 +6,7 @@ export interface BuildingListItem {
   schedule: string;
   metros: string[];
   image_url: string;
+  image_srcset?: string;
   infrastructure_type?: string;
   infrastructureType?: string;
   sign_language?: boolean;
@@ -53,6 +53,9 @@ export const BuildingsList: React.FC<BuildingsListProps> = ({
             {building.image_url && !brokenImageIds.has(building.id) ? (
               <img
                 src={building.image_url}
+                srcSet={building.image_srcset || undefined}
+                sizes="(max-width: 600px) 100vw, 360px"
+                loading="lazy"
                 alt={building.title}
                 onError={() =>
                   setBrokenImageIds((prev) => {
@@ -13,6 +13,7 @@ interface MapObject {
   name?: string
   address?: string
   image_url?: string
+  image_srcset?: string
   imageUrl?: string
   lat?: number
   lng?: number
@@ -79,9 +80,12 @@ function MapSearchPage() {
       const title = object.title || object.name || 'Без названия'
       const description = object.description || object.address || 'Описание отсутствует'
       const imageUrl = object.image_url || object.imageUrl || ''
+      const imageSrcset = object.image_srcset
+        ? ` srcset="${escapeHtml(object.image_srcset)}" sizes="260px"`
+        : ''
 
       const photo = imageUrl
-        ? `<img src="${escapeHtml(imageUrl)}" alt="${escapeHtml(title)}" style="width:100%;height:120px;object-fit:cover;border-radius:8px;margin-bottom:8px;" />`
+        ? `<img src="${escapeHtml(imageUrl)}"${imageSrcset} alt="${escapeHtml(title)}" style="width:100%;height:120px;object-fit:cover;border-radius:8px;margin-bottom:8px;" />`
         : ''
 
       const yandexRouteUrl = `https://yandex.ru/maps/?rtext=~${coords[0]},${coords[1]}&rtt=auto`
@@ -29,6 +29,7 @@ interface AuthResponse {
     email: string;
     is_moderator: boolean;
     avatar_url?: string;
+    avatar_srcset?: string;
   };
 }
 
@@ -39,6 +40,7 @@ interface MeResponse {
     email: string;
     is_moderator: boolean;
     avatar_url?: string;
+    avatar_srcset?: string;
   };
 }
 
@@ -48,7 +48,21 @@ export const AppHeader: React.FC<AppHeaderProps> = ({ onOpenMap, onOpenLearning,
     }
   };
 
-  const resolvedAvatarUrl = profileAvatarUrl ? normalizeImageUrl(profileAvatarUrl) : '';
+  const withAvatarWidth = (url: string, width: number): string => {
+    if (!url) {
+      return '';
+    }
+    try {
+      const parsed = new URL(url, window.location.origin);
+      parsed.searchParams.set('w', String(width));
+      return parsed.toString();
+    } catch {
+      return url;
+    }
+  };
+
+  // Иконка профиля 40px: запрашиваем вариант аватара 96px (с запасом для 2x) вместо 256px.
+  const resolvedAvatarUrl = profileAvatarUrl ? withAvatarWidth(normalizeImageUrl(profileAvatarUrl), 96) : '';
 
   const handleProfileOpen = () => {
     localStorage.setItem('hasUnreadNotifications', 'false');